@@ -29,6 +29,12 @@ import os
 import datasets
 from datasets import Features, GeneratorBasedBuilder
 
+# this script is loaded standalone by the datasets library, so we can not use src.utils.json_utils
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 logger = logging.getLogger(__name__)
 
 DATA_URL = "http://dialam.arg.tech/res/files/dataset.zip"
@@ -135,6 +141,19 @@ def get_node_id_from_filename(filename: str) -> str:
         return fn_no_ext
 
 
+def read_json(file_name: str):
+    """Read a JSON file with orjson, if it is installed (see src.utils.json_utils)."""
+    with open(file_name, "rb") as f:
+        data = f.read()
+    if orjson is not None:
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN or lone surrogates that are accepted by the json module
+            pass
+    return json.loads(data)
+
+
 def _construct_split_generator(data_dir: str, split_name: str) -> datasets.SplitGenerator:
     # collect all json files in the data_dir with glob
     sample_test_file_names = sorted(glob.glob(os.path.join(data_dir, "*.json")))
@@ -220,8 +239,7 @@ class DialAM2024(GeneratorBasedBuilder):
     def _generate_examples(self, file_names):
         idx = 0
         for file_name in file_names:
-            with open(file_name, encoding="utf-8", errors=None) as f:
-                data = json.load(f)
+            data = read_json(file_name)
             data["id"] = get_node_id_from_filename(file_name)
 
             # delete optional node fields: scheme, schemeID
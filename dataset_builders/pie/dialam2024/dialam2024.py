@@ -15,10 +15,8 @@ from src.document.types import (
 from src.utils.align_i2l_nodes import align_i_and_l_nodes
 from src.utils.nodeset_utils import (
     Nodeset,
-    get_id2node,
-    get_node_ids,
+    NodesetIndex,
     get_node_ids_by_type,
-    get_relations,
     sort_nodes_by_hierarchy,
 )
 from src.utils.prepare_data import prepare_nodeset
@@ -46,22 +44,24 @@ def convert_to_document(
     add_i_node_text: bool = False,
 ) -> SimplifiedDialAM2024Document:
 
+    # the lookup tables for all relation types and the node sorting
+    index = NodesetIndex(nodeset)
+    relations = index.get_all_relations(
+        relation_types=["YA-L2I", "S", "TA", "YA-TA2S"], enforce_cardinality=True
+    )
+
     # 1. create document text and L-node-spans
     l_node_ids = get_node_ids_by_type(nodeset, node_types=["L"])
     sorted_l_node_ids: List[str] = sort_nodes_by_hierarchy(
-        l_node_ids, edges=nodeset["edges"], nodeset_id=nodeset_id
+        l_node_ids, edges=nodeset["edges"], nodeset_id=nodeset_id, index=index
     )
-    node_id2node = get_id2node(nodeset)
+    node_id2node = index.node_id2node
 
     l2i_node_alignments = dict()
     if add_i_node_text:
         # get L and I node IDs
-        l_node_ids_with_isolates = get_node_ids(
-            node_id2node=node_id2node, allowed_node_types=["L"]
-        )
-        i_node_ids_with_isolates = get_node_ids(
-            node_id2node=node_id2node, allowed_node_types=["I"]
-        )
+        l_node_ids_with_isolates = index.get_node_ids(["L"])
+        i_node_ids_with_isolates = index.get_node_ids(["I"])
         # align I and L nodes
         il_node_alignment_with_isolates = align_i_and_l_nodes(
             node_id2node=node_id2node,
@@ -98,7 +98,7 @@ def convert_to_document(
     doc.metadata["l_node_ids"] = sorted_l_node_ids
 
     # 2. encode YA relations between I and L nodes
-    ya_i2l_relations = list(get_relations(nodeset, "YA-L2I", enforce_cardinality=True))
+    ya_i2l_relations = relations["YA-L2I"]
     doc.metadata["ya_i2l_relations"] = []
     for ya_12l_relation in ya_i2l_relations:
         ya_12l_relation_node = node_id2node[ya_12l_relation["relation"]]
@@ -133,7 +133,7 @@ def convert_to_document(
             continue
         i2l_ya_trg2sources[trg_id] = src_id
 
-    s_relations = list(get_relations(nodeset, "S", enforce_cardinality=True))
+    s_relations = relations["S"]
     doc.metadata["s_relations"] = []
     for s_relation in s_relations:
         s_relation_node = node_id2node[s_relation["relation"]]
@@ -156,9 +156,9 @@ def convert_to_document(
         doc.metadata["s_relations"].append(s_relation)
 
     # 4. encode YA relations between S and TA nodes
-    ta_relations = list(get_relations(nodeset, "TA", enforce_cardinality=True))
+    ta_relations = relations["TA"]
     ta_id2relation = {rel["relation"]: rel for rel in ta_relations}
-    s2ta_ya_relations = list(get_relations(nodeset, "YA-TA2S", enforce_cardinality=True))
+    s2ta_ya_relations = relations["YA-TA2S"]
     doc.metadata["ya_s2ta_relations"] = []
     for ya_s2ta_relation in s2ta_ya_relations:
         ya_s2ta_relation_node = node_id2node[ya_s2ta_relation["relation"]]
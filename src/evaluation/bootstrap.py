@@ -0,0 +1,237 @@
+"""Bootstrap confidence intervals and paired significance tests for the scores of eval_official.py.
+
+The input are the confusion counts per nodeset as saved by eval_official.py with
+--confusion_counts_file, so the nodesets do not need to be parsed again. The corpus level scores
+are the means over the per-nodeset scores (as in eval_official.py), so resampling the nodesets
+with replacement boils down to weighting the per-nodeset scores with the number of times each
+nodeset is drawn. All resamples are computed at once with a single matrix product.
+
+Usage:
+
+$ python src/evaluation/eval_official.py --mode=all --gold_dir=data/evaluation_data \
+    --predictions_dir=PREDICTION/DATA/DIR --confusion_counts_file=run1.npz --silent
+
+$ python src/evaluation/bootstrap.py --confusion_counts_file=run1.npz
+
+... or to compare two runs (on the nodesets that are in both files):
+
+$ python src/evaluation/bootstrap.py --confusion_counts_file=run1.npz --compare_to=run2.npz
+"""
+
+import argparse
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pyrootutils
+
+pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], pythonpath=True)
+
+from src.evaluation.prf_metrics import batched_general_and_focused_scores
+
+
+def load_confusion_counts(path: str) -> Dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {key: data[key] for key in data.files}
+
+
+def get_scores_per_nodeset(arrays: Dict[str, np.ndarray]) -> Tuple[List[str], np.ndarray]:
+    """Compute the general and focused precision, recall and F1 per nodeset and mode from the
+    confusion counts as saved by eval_official.save_confusion_counts.
+
+    Returns:
+        A tuple containing the statistic names (e.g. "arguments.general.f1") and an array of shape
+        (num_nodesets, num_stats) with the scores. Scores that are not available for a nodeset
+        (e.g. the focused scores if there are no gold relations) are NaN.
+    """
+    modes = sorted(key[: -len(".confusion")] for key in arrays if key.endswith(".confusion"))
+    stat_names = []
+    columns = []
+    for mode in modes:
+        scores = batched_general_and_focused_scores(
+            arrays[f"{mode}.confusion"], focused_index=int(arrays[f"{mode}.none_index"])
+        )
+        for name, values in scores.items():
+            for stat_idx, stat_name in enumerate(["p", "r", "f1"]):
+                stat_names.append(f"{mode}.{name}.{stat_name}")
+                columns.append(values[:, stat_idx])
+    return stat_names, np.stack(columns, axis=1)
+
+
+def get_resample_weights(
+    num_nodesets: int, num_samples: int, seed: Optional[int] = None
+) -> np.ndarray:
+    """Draw bootstrap resamples of the nodesets. Returns an array of shape (num_samples,
+    num_nodesets) that contains how often each nodeset is drawn per resample."""
+
+    rng = np.random.default_rng(seed)
+    return rng.multinomial(num_nodesets, np.full(num_nodesets, 1.0 / num_nodesets), num_samples)
+
+
+def weighted_nanmean(scores: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Compute the mean of the scores (shape: (num_nodesets, num_stats)) for each row of weights
+    (shape: (num_samples, num_nodesets)) while ignoring NaN scores, i.e. in the same way as
+    eval_official.py aggregates the per-nodeset scores. Returns an array of shape (num_samples,
+    num_stats)."""
+
+    valid = ~np.isnan(scores)
+    totals = weights @ np.where(valid, scores, 0.0)
+    counts = weights @ valid.astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return totals / counts
+
+
+def bootstrap_confidence_intervals(
+    scores: np.ndarray,
+    num_samples: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Compute percentile bootstrap confidence intervals for the mean of per-nodeset scores.
+
+    Args:
+        scores: An array of shape (num_nodesets, num_stats), see get_scores_per_nodeset.
+        num_samples: The number of bootstrap resamples.
+        confidence: The confidence level.
+        seed: The random seed.
+
+    Returns:
+        A mapping from "mean", "lower" and "upper" to arrays of shape (num_stats,).
+    """
+    weights = get_resample_weights(len(scores), num_samples, seed=seed)
+    resampled = weighted_nanmean(scores, weights)
+    alpha = (1.0 - confidence) / 2
+    lower, upper = np.nanquantile(resampled, [alpha, 1.0 - alpha], axis=0)
+    return {
+        "mean": weighted_nanmean(scores, np.ones((1, len(scores))))[0],
+        "lower": lower,
+        "upper": upper,
+    }
+
+
+def paired_bootstrap_test(
+    scores: np.ndarray,
+    other_scores: np.ndarray,
+    num_samples: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+) -> Dict[str, np.ndarray]:
+    """Paired bootstrap test for the difference of the mean scores of two runs on the same
+    nodesets. Both runs are evaluated on the same resamples.
+
+    Args:
+        scores: An array of shape (num_nodesets, num_stats) with the scores of the first run.
+        other_scores: The scores of the second run for the same nodesets (in the same order).
+        num_samples: The number of bootstrap resamples.
+        confidence: The confidence level for the interval of the difference.
+        seed: The random seed.
+
+    Returns:
+        A mapping from "delta" (mean of scores minus mean of other_scores), "lower" and "upper"
+        (confidence interval of the difference) and "p_value" (two-sided, null hypothesis: no
+        difference) to arrays of shape (num_stats,).
+    """
+    if scores.shape != other_scores.shape:
+        raise ValueError(
+            f"scores and other_scores need to have the same shape, but got {scores.shape} and "
+            f"{other_scores.shape}"
+        )
+    all_weights = np.ones((1, len(scores)))
+    delta = (
+        weighted_nanmean(scores, all_weights)[0] - weighted_nanmean(other_scores, all_weights)[0]
+    )
+    weights = get_resample_weights(len(scores), num_samples, seed=seed)
+    resampled_delta = weighted_nanmean(scores, weights) - weighted_nanmean(other_scores, weights)
+    alpha = (1.0 - confidence) / 2
+    lower, upper = np.nanquantile(resampled_delta, [alpha, 1.0 - alpha], axis=0)
+    # shift the bootstrap distribution to the null hypothesis (zero difference), see
+    # Berg-Kirkpatrick et al. (2012): An Empirical Investigation of Statistical Significance in NLP
+    p_value = np.mean(np.abs(resampled_delta - delta) >= np.abs(delta), axis=0)
+    return {"delta": delta, "lower": lower, "upper": upper, "p_value": p_value}
+
+
+def align_runs(
+    arrays: Dict[str, np.ndarray], other_arrays: Dict[str, np.ndarray]
+) -> Tuple[List[str], np.ndarray, np.ndarray]:
+    """Get the per-nodeset scores of two runs for the nodesets and statistics that are available
+    in both.
+
+    Returns:
+        A tuple containing the statistic names and the scores of both runs, each of shape
+        (num_common_nodesets, num_common_stats).
+    """
+    stat_names, scores = get_scores_per_nodeset(arrays)
+    other_stat_names, other_scores = get_scores_per_nodeset(other_arrays)
+    nodeset_ids = arrays["nodeset_ids"].tolist()
+    other_nodeset_ids = other_arrays["nodeset_ids"].tolist()
+    common_nodeset_ids = sorted(set(nodeset_ids) & set(other_nodeset_ids))
+    common_stat_names = [name for name in stat_names if name in other_stat_names]
+
+    rows = [nodeset_ids.index(nodeset_id) for nodeset_id in common_nodeset_ids]
+    other_rows = [other_nodeset_ids.index(nodeset_id) for nodeset_id in common_nodeset_ids]
+    columns = [stat_names.index(name) for name in common_stat_names]
+    other_columns = [other_stat_names.index(name) for name in common_stat_names]
+    return (
+        common_stat_names,
+        scores[np.ix_(rows, columns)],
+        other_scores[np.ix_(other_rows, other_columns)],
+    )
+
+
+def main(
+    confusion_counts_file: str,
+    compare_to: Optional[str] = None,
+    num_samples: int = 10000,
+    confidence: float = 0.95,
+    seed: Optional[int] = None,
+):
+    arrays = load_confusion_counts(confusion_counts_file)
+    if compare_to is None:
+        stat_names, scores = get_scores_per_nodeset(arrays)
+        result = bootstrap_confidence_intervals(
+            scores, num_samples=num_samples, confidence=confidence, seed=seed
+        )
+        print(f"nodesets: {len(scores)}, {confidence:.0%} confidence intervals")
+        for idx, stat_name in enumerate(stat_names):
+            print(
+                f"{stat_name}: {result['mean'][idx]} "
+                f"[{result['lower'][idx]}, {result['upper'][idx]}]"
+            )
+    else:
+        stat_names, scores, other_scores = align_runs(arrays, load_confusion_counts(compare_to))
+        result = paired_bootstrap_test(
+            scores, other_scores, num_samples=num_samples, confidence=confidence, seed=seed
+        )
+        print(f"common nodesets: {len(scores)}, {confidence:.0%} confidence intervals")
+        for idx, stat_name in enumerate(stat_names):
+            print(
+                f"{stat_name}: delta={result['delta'][idx]} "
+                f"[{result['lower'][idx]}, {result['upper'][idx]}], "
+                f"p={result['p_value'][idx]}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compute bootstrap confidence intervals from confusion counts saved by "
+        "eval_official.py"
+    )
+    parser.add_argument(
+        "--confusion_counts_file",
+        type=str,
+        required=True,
+        help="Path to the confusion counts (.npz) as saved by eval_official.py",
+    )
+    parser.add_argument(
+        "--compare_to",
+        type=str,
+        help="Path to the confusion counts of another run. If provided, a paired bootstrap test "
+        "for the difference between both runs is performed",
+    )
+    parser.add_argument(
+        "--num_samples", type=int, default=10000, help="Number of bootstrap resamples"
+    )
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed")
+
+    args = vars(parser.parse_args())
+    main(**args)
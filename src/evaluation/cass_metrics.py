@@ -0,0 +1,127 @@
+"""NumPy implementation of the confusion matrix statistics that are used in evaluate.py.
+
+ConfusionMatrix provides the same attributes as pycm.ConfusionMatrix for the statistics that are
+needed for the CASS evaluation (Kappa, KappaNoPrevalence, F1_Macro, ACC and Alpha), but computes
+them from a single integer array instead of the full set of pycm statistics. The values are
+identical to the ones of pycm, including its fallback semantics: a statistic is the string "None"
+if it is not defined, e.g. because of a division by zero.
+
+The overall statistics are summed up in class order with Python floats (and not with np.sum,
+which uses pairwise summation) to get exactly the same rounding as pycm. The matrices are small
+(at most a few dozen classes), so this is cheap compared to the full pycm computation.
+"""
+
+from typing import Dict, Hashable, List, Sequence, Tuple, Union
+
+import numpy as np
+
+# the value of undefined statistics, as in pycm
+NONE = "None"
+
+Statistic = Union[float, str]
+
+
+def _to_array(
+    matrix: Union[Dict[Hashable, Dict[Hashable, int]], Sequence[Sequence[int]], np.ndarray],
+) -> Tuple[List[Hashable], np.ndarray]:
+    """Get the classes and the confusion counts (rows: actual, columns: predicted) from a matrix
+    in pycm format (a mapping from actual to predicted class to count) or from a 2D array."""
+    if isinstance(matrix, dict):
+        classes = sorted(matrix)
+        table = np.array(
+            [[matrix[actual].get(predicted, 0) for predicted in classes] for actual in classes],
+            dtype=np.int64,
+        ).reshape(len(classes), len(classes))
+    else:
+        table = np.asarray(matrix, dtype=np.int64)
+        if table.ndim != 2 or table.shape[0] != table.shape[1]:
+            raise ValueError(f"The confusion matrix must be square, but has shape {table.shape}.")
+        classes = list(range(table.shape[0]))
+    if len(classes) < 2:
+        raise ValueError("The number of classes must be at least 2.")
+    return classes, table
+
+
+def _divide(numerators: np.ndarray, denominators: np.ndarray) -> List[Statistic]:
+    """Element-wise division that returns "None" for a zero denominator."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = numerators / denominators
+    return [NONE if d == 0 else v for v, d in zip(result.tolist(), denominators.tolist())]
+
+
+def _reliability(random_accuracy: Statistic, accuracy: Statistic) -> Statistic:
+    """(accuracy - random accuracy) / (1 - random accuracy), e.g. Kappa."""
+    if random_accuracy == NONE or accuracy == NONE or random_accuracy == 1:
+        return NONE
+    return (accuracy - random_accuracy) / (1 - random_accuracy)
+
+
+class ConfusionMatrix:
+    """Confusion matrix statistics as in pycm.ConfusionMatrix.
+
+    Args:
+        matrix: The confusion counts, either as a 2D array with the actual classes as rows (as
+            returned by matching.calculate_matching) or as a mapping from actual to predicted
+            class to count (like the matrices for pycm, see matching.convert_to_dict). The classes
+            of an array are the row indices, the classes of a mapping are sorted.
+    """
+
+    def __init__(
+        self,
+        matrix: Union[Dict[Hashable, Dict[Hashable, int]], Sequence[Sequence[int]], np.ndarray],
+    ):
+        self.classes, self.table = _to_array(matrix)
+        tp = np.diagonal(self.table)
+        # number of actual (P) and predicted (TOP) samples per class
+        p = self.table.sum(axis=1)
+        top = self.table.sum(axis=0)
+        self.population = int(self.table.sum())
+        fp = top - tp
+        fn = p - tp
+        tn = self.population - tp - fp - fn
+
+        self.ACC: Dict[Hashable, Statistic] = dict(
+            zip(self.classes, _divide((tp + tn).astype(float), (tp + tn + fp + fn).astype(float)))
+        )
+        self.F1: Dict[Hashable, Statistic] = dict(
+            zip(self.classes, _divide(2.0 * tp, (2 * tp + fp + fn).astype(float)))
+        )
+
+        if self.population == 0:
+            self.overall_accuracy: Statistic = NONE
+            self.overall_random_accuracy: Statistic = NONE
+            self.overall_random_accuracy_unbiased: Statistic = NONE
+        else:
+            self.overall_accuracy = sum(tp.tolist()) / self.population
+            random_accuracy = top.astype(float) * p.astype(float) / float(self.population) ** 2
+            self.overall_random_accuracy = sum(random_accuracy.tolist())
+            # Python's float power may round differently than np.square (which pycm does not use)
+            self.overall_random_accuracy_unbiased = sum(
+                ((t + q) / (2 * self.population)) ** 2 for t, q in zip(top.tolist(), p.tolist())
+            )
+
+    @property
+    def Kappa(self) -> Statistic:
+        return _reliability(self.overall_random_accuracy, self.overall_accuracy)
+
+    @property
+    def KappaNoPrevalence(self) -> Statistic:
+        if self.overall_accuracy == NONE:
+            return NONE
+        return 2 * self.overall_accuracy - 1
+
+    @property
+    def F1_Macro(self) -> Statistic:
+        values = list(self.F1.values())
+        if NONE in values:
+            return NONE
+        return sum(values) / len(values)
+
+    @property
+    def Alpha(self) -> Statistic:
+        """Unweighted Krippendorff's alpha."""
+        if self.overall_accuracy == NONE:
+            return NONE
+        epsilon = 1 / (2 * self.population)
+        p_a = (1 - epsilon) * self.overall_accuracy + epsilon
+        return _reliability(self.overall_random_accuracy_unbiased, p_a)
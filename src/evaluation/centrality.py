@@ -1,16 +1,17 @@
 import json
 import logging
-from typing import List, Tuple
+from collections import defaultdict
+from typing import Dict, List, Tuple
 
 import load_map
-import networkx as nx
-from networkx.classes.digraph import DiGraph
+import numpy as np
+from compact_graph import NO_ATTRIBUTES, CompactGraph
 
 logger = logging.getLogger(__name__)
 
 
-def get_graph(node_path: str) -> DiGraph:
-    """Load the graph stored in JSON format and parse it as DiGraph."""
+def get_graph(node_path: str) -> CompactGraph:
+    """Load the graph stored in JSON format and parse it as CompactGraph."""
 
     try:
         with open(node_path) as json_data:
@@ -20,57 +21,50 @@ def get_graph(node_path: str) -> DiGraph:
     return graph
 
 
-def remove_redundant_nodes(graph: DiGraph) -> DiGraph:
+def remove_redundant_nodes(graph: CompactGraph) -> CompactGraph:
     """Remove TA, L, YA nodes from the graph."""
 
-    nodes_to_remove = [
-        x
-        for x, y in graph.nodes(data=True)
-        if y["type"] == "TA" or y["type"] == "L" or y["type"] == "YA"
-    ]
+    return graph.without_nodes(graph.get_type_mask(["TA", "L", "YA"]))
 
-    graph.remove_nodes_from(nodes_to_remove)
 
-    return graph
-
-
-def remove_iso_analyst_nodes(graph: DiGraph) -> DiGraph:
+def remove_iso_analyst_nodes(graph: CompactGraph) -> CompactGraph:
     """Remove isolated L-nodes from the graph."""
-    analyst_nodes = []
-    isolated_nodes = list(nx.isolates(graph))
-    for node in isolated_nodes:
-        if graph.nodes[node]["type"] == "L":
-            analyst_nodes.append(node)
-    graph.remove_nodes_from(analyst_nodes)
-    return graph
+    return graph.without_nodes(graph.get_isolate_mask() & graph.get_type_mask(["L"]))
 
 
-def get_type_node_list(graph: DiGraph, node_types: List[str]) -> List[Tuple[int, str]]:
+def get_type_node_list(graph: CompactGraph, node_types: List[str]) -> List[Tuple[int, str]]:
     """Filter out and return nodes of a given type."""
-    nodes = [
-        (x, y["text"])
-        for x, y in graph.nodes(data=True)
-        if "type" in y and y["type"] in node_types
-    ]
+    indices = np.flatnonzero(graph.get_type_mask(node_types)).tolist()
+    nodes = [(graph.node_ids[idx], graph.texts[idx]) for idx in indices]
     return nodes
 
 
-def get_s_node_list(graph: DiGraph) -> List[Tuple[int, str]]:
+def get_type2node_list(graph: CompactGraph) -> Dict[str, List[Tuple[int, str]]]:
+    """Group the nodes by their type in a single pass over the graph (same order and content as
+    get_type_node_list for each type)."""
+    type2nodes = defaultdict(list)
+    for idx, type_code in enumerate(graph.type_codes.tolist()):
+        if type_code != NO_ATTRIBUTES:
+            type2nodes[graph.type_names[type_code]].append((graph.node_ids[idx], graph.texts[idx]))
+    return dict(type2nodes)
+
+
+def get_s_node_list(graph: CompactGraph) -> List[Tuple[int, str]]:
     """Filter out and return S-type nodes (MA, RA, CA)."""
     return get_type_node_list(graph, ["MA", "RA", "CA", "PA"])
 
 
-def get_l_node_list(graph: DiGraph) -> List[Tuple[int, str]]:
+def get_l_node_list(graph: CompactGraph) -> List[Tuple[int, str]]:
     """Filter out and return L-type nodes (locutions)."""
     return get_type_node_list(graph, ["L"])
 
 
-def get_i_node_list(graph: DiGraph) -> List[Tuple[int, str]]:
+def get_i_node_list(graph: CompactGraph) -> List[Tuple[int, str]]:
     """Filter out and return I-type nodes (propositions)."""
     return get_type_node_list(graph, ["I"])
 
 
-def get_rels(rel_type: str, graph: DiGraph) -> List[int]:
+def get_rels(rel_type: str, graph: CompactGraph) -> List[int]:
     """Collect all nodes in the graph that correspond to the given relation type."""
-    rel_nodes = [x for x, y in graph.nodes(data=True) if "type" in y and y["type"] == rel_type]
+    rel_nodes = graph.get_nodes_by_type([rel_type])
     return rel_nodes
@@ -0,0 +1,210 @@
+"""A compact directed graph for the nodesets in the CASS evaluation (see load_map.parse_json).
+
+The node IDs are interned to consecutive integer indices (in insertion order), the node types are
+stored as an uint8 array of codes into a small table of type names, the texts are stored in a
+list, and the in- and out-edges are stored as NumPy CSR arrays (index pointers and neighbor
+indices). The graph is immutable: removing nodes creates a new graph.
+
+The graph behaves like the networkx DiGraph that was used before: nodes and neighbors are
+returned in insertion order, duplicated edges are ignored, and nodes that only occur in edges
+have no attributes (accessing their type or text raises a KeyError).
+"""
+
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# type code for nodes without attributes, i.e. nodes that only occur in edges
+NO_ATTRIBUTES = 0
+
+
+def _get_csr(
+    keys: np.ndarray, values: np.ndarray, num_nodes: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Group the values by the keys (node indices). The stable sort keeps the values of each key in
+    insertion order."""
+    order = np.argsort(keys, kind="stable")
+    indptr = np.zeros(num_nodes + 1, dtype=np.int64)
+    np.cumsum(np.bincount(keys, minlength=num_nodes), out=indptr[1:])
+    return indptr, values[order].astype(np.int32)
+
+
+class CompactGraph:
+    """Directed graph with integer-interned nodes, a node type array, a text table and CSR
+    adjacency arrays.
+
+    Args:
+        node_ids: The node IDs in insertion order.
+        type_codes: The type code per node, i.e. the index into type_names (NO_ATTRIBUTES for
+            nodes without attributes).
+        type_names: The type names (type_names[NO_ATTRIBUTES] is not used).
+        texts: The text per node.
+        edge_sources: The source node index per edge (w/o duplicates, in insertion order).
+        edge_targets: The target node index per edge.
+        attributes: Further node attributes, e.g. timestamps, as mapping from the attribute name
+            to the values per node.
+    """
+
+    def __init__(
+        self,
+        node_ids: List[Hashable],
+        type_codes: np.ndarray,
+        type_names: List[Optional[str]],
+        texts: List[Optional[str]],
+        edge_sources: np.ndarray,
+        edge_targets: np.ndarray,
+        attributes: Optional[Dict[str, List[Any]]] = None,
+    ):
+        self.node_ids = node_ids
+        self.node_id2index = {node_id: idx for idx, node_id in enumerate(node_ids)}
+        self.type_codes = type_codes
+        self.type_names = type_names
+        self.texts = texts
+        self.edge_sources = edge_sources
+        self.edge_targets = edge_targets
+        self.attributes = attributes or {}
+        num_nodes = len(node_ids)
+        self.succ_indptr, self.succ_indices = _get_csr(edge_sources, edge_targets, num_nodes)
+        self.pred_indptr, self.pred_indices = _get_csr(edge_targets, edge_sources, num_nodes)
+
+    @classmethod
+    def from_nodes_and_edges(
+        cls,
+        nodes: Iterable[Tuple[Hashable, Dict[str, Any]]],
+        edges: Iterable[Tuple[Hashable, Hashable]],
+    ) -> "CompactGraph":
+        """Build the graph from (node ID, attributes) pairs and (source ID, target ID) pairs.
+
+        The attributes "type" and "text" are stored in the respective tables, all other attributes
+        in CompactGraph.attributes. Adding a node again updates its attributes. Nodes that only
+        occur in edges are added without attributes.
+        """
+        node_id2index: Dict[Hashable, int] = {}
+        node_attributes: List[Optional[Dict[str, Any]]] = []
+        for node_id, attributes in nodes:
+            idx = node_id2index.setdefault(node_id, len(node_id2index))
+            if idx == len(node_attributes):
+                node_attributes.append(attributes)
+            else:
+                # do not modify the attributes that were passed in
+                node_attributes[idx] = {**node_attributes[idx], **attributes}
+
+        edge_set = set()
+        edge_sources = []
+        edge_targets = []
+        for source_id, target_id in edges:
+            for node_id in (source_id, target_id):
+                if node_id not in node_id2index:
+                    node_id2index[node_id] = len(node_id2index)
+                    node_attributes.append(None)
+            edge = (node_id2index[source_id], node_id2index[target_id])
+            if edge not in edge_set:
+                edge_set.add(edge)
+                edge_sources.append(edge[0])
+                edge_targets.append(edge[1])
+
+        type_names: List[Optional[str]] = [None]
+        type_name2code: Dict[Optional[str], int] = {}
+        max_num_types = np.iinfo(np.uint8).max
+        type_codes = np.zeros(len(node_attributes), dtype=np.uint8)
+        texts: List[Optional[str]] = [None] * len(node_attributes)
+        attributes: Dict[str, List[Any]] = {}
+        for idx, current_attributes in enumerate(node_attributes):
+            if current_attributes is None:
+                continue
+            type_name = current_attributes.get("type")
+            if type_name not in type_name2code:
+                if len(type_names) > max_num_types:
+                    raise ValueError(
+                        f"Too many node types, at most {max_num_types} are supported."
+                    )
+                type_name2code[type_name] = len(type_names)
+                type_names.append(type_name)
+            type_codes[idx] = type_name2code[type_name]
+            texts[idx] = current_attributes.get("text")
+            for key, value in current_attributes.items():
+                if key not in ("type", "text"):
+                    if key not in attributes:
+                        attributes[key] = [None] * len(node_attributes)
+                    attributes[key][idx] = value
+
+        return cls(
+            node_ids=list(node_id2index),
+            type_codes=type_codes,
+            type_names=type_names,
+            texts=texts,
+            edge_sources=np.array(edge_sources, dtype=np.int64),
+            edge_targets=np.array(edge_targets, dtype=np.int64),
+            attributes=attributes,
+        )
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, node_id: Hashable) -> bool:
+        return node_id in self.node_id2index
+
+    @property
+    def num_edges(self) -> int:
+        return len(self.edge_sources)
+
+    def _get_index(self, node_id: Hashable) -> int:
+        try:
+            return self.node_id2index[node_id]
+        except (KeyError, TypeError):
+            raise KeyError(f"The node {node_id} is not in the graph.")
+
+    def successors(self, node_id: Hashable) -> List[Hashable]:
+        idx = self._get_index(node_id)
+        indices = self.succ_indices[self.succ_indptr[idx] : self.succ_indptr[idx + 1]]
+        return [self.node_ids[i] for i in indices.tolist()]
+
+    def predecessors(self, node_id: Hashable) -> List[Hashable]:
+        idx = self._get_index(node_id)
+        indices = self.pred_indices[self.pred_indptr[idx] : self.pred_indptr[idx + 1]]
+        return [self.node_ids[i] for i in indices.tolist()]
+
+    def get_type(self, node_id: Hashable) -> Optional[str]:
+        code = self.type_codes[self._get_index(node_id)]
+        if code == NO_ATTRIBUTES:
+            raise KeyError(f"The node {node_id} has no type.")
+        return self.type_names[code]
+
+    def get_text(self, node_id: Hashable) -> Optional[str]:
+        idx = self._get_index(node_id)
+        if self.type_codes[idx] == NO_ATTRIBUTES:
+            raise KeyError(f"The node {node_id} has no text.")
+        return self.texts[idx]
+
+    def get_type_mask(self, node_types: Sequence[str]) -> np.ndarray:
+        """Get a boolean mask of the nodes that have one of the given types."""
+        codes = [code for code, name in enumerate(self.type_names) if code and name in node_types]
+        return np.isin(self.type_codes, codes)
+
+    def get_nodes_by_type(self, node_types: Sequence[str]) -> List[Hashable]:
+        """Get the IDs of all nodes (in insertion order) that have one of the given types."""
+        return [self.node_ids[i] for i in np.flatnonzero(self.get_type_mask(node_types)).tolist()]
+
+    def get_isolate_mask(self) -> np.ndarray:
+        """Get a boolean mask of the nodes without any in- or out-edges."""
+        return (np.diff(self.succ_indptr) == 0) & (np.diff(self.pred_indptr) == 0)
+
+    def without_nodes(self, mask: np.ndarray) -> "CompactGraph":
+        """Create a new graph without the nodes (and their edges) that are selected by the mask."""
+        if not mask.any():
+            return self
+        keep = ~mask
+        new_indices = np.cumsum(keep) - 1
+        keep_edges = keep[self.edge_sources] & keep[self.edge_targets]
+        keep_indices = np.flatnonzero(keep).tolist()
+        return CompactGraph(
+            node_ids=[self.node_ids[i] for i in keep_indices],
+            type_codes=self.type_codes[keep],
+            type_names=self.type_names,
+            texts=[self.texts[i] for i in keep_indices],
+            edge_sources=new_indices[self.edge_sources[keep_edges]],
+            edge_targets=new_indices[self.edge_targets[keep_edges]],
+            attributes={
+                key: [values[i] for i in keep_indices] for key, values in self.attributes.items()
+            },
+        )
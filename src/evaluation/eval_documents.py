@@ -0,0 +1,129 @@
+"""Evaluate predicted documents (as written by predict.py) with the official evaluation script
+without writing the nodesets to disk first. The documents are converted to nodesets in memory
+(see src/utils/convert_documents2nodesets.py) and passed directly to the evaluation functions of
+eval_official.py.
+
+Usage:
+
+$ python src/evaluation/eval_documents.py \
+    --input_dir=INPUT/DATA/DIR \
+    --gold_dir=data/evaluation_data \
+    --mode=all
+
+This gives the same results as calling src/utils/convert_documents2nodesets.py and
+src/evaluation/eval_official.py afterwards.
+"""
+
+import pyrootutils
+
+pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], pythonpath=True)
+
+import argparse
+import logging
+from typing import Any, Dict, Iterable
+
+from tqdm import tqdm
+
+from src.document.types import TextDocumentWithLabeledEntitiesAndNaryRelations
+from src.evaluation.eval_official import eval_single_nodeset, get_mean_result
+from src.serializer import JsonSerializer
+from src.utils.convert_documents2nodesets import convert_to_nodeset
+
+logger = logging.getLogger(__name__)
+
+
+def evaluate_documents(
+    documents: Iterable[TextDocumentWithLabeledEntitiesAndNaryRelations],
+    gold_dir: str,
+    mode: str,
+    show_progress: bool = True,
+    **kwargs,
+) -> Dict[str, Dict[str, Any]]:
+    """Evaluate documents with predictions against the gold nodesets.
+
+    Args:
+        documents: The documents with predictions.
+        gold_dir: The directory containing the gold nodesets.
+        mode: The evaluation mode, see eval_official.eval_single_nodeset.
+        show_progress: Whether to show a progress bar.
+        **kwargs: Additional arguments for eval_official.eval_single_nodeset, e.g. verbose.
+
+    Returns:
+        A mapping from nodeset IDs (= document IDs) to the results as returned by
+        eval_official.eval_single_nodeset. Documents that could not be evaluated are missing.
+    """
+    nodeset_id2result = {}
+    failed_nodeset_ids = []
+    for document in tqdm(documents, desc="Evaluating documents", disable=not show_progress):
+        try:
+            nodeset_id, nodeset = convert_to_nodeset(document)
+            nodeset_id2result[nodeset_id] = eval_single_nodeset(
+                mode=mode,
+                nodeset_id=nodeset_id,
+                predictions_dir=None,
+                gold_dir=gold_dir,
+                nodeset=nodeset,
+                **kwargs,
+            )
+        except Exception as e:
+            logger.error(f"document={document.id}: Failed to process: {e}")
+            failed_nodeset_ids.append(document.id)
+    logger.info(
+        f"Successfully processed {len(nodeset_id2result)} documents. Failed to process the "
+        f"following documents ({len(failed_nodeset_ids)}): {failed_nodeset_ids}"
+    )
+    return nodeset_id2result
+
+
+def main(input_dir: str, file_name: str, **kwargs):
+    documents = JsonSerializer.read(
+        path=input_dir,
+        file_name=file_name,
+        document_type=TextDocumentWithLabeledEntitiesAndNaryRelations,
+    )
+    nodeset_id2result = evaluate_documents(documents, **kwargs)
+    for stat_name, stat_value in get_mean_result(nodeset_id2result.items()).items():
+        print(f"{stat_name}: {stat_value}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Evaluate serialized documents with predictions against the gold nodesets"
+    )
+    parser.add_argument(
+        "--input_dir",
+        type=str,
+        required=True,
+        help="Path to the directory with serialized JSON documents",
+    )
+    parser.add_argument(
+        "--file_name",
+        type=str,
+        default="documents.jsonl",
+        help="Name of the file with the serialized documents",
+    )
+    parser.add_argument(
+        "--gold_dir",
+        type=str,
+        required=True,
+        help="Path to the directory containing the gold nodesets",
+    )
+    parser.add_argument(
+        "--mode",
+        type=str,
+        required=True,
+        help="Mode of evaluation (arguments/illocutions/all), see eval_official.py",
+    )
+    parser.add_argument(
+        "--silent", dest="verbose", action="store_false", help="Whether to show verbose output"
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Whether to compute the scores from confusion counts of the related node pairs "
+        "instead of materializing labels for all candidate pairs",
+    )
+
+    args = vars(parser.parse_args())
+    logging.basicConfig(level=logging.INFO)
+    main(**args)
@@ -1,197 +1,485 @@
 import argparse
+import gzip
 import itertools
+import json
 import logging
 import math
-from collections import defaultdict
-from typing import Any, Dict, List, Optional, Union
+from collections import Counter, defaultdict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypedDict,
+    TypeVar,
+    Union,
+)
 
+import numpy as np
 import pyrootutils
-from sklearn.metrics import precision_recall_fscore_support
 
 pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], pythonpath=True)
 
-from src.utils.nodeset_utils import Nodeset, process_all_nodesets, read_nodeset
+from src.evaluation import prf_metrics
+from src.evaluation.prf_metrics import (
+    batched_general_and_focused_scores,
+    macro_precision_recall_fscore,
+    precision_recall_fscore,
+)
+from src.evaluation.result_cache import (
+    DEFAULT_CACHE_DIR,
+    ResultCache,
+    get_file_hash,
+    get_source_version,
+)
+from src.evaluation.results_db import ResultsDatabase
+from src.utils import json_utils, nodeset_pack, nodeset_utils
+from src.utils.nodeset_utils import (
+    Nodeset,
+    get_nodeset_filename,
+    get_nodeset_ids_from_directory,
+    get_nodeset_pack,
+    nodeset_exists,
+    process_all_nodesets,
+    read_nodeset,
+)
 
 logger = logging.getLogger(__name__)
 
+Label = TypeVar("Label", int, str)
+
+ARGUMENT_RELATION_LABELS = {"RA": 0, "CA": 1, "MA": 2}
+NO_ARGUMENT_RELATION_LABEL = 3
+NO_ILLOCUTION_LABEL = "None"
+# used to write the argument relation labels in a human-readable way
+ARGUMENT_RELATION_NAMES = {label: name for name, label in ARGUMENT_RELATION_LABELS.items()}
+ARGUMENT_RELATION_NAMES[NO_ARGUMENT_RELATION_LABEL] = "None"
+
+
+def get_label_name(label: Any, mode: str) -> str:
+    if mode == "arguments":
+        return ARGUMENT_RELATION_NAMES[label]
+    return label
+
+
+def get_adjacency(nodeset: Nodeset) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+    """Get helper mappings from source node IDs to target node IDs and vice versa. The order of
+    the edges in the nodeset is preserved."""
+
+    src2targets = defaultdict(list)
+    trg2sources = defaultdict(list)
+    for edge in nodeset["edges"]:
+        src2targets[edge["fromID"]].append(edge["toID"])
+        trg2sources[edge["toID"]].append(edge["fromID"])
+    return src2targets, trg2sources
+
+
+def get_relation_triples(
+    nodeset: Nodeset,
+    node_id2label: Dict[str, Label],
+    allowed_source_ids: Set[str],
+    allowed_target_ids: Optional[Set[str]] = None,
+    adjacency: Optional[Tuple[Dict[str, List[str]], Dict[str, List[str]]]] = None,
+) -> List[Tuple[str, str, Label]]:
+    """Get all relations encoded by relation nodes as (source ID, target ID, label) triples.
+
+    Only the first outgoing edge of a relation node is considered to get the target, but all
+    incoming edges are used to get the sources.
+
+    Args:
+        nodeset: A nodeset.
+        node_id2label: A mapping from the IDs of the relation nodes to the relation labels.
+        allowed_source_ids: Only sources with these IDs are considered.
+        allowed_target_ids: If provided, only targets with these IDs are considered.
+        adjacency: The result of get_adjacency(nodeset), if already available.
+
+    Returns:
+        A list of (source ID, target ID, label) triples in the order of the relation nodes.
+    """
+    src2targets, trg2sources = get_adjacency(nodeset) if adjacency is None else adjacency
+    relations = []
+    for node_id, label in node_id2label.items():
+        targets = src2targets.get(node_id)
+        if not targets:
+            continue
+        target_id = targets[0]
+        if allowed_target_ids is not None and target_id not in allowed_target_ids:
+            continue
+        for source_id in trg2sources.get(node_id, []):
+            if source_id in allowed_source_ids:
+                relations.append((source_id, target_id, label))
+    return relations
+
+
+def get_pair2label(relations: Iterable[Tuple[str, str, Label]]) -> Dict[Tuple[str, str], Label]:
+    """Get a mapping from (source ID, target ID) pairs to relation labels. If there are multiple
+    relations for the same pair, the first one wins."""
+
+    pair2label: Dict[Tuple[str, str], Label] = {}
+    for source_id, target_id, label in relations:
+        pair2label.setdefault((source_id, target_id), label)
+    return pair2label
+
+
+def get_argument_pair2label(
+    nodeset: Nodeset,
+    proposition_ids: Set[str],
+    adjacency: Optional[Tuple[Dict[str, List[str]], Dict[str, List[str]]]] = None,
+) -> Dict[Tuple[str, str], int]:
+    """Get the argumentative relations (RA, CA, MA) between propositions (I-nodes). If a pair
+    is connected by multiple relations, inference (RA) wins over conflict (CA) which wins over
+    rephrase (MA)."""
+
+    node_id2label = {
+        node["nodeID"]: ARGUMENT_RELATION_LABELS[node["type"]]
+        for node in nodeset["nodes"]
+        if node["type"] in ARGUMENT_RELATION_LABELS
+    }
+    relations = get_relation_triples(
+        nodeset,
+        node_id2label=node_id2label,
+        allowed_source_ids=proposition_ids,
+        adjacency=adjacency,
+    )
+    # sorting is stable, so the order of the relation nodes is preserved within each label
+    return get_pair2label(sorted(relations, key=lambda relation: relation[2]))
+
+
+def get_illocution_pair2label(
+    nodeset: Nodeset,
+    proploc_ids: Set[str],
+    adjacency: Optional[Tuple[Dict[str, List[str]], Dict[str, List[str]]]] = None,
+) -> Dict[Tuple[str, str], str]:
+    """Get the illocutionary relations (YA) between propositions (I-nodes) and locutions
+    (L-nodes)."""
+
+    node_id2label = {
+        node["nodeID"]: node["text"] for node in nodeset["nodes"] if node["type"] == "YA"
+    }
+    relations = get_relation_triples(
+        nodeset,
+        node_id2label=node_id2label,
+        allowed_source_ids=proploc_ids,
+        allowed_target_ids=proploc_ids,
+        adjacency=adjacency,
+    )
+    return get_pair2label(relations)
+
+
+EVALUATION_MODES = ["arguments", "illocutions"]
+NONE_LABELS = {"arguments": NO_ARGUMENT_RELATION_LABEL, "illocutions": NO_ILLOCUTION_LABEL}
+
+# Gold relations of a nodeset together with the candidate node pairs that are scored. For
+# mode="arguments", the candidate pairs are all permutations of the source IDs (= target IDs), for
+# mode="illocutions", the candidate pairs are the product of the source IDs and the target IDs.
+GoldRelations = TypedDict(
+    "GoldRelations",
+    {
+        "mode": str,
+        "source_ids": List[str],
+        "target_ids": List[str],
+        "allowed_ids": Set[str],
+        "pair2label": Dict[Tuple[str, str], Any],
+    },
+)
+
+
+def get_gold_relations(
+    truth: Nodeset,
+    mode: str,
+    adjacency: Optional[Tuple[Dict[str, List[str]], Dict[str, List[str]]]] = None,
+) -> GoldRelations:
+    """Get the gold relations and the candidate node pairs from a gold nodeset.
+
+    Args:
+        truth: The gold nodeset.
+        mode: The evaluation mode, either "arguments" or "illocutions".
+        adjacency: The result of get_adjacency(truth), if already available.
+
+    Returns:
+        The gold relations.
+    """
+    # Get the list of proposition and locution nodes
+    proposition_list = [node["nodeID"] for node in truth["nodes"] if node["type"] == "I"]
+    if mode == "arguments":
+        proposition_set = set(proposition_list)
+        return {
+            "mode": mode,
+            "source_ids": proposition_list,
+            "target_ids": proposition_list,
+            "allowed_ids": proposition_set,
+            "pair2label": get_argument_pair2label(truth, proposition_set, adjacency=adjacency),
+        }
+    elif mode == "illocutions":
+        locution_list = [node["nodeID"] for node in truth["nodes"] if node["type"] == "L"]
+        proploc_set = set(proposition_list) | set(locution_list)
+        return {
+            "mode": mode,
+            "source_ids": locution_list,
+            "target_ids": proposition_list,
+            "allowed_ids": proploc_set,
+            "pair2label": get_illocution_pair2label(truth, proploc_set, adjacency=adjacency),
+        }
+    else:
+        raise ValueError(f"Unknown mode: {mode}")
+
+
+def get_predicted_pair2label(
+    preds: Nodeset,
+    gold: GoldRelations,
+    adjacency: Optional[Tuple[Dict[str, List[str]], Dict[str, List[str]]]] = None,
+) -> Dict[Tuple[str, str], Any]:
+    """Get the predicted relations that are relevant for the gold relations. The adjacency is the
+    result of get_adjacency(preds), if already available."""
+
+    if gold["mode"] == "arguments":
+        return get_argument_pair2label(preds, gold["allowed_ids"], adjacency=adjacency)
+    elif gold["mode"] == "illocutions":
+        return get_illocution_pair2label(preds, gold["allowed_ids"], adjacency=adjacency)
+    else:
+        raise ValueError(f"Unknown mode: {gold['mode']}")
+
+
+def get_candidate_pairs(gold: GoldRelations) -> Iterator[Tuple[str, str]]:
+    if gold["mode"] == "arguments":
+        return itertools.permutations(gold["source_ids"], 2)
+    else:
+        return itertools.product(gold["source_ids"], gold["target_ids"])
+
+
+def get_nodeset_confusion_counts(
+    gold: GoldRelations, pred_pair2label: Dict[Tuple[str, str], Any]
+) -> Dict[Tuple[Any, Any], int]:
+    """Get the confusion counts for all candidate pairs of a nodeset, see
+    get_confusion_counts."""
+
+    source_counts = Counter(gold["source_ids"])
+    target_counts = Counter(gold["target_ids"])
+    # permutations do not pair an entry with itself
+    exclude_self_pairs = gold["mode"] == "arguments"
+
+    def pair2weight(pair: Tuple[str, str]) -> int:
+        # number of occurrences of the pair in the candidate pairs
+        weight = source_counts[pair[0]] * target_counts[pair[1]]
+        if exclude_self_pairs and pair[0] == pair[1]:
+            weight -= source_counts[pair[0]]
+        return weight
+
+    num_pairs = len(gold["source_ids"]) * len(gold["target_ids"])
+    if exclude_self_pairs:
+        num_pairs -= len(gold["source_ids"])
+
+    return get_confusion_counts(
+        true_pair2label=gold["pair2label"],
+        pred_pair2label=pred_pair2label,
+        pair2weight=pair2weight,
+        num_pairs=num_pairs,
+        none_label=NONE_LABELS[gold["mode"]],
+    )
+
+
+def get_disagreements(
+    gold: GoldRelations, pred_pair2label: Dict[Tuple[str, str], Any]
+) -> List[Tuple[str, str, Any, Any]]:
+    """Get all candidate pairs where the gold and the predicted label differ as (source ID,
+    target ID, gold label, predicted label) tuples. Only the related pairs need to be checked, so
+    this is linear in the number of gold and predicted relations."""
+
+    true_pair2label = gold["pair2label"]
+    none_label = NONE_LABELS[gold["mode"]]
+    source_ids = set(gold["source_ids"])
+    target_ids = set(gold["target_ids"])
+    # permutations do not pair an entry with itself
+    exclude_self_pairs = gold["mode"] == "arguments"
+    pred_only_pairs = (pair for pair in pred_pair2label if pair not in true_pair2label)
+    disagreements = []
+    for pair in itertools.chain(true_pair2label, pred_only_pairs):
+        source_id, target_id = pair
+        if source_id not in source_ids or target_id not in target_ids:
+            continue
+        if exclude_self_pairs and source_id == target_id:
+            continue
+        true_label = true_pair2label.get(pair, none_label)
+        pred_label = pred_pair2label.get(pair, none_label)
+        if true_label != pred_label:
+            disagreements.append((source_id, target_id, true_label, pred_label))
+    return disagreements
+
+
+class DisagreementWriter:
+    """Write the disagreements per nodeset and mode (see get_disagreements) to a gzip compressed
+    JSON lines file. The lines are buffered and written in batches.
+
+    Args:
+        path: The path to the output file, e.g. "disagreements.jsonl.gz".
+        buffer_size: The number of lines to collect before writing them to the file.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self._buffer: List[str] = []
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+
+    def write(
+        self, nodeset_id: str, mode: str, disagreements: List[Tuple[str, str, Any, Any]]
+    ) -> None:
+        record = {
+            "nodeset_id": nodeset_id,
+            "mode": mode,
+            "disagreements": [
+                {
+                    "src": source_id,
+                    "trg": target_id,
+                    "gold": get_label_name(true_label, mode),
+                    "pred": get_label_name(pred_label, mode),
+                }
+                for source_id, target_id, true_label, pred_label in disagreements
+            ],
+        }
+        self._buffer.append(json.dumps(record) + "\n")
+        if len(self._buffer) >= self.buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        self._file.writelines(self._buffer)
+        self._buffer = []
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def __enter__(self) -> "DisagreementWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def write_disagreements(
+    writer: DisagreementWriter, nodeset_id: str, mode: str, result: Dict[str, Any]
+) -> None:
+    """Remove the disagreements from a result of eval_single_nodeset (called with
+    return_disagreements=True) and write them with the writer."""
+
+    if mode == "all":
+        for current_mode, mode_result in result.items():
+            writer.write(nodeset_id, current_mode, mode_result.pop("disagreements"))
+    else:
+        writer.write(nodeset_id, mode, result.pop("disagreements"))
+
+
+def pop_confusion_counts(
+    mode: str, result: Dict[str, Any]
+) -> Dict[str, Dict[Tuple[Any, Any], int]]:
+    """Remove the confusion counts from a result of eval_single_nodeset (called with
+    return_confusion_counts=True) and return them per mode, see get_nodeset_confusion_counts."""
+
+    mode2result = result if mode == "all" else {mode: result}
+    return {
+        current_mode: {
+            (true_label, pred_label): count
+            for true_label, pred_label, count in mode_result.pop("confusion_counts")
+        }
+        for current_mode, mode_result in mode2result.items()
+    }
+
+
+def score_predictions(
+    gold: GoldRelations,
+    preds: Nodeset,
+    nodeset_id: str,
+    verbose: bool = True,
+    sparse: bool = False,
+    metrics_backend: str = "numpy",
+    preds_adjacency: Optional[Tuple[Dict[str, List[str]], Dict[str, List[str]]]] = None,
+    return_disagreements: bool = False,
+    return_confusion_counts: bool = False,
+) -> Dict[str, Any]:
+    """Score the predictions of a nodeset against the gold relations.
+
+    Args:
+        gold: The gold relations, see get_gold_relations.
+        preds: The predicted nodeset.
+        nodeset_id: The ID of the nodeset (for logging).
+        verbose: Whether to show verbose output.
+        sparse: Whether to compute the scores from confusion counts of the related node pairs
+            instead of materializing labels for all candidate pairs.
+        metrics_backend: See handle_true_pred. Has no effect if sparse is True.
+        preds_adjacency: The result of get_adjacency(preds), if already available.
+        return_disagreements: Whether to add the pairs where the gold and the predicted labels
+            differ (see get_disagreements) to the result (key: "disagreements"). If enabled, the
+            verbose output does not show the labels of all candidate pairs.
+        return_confusion_counts: Whether to add the confusion counts of all candidate pairs (see
+            get_nodeset_confusion_counts) to the result (key: "confusion_counts") as a list of
+            (gold label, predicted label, count) entries, so that it can be stored as JSON. Use
+            pop_confusion_counts to get them back.
+
+    Returns:
+        The general and focused precision, recall and F1 scores.
+    """
+    pred_pair2label = get_predicted_pair2label(preds, gold, adjacency=preds_adjacency)
+    none_label = NONE_LABELS[gold["mode"]]
+
+    confusion = None
+    if sparse or return_confusion_counts:
+        confusion = get_nodeset_confusion_counts(gold, pred_pair2label)
+
+    result: Dict[str, Any]
+    if sparse:
+        result = handle_confusion_counts(
+            confusion=confusion,
+            focused_value=none_label,
+            nodeset_id=nodeset_id,
+            verbose=verbose,
+        )
+    else:
+        true_pair2label = gold["pair2label"]
+        y_true = []
+        y_pred = []
+        for comb in get_candidate_pairs(gold):
+            y_true.append(true_pair2label.get(comb, none_label))
+            y_pred.append(pred_pair2label.get(comb, none_label))
+
+        result = handle_true_pred(
+            y_true=y_true,
+            y_pred=y_pred,
+            focused_value=none_label,
+            nodeset_id=nodeset_id,
+            verbose=verbose,
+            metrics_backend=metrics_backend,
+            show_labels=not return_disagreements,
+        )
+
+    if return_disagreements:
+        result["disagreements"] = get_disagreements(gold, pred_pair2label)
+        if verbose:
+            print(f"{len(result['disagreements'])} disagreements")
+    if return_confusion_counts:
+        result["confusion_counts"] = [
+            [true_label, pred_label, count]
+            for (true_label, pred_label), count in confusion.items()
+        ]
+    return result
+
 
 def eval_arguments(
     nodeset_id: str,
     predictions_dir: str,
     gold_dir: str,
     nodeset: Optional[Nodeset] = None,
-    verbose: bool = True,
+    **kwargs,
 ) -> Dict[str, Dict[str, float]]:
 
     preds = read_nodeset(predictions_dir, nodeset_id) if nodeset is None else nodeset
     truth = read_nodeset(gold_dir, nodeset_id)
-
-    proposition_dict = {}
-    proposition_list = []
-    true_inference_list = []
-    true_conflict_list = []
-    true_rephrase_list = []
-    pred_inference_list = []
-    pred_conflict_list = []
-    pred_rephrase_list = []
-
-    # Get the list of proposition nodes
-    for node in truth["nodes"]:
-        if node["type"] == "I":
-            proposition_list.append(node["nodeID"])
-            proposition_dict[node["nodeID"]] = node["text"]
-
-    # Check truth relations
-    for node in truth["nodes"]:
-        if node["type"] == "RA":
-            inference_id = node["nodeID"]
-
-            for edge in truth["edges"]:
-                if edge["fromID"] == inference_id:
-                    conclusion_id = edge["toID"]
-                    for edge in truth["edges"]:
-                        if edge["toID"] == inference_id:
-                            premise_id = edge["fromID"]
-                            if premise_id in proposition_list:
-                                true_inference_list.append([premise_id, conclusion_id, 0])
-                    break
-
-        elif node["type"] == "CA":
-            conflict_id = node["nodeID"]
-
-            for edge in truth["edges"]:
-                if edge["fromID"] == conflict_id:
-                    conf_to = edge["toID"]
-                    for edge in truth["edges"]:
-                        if edge["toID"] == conflict_id:
-                            conf_from = edge["fromID"]
-                            if conf_from in proposition_list:
-                                true_conflict_list.append([conf_from, conf_to, 1])
-                    break
-
-        elif node["type"] == "MA":
-            rephrase_id = node["nodeID"]
-
-            for edge in truth["edges"]:
-                if edge["fromID"] == rephrase_id:
-                    reph_to = edge["toID"]
-                    for edge in truth["edges"]:
-                        if edge["toID"] == rephrase_id:
-                            reph_from = edge["fromID"]
-                            if reph_from in proposition_list:
-                                true_rephrase_list.append([reph_from, reph_to, 2])
-                    break
-
-    # Check predicted relation
-    for node in preds["nodes"]:
-        if node["type"] == "RA":
-            inference_id = node["nodeID"]
-
-            for edge in preds["edges"]:
-                if edge["fromID"] == inference_id:
-                    conclusion_id = edge["toID"]
-                    for edge in preds["edges"]:
-                        if edge["toID"] == inference_id:
-                            premise_id = edge["fromID"]
-                            if premise_id in proposition_list:
-                                pred_inference_list.append([premise_id, conclusion_id, 0])
-                    break
-
-        elif node["type"] == "CA":
-            conflict_id = node["nodeID"]
-
-            for edge in preds["edges"]:
-                if edge["fromID"] == conflict_id:
-                    conf_to = edge["toID"]
-                    for edge in preds["edges"]:
-                        if edge["toID"] == conflict_id:
-                            conf_from = edge["fromID"]
-                            if conf_from in proposition_list:
-                                pred_conflict_list.append([conf_from, conf_to, 1])
-                    break
-
-        elif node["type"] == "MA":
-            rephrase_id = node["nodeID"]
-
-            for edge in preds["edges"]:
-                if edge["fromID"] == rephrase_id:
-                    reph_to = edge["toID"]
-                    for edge in preds["edges"]:
-                        if edge["toID"] == rephrase_id:
-                            reph_from = edge["fromID"]
-                            if reph_from in proposition_list:
-                                pred_rephrase_list.append([reph_from, reph_to, 2])
-                    break
-
-    # ID to text
-    """
-    text_inference_list = []
-    for inference in inference_list:
-        text_inference_list.append([proposition_dict[inference[0]], proposition_dict[inference[1]], 1])
-    text_conflict_list = []
-    for conflict in conflict_list:
-        text_conflict_list.append([proposition_dict[conflict[0]], proposition_dict[conflict[1]], 2])
-    text_rephrase_list = []
-    for rephrase in rephrase_list:
-        text_rephrase_list.append([proposition_dict[rephrase[0]], proposition_dict[rephrase[1]], 3])
-    """
-
-    p_c = itertools.permutations(proposition_list, 2)
-    proposition_combinations = []
-    for p in p_c:
-        proposition_combinations.append([p[0], p[1]])
-
-    y_true = []
-    y_pred = []
-    for comb in proposition_combinations:
-        added_true = False
-        added_pred = False
-
-        # Prepare Y true
-        for inference in true_inference_list:
-            if inference[0] == comb[0] and inference[1] == comb[1]:
-                y_true.append(0)
-                added_true = True
-                break
-        if not added_true:
-            for conflict in true_conflict_list:
-                if conflict[0] == comb[0] and conflict[1] == comb[1]:
-                    y_true.append(1)
-                    added_true = True
-                    break
-        if not added_true:
-            for rephrase in true_rephrase_list:
-                if rephrase[0] == comb[0] and rephrase[1] == comb[1]:
-                    y_true.append(2)
-                    added_true = True
-                    break
-        if not added_true:
-            y_true.append(3)
-
-        # Prepare Y pred
-        for inference in pred_inference_list:
-            if inference[0] == comb[0] and inference[1] == comb[1]:
-                y_pred.append(0)
-                added_pred = True
-                break
-        if not added_pred:
-            for conflict in pred_conflict_list:
-                if conflict[0] == comb[0] and conflict[1] == comb[1]:
-                    y_pred.append(1)
-                    added_pred = True
-                    break
-        if not added_pred:
-            for rephrase in pred_rephrase_list:
-                if rephrase[0] == comb[0] and rephrase[1] == comb[1]:
-                    y_pred.append(2)
-                    added_pred = True
-                    break
-        if not added_pred:
-            y_pred.append(3)
-
-    return handle_true_pred(
-        y_true=y_true, y_pred=y_pred, focused_value=3, nodeset_id=nodeset_id, verbose=verbose
-    )
+    gold = get_gold_relations(truth, mode="arguments")
+    return score_predictions(gold=gold, preds=preds, nodeset_id=nodeset_id, **kwargs)
 
 
 def eval_illocutions(
@@ -199,103 +487,44 @@ def eval_illocutions(
     predictions_dir: str,
     gold_dir: str,
     nodeset: Optional[Nodeset] = None,
-    verbose: bool = True,
+    **kwargs,
 ) -> Dict[str, Dict[str, float]]:
 
     preds = read_nodeset(predictions_dir, nodeset_id) if nodeset is None else nodeset
     truth = read_nodeset(gold_dir, nodeset_id)
+    gold = get_gold_relations(truth, mode="illocutions")
+    return score_predictions(gold=gold, preds=preds, nodeset_id=nodeset_id, **kwargs)
 
-    proposition_dict = {}
-    proposition_list = []
-    locution_dict = {}
-    locution_list = []
-    true_illocution_list = []
-    pred_illocution_list = []
 
-    # Get the list of proposition and locution nodes
-    for node in truth["nodes"]:
-        if node["type"] == "I":
-            proposition_list.append(node["nodeID"])
-            proposition_dict[node["nodeID"]] = node["text"]
-        elif node["type"] == "L":
-            locution_list.append(node["nodeID"])
-            locution_dict[node["nodeID"]] = node["text"]
-
-    proploc_list = proposition_list + locution_list
-
-    # Check truth illocutions
-    for node in truth["nodes"]:
-        if node["type"] == "YA":
-            illocution_id = node["nodeID"]
-            illocution_type = node["text"]
-
-            for edge in truth["edges"]:
-                if edge["fromID"] == illocution_id:
-                    target_id = edge["toID"]
-                    for edge in truth["edges"]:
-                        if edge["toID"] == illocution_id:
-                            source_id = edge["fromID"]
-                            if source_id in proploc_list and target_id in proploc_list:
-                                true_illocution_list.append(
-                                    [source_id, target_id, illocution_type]
-                                )
-                    break
-
-    # Check predicted illocutions
-    for node in preds["nodes"]:
-        if node["type"] == "YA":
-            illocution_id = node["nodeID"]
-            illocution_type = node["text"]
-
-            for edge in preds["edges"]:
-                if edge["fromID"] == illocution_id:
-                    target_id = edge["toID"]
-                    for edge in preds["edges"]:
-                        if edge["toID"] == illocution_id:
-                            source_id = edge["fromID"]
-                            if source_id in proploc_list and target_id in proploc_list:
-                                pred_illocution_list.append(
-                                    [source_id, target_id, illocution_type]
-                                )
-                    break
-
-    # print(true_illocution_list)
-    # print(pred_illocution_list)
-
-    p_c = itertools.product(locution_list, proposition_list)
-    proploc_combinations = []
-    for p in p_c:
-        proploc_combinations.append([p[0], p[1]])
-
-    y_true = []
-    y_pred = []
-    for comb in proploc_combinations:
-        added_true = False
-        added_pred = False
-
-        # Prepare Y true
-        for illocution in true_illocution_list:
-            if illocution[0] == comb[0] and illocution[1] == comb[1]:
-                y_true.append(illocution[2])
-                added_true = True
-                break
-
-        if not added_true:
-            y_true.append("None")
-
-        # Prepare Y pred
-        for illocution in pred_illocution_list:
-            if illocution[0] == comb[0] and illocution[1] == comb[1]:
-                y_pred.append(illocution[2])
-                added_pred = True
-                break
-
-        if not added_pred:
-            y_pred.append("None")
-
-    return handle_true_pred(
-        y_true=y_true, y_pred=y_pred, focused_value="None", nodeset_id=nodeset_id, verbose=verbose
-    )
+def eval_all(
+    nodeset_id: str,
+    predictions_dir: str,
+    gold_dir: str,
+    nodeset: Optional[Nodeset] = None,
+    **kwargs,
+) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Evaluate arguments and illocutions at once. Each nodeset is read only once and the
+    adjacency of the predicted and the gold nodeset is shared between both evaluations.
+
+    Returns:
+        A mapping from the evaluation mode ("arguments" or "illocutions") to the result of
+        eval_arguments or eval_illocutions, respectively.
+    """
+
+    preds = read_nodeset(predictions_dir, nodeset_id) if nodeset is None else nodeset
+    truth = read_nodeset(gold_dir, nodeset_id)
+    preds_adjacency = get_adjacency(preds)
+    truth_adjacency = get_adjacency(truth)
+    return {
+        mode: score_predictions(
+            gold=get_gold_relations(truth, mode=mode, adjacency=truth_adjacency),
+            preds=preds,
+            nodeset_id=nodeset_id,
+            preds_adjacency=preds_adjacency,
+            **kwargs,
+        )
+        for mode in EVALUATION_MODES
+    }
 
 
 def handle_true_pred(
@@ -304,8 +533,24 @@ def handle_true_pred(
     focused_value: Union[str, int],
     nodeset_id: str,
     verbose: bool = True,
+    metrics_backend: str = "numpy",
+    show_labels: bool = True,
 ):
-    if verbose:
+    if metrics_backend == "numpy":
+        compute_scores = precision_recall_fscore
+    elif metrics_backend == "sklearn":
+        # reference implementation, imported only on demand because importing sklearn is slow
+        from sklearn.metrics import precision_recall_fscore_support
+
+        def compute_scores(y_true, y_pred, zero_division):
+            return precision_recall_fscore_support(
+                y_true, y_pred, average="macro", zero_division=zero_division
+            )[:3]
+
+    else:
+        raise ValueError(f"Unknown metrics backend: {metrics_backend}")
+
+    if verbose and show_labels:
         print(y_true)
         print(y_pred)
 
@@ -318,17 +563,16 @@ def handle_true_pred(
 
     zero_division: Union[str, float]
     if verbose:
-        print(focused_true)
-        print(focused_pred)
+        if show_labels:
+            print(focused_true)
+            print(focused_pred)
         zero_division = "warn"
     else:
         zero_division = 0.0
 
     result = {}
     if len(y_true) > 0:
-        result_general = precision_recall_fscore_support(
-            y_true, y_pred, average="macro", zero_division=zero_division
-        )
+        result_general = compute_scores(y_true, y_pred, zero_division=zero_division)
         if verbose:
             print("General", result_general)
         result["general"] = {
@@ -340,9 +584,7 @@ def handle_true_pred(
         logger.warning(f"nodeset_id={nodeset_id}: No true relations found")
 
     if len(focused_true) > 0:
-        result_focused = precision_recall_fscore_support(
-            focused_true, focused_pred, average="macro", zero_division=zero_division
-        )
+        result_focused = compute_scores(focused_true, focused_pred, zero_division=zero_division)
         if verbose:
             print("Focused", result_focused)
         result["focused"] = {
@@ -356,11 +598,95 @@ def handle_true_pred(
     return result
 
 
+def get_confusion_counts(
+    true_pair2label: Dict[Tuple[str, str], Label],
+    pred_pair2label: Dict[Tuple[str, str], Label],
+    pair2weight: Callable[[Tuple[str, str]], int],
+    num_pairs: int,
+    none_label: Label,
+) -> Dict[Tuple[Label, Label], int]:
+    """Get the confusion counts for all candidate pairs without materializing them. Only the pairs
+    that are related in the gold or predicted data are visited, the remaining ones are counted as
+    (none_label, none_label).
+
+    Args:
+        true_pair2label: A mapping from (source ID, target ID) pairs to gold labels.
+        pred_pair2label: A mapping from (source ID, target ID) pairs to predicted labels.
+        pair2weight: Returns how often a pair occurs in the candidate pairs (0 if not a candidate).
+        num_pairs: The total number of candidate pairs.
+        none_label: The label for pairs without relation.
+
+    Returns:
+        A mapping from (gold label, predicted label) to the number of candidate pairs.
+    """
+    confusion: Dict[Tuple[Label, Label], int] = Counter()
+    for pair in true_pair2label.keys() | pred_pair2label.keys():
+        weight = pair2weight(pair)
+        if weight > 0:
+            true_label = true_pair2label.get(pair, none_label)
+            pred_label = pred_pair2label.get(pair, none_label)
+            confusion[(true_label, pred_label)] += weight
+    num_none = num_pairs - sum(confusion.values())
+    if num_none > 0:
+        confusion[(none_label, none_label)] = num_none
+    return confusion
+
+
+def handle_confusion_counts(
+    confusion: Dict[Tuple[Label, Label], int],
+    focused_value: Union[str, int],
+    nodeset_id: str,
+    verbose: bool = True,
+) -> Dict[str, Dict[str, float]]:
+    """Same as handle_true_pred, but works on confusion counts as returned by
+    get_confusion_counts."""
+
+    labels = sorted({label for label_pair in confusion for label in label_pair})
+    label2idx = {label: idx for idx, label in enumerate(labels)}
+    confusion_matrix = np.zeros((len(labels), len(labels)), dtype=np.int64)
+    for (true_label, pred_label), count in confusion.items():
+        confusion_matrix[label2idx[true_label], label2idx[pred_label]] += count
+
+    # the focused evaluation ignores all pairs without gold relation
+    focused_confusion_matrix = confusion_matrix.copy()
+    if focused_value in label2idx:
+        focused_confusion_matrix[label2idx[focused_value]] = 0
+
+    zero_division: Union[str, float]
+    if verbose:
+        print(labels)
+        print(confusion_matrix)
+        zero_division = "warn"
+    else:
+        zero_division = 0.0
+
+    result = {}
+    if confusion_matrix.sum() > 0:
+        result_general = macro_precision_recall_fscore(confusion_matrix, zero_division)
+        if verbose:
+            print("General", result_general)
+        result["general"] = dict(zip(["p", "r", "f1"], result_general))
+    else:
+        logger.warning(f"nodeset_id={nodeset_id}: No true relations found")
+
+    if focused_confusion_matrix.sum() > 0:
+        result_focused = macro_precision_recall_fscore(focused_confusion_matrix, zero_division)
+        if verbose:
+            print("Focused", result_focused)
+        result["focused"] = dict(zip(["p", "r", "f1"], result_focused))
+    else:
+        logger.warning(f"nodeset_id={nodeset_id}: No focused true relations found")
+
+    return result
+
+
 def eval_single_nodeset(mode: str, **kwargs):
     if mode == "arguments":
         return eval_arguments(**kwargs)
     elif mode == "illocutions":
         return eval_illocutions(**kwargs)
+    elif mode == "all":
+        return eval_all(**kwargs)
     else:
         raise ValueError(f"Unknown mode: {mode}")
 
@@ -378,48 +704,639 @@ def flatten_dict(d: Dict[str, Any], sep: str = ".") -> Dict[str, Any]:
     return dict(items())
 
 
+def get_mode2gold(truth: Nodeset, modes: List[str]) -> Dict[str, GoldRelations]:
+    """Extract the gold relations of a gold nodeset for each evaluation mode."""
+
+    truth_adjacency = get_adjacency(truth)
+    return {
+        mode: get_gold_relations(truth, mode=mode, adjacency=truth_adjacency) for mode in modes
+    }
+
+
+def get_mode2confusion(
+    nodeset: Nodeset, mode2gold: Dict[str, GoldRelations]
+) -> Dict[str, Dict[Tuple[Any, Any], int]]:
+    """Get the confusion counts of a predicted nodeset for each mode in mode2gold."""
+
+    adjacency = get_adjacency(nodeset)
+    return {
+        mode: get_nodeset_confusion_counts(
+            gold, get_predicted_pair2label(nodeset, gold, adjacency)
+        )
+        for mode, gold in mode2gold.items()
+    }
+
+
+def get_confusion_counts_with_cached_gold(
+    nodeset: Nodeset,
+    nodeset_id: str,
+    gold_dir: str,
+    modes: List[str],
+    gold_cache: Optional[Dict[str, Dict[str, GoldRelations]]] = None,
+) -> Dict[str, Dict[Tuple[Any, Any], int]]:
+    """Get the confusion counts per evaluation mode for a predicted nodeset. The gold relations
+    are read and extracted only once per nodeset if a gold_cache is provided."""
+
+    if gold_cache is not None and nodeset_id in gold_cache:
+        mode2gold = gold_cache[nodeset_id]
+    else:
+        mode2gold = get_mode2gold(read_nodeset(gold_dir, nodeset_id), modes)
+        if gold_cache is not None:
+            gold_cache[nodeset_id] = mode2gold
+    return get_mode2confusion(nodeset, mode2gold)
+
+
+def get_run_confusion_counts(
+    nodeset: Nodeset,
+    nodeset_id: str,
+    predictions_dirs: List[str],
+    modes: List[str],
+    nodeset2runs: Dict[str, List[int]],
+) -> Dict[int, Union[Dict[str, Dict[Tuple[Any, Any], int]], Exception]]:
+    """Get the confusion counts per run and mode for a gold nodeset. The gold relations are
+    extracted once and compared with the predicted nodeset of each run that contains the nodeset
+    (see nodeset2runs). An error of a single run is returned instead of its confusion counts."""
+
+    mode2gold = get_mode2gold(nodeset, modes)
+    result: Dict[int, Union[Dict[str, Dict[Tuple[Any, Any], int]], Exception]] = {}
+    for run_idx in nodeset2runs[nodeset_id]:
+        try:
+            predicted = read_nodeset(predictions_dirs[run_idx], nodeset_id)
+            result[run_idx] = get_mode2confusion(predicted, mode2gold)
+        except Exception as e:
+            result[run_idx] = e
+    return result
+
+
+def get_confusion_matrices(
+    confusions: List[Dict[Tuple[Any, Any], int]], labels: List[Any]
+) -> np.ndarray:
+    """Convert confusion counts (as returned by get_confusion_counts) into an array of shape
+    (len(confusions), len(labels), len(labels))."""
+
+    label2idx = {label: idx for idx, label in enumerate(labels)}
+    confusion_matrices = np.zeros((len(confusions), len(labels), len(labels)), np.int64)
+    for batch_idx, confusion in enumerate(confusions):
+        for (true_label, pred_label), count in confusion.items():
+            confusion_matrices[batch_idx, label2idx[true_label], label2idx[pred_label]] += count
+    return confusion_matrices
+
+
+def batched_score_confusion_counts(
+    confusions: List[Dict[Tuple[Any, Any], int]], focused_value: Union[str, int]
+) -> Dict[str, np.ndarray]:
+    """Compute the general and focused scores for multiple confusion counts (as returned by
+    get_confusion_counts) at once. Returns a mapping from "general" and "focused" to arrays of
+    shape (len(confusions), 3) with precision, recall and F1. Empty confusions result in NaN."""
+
+    labels = sorted({label for confusion in confusions for pair in confusion for label in pair})
+    return batched_general_and_focused_scores(
+        get_confusion_matrices(confusions, labels),
+        focused_index=labels.index(focused_value) if focused_value in labels else None,
+    )
+
+
+def collect_confusion_counts(
+    predictions_dir: str,
+    gold_dir: str,
+    modes: List[str],
+    show_progress: bool = True,
+    num_workers: int = 0,
+    **kwargs,
+) -> Dict[str, Dict[str, Dict[Tuple[Any, Any], int]]]:
+    """Get the confusion counts per nodeset and mode for all nodesets in predictions_dir.
+
+    Args:
+        predictions_dir: The directory containing the predicted nodesets.
+        gold_dir: The directory containing the gold nodesets.
+        modes: The evaluation modes, see EVALUATION_MODES.
+        show_progress: Whether to show a progress bar.
+        num_workers: See process_all_nodesets.
+        **kwargs: Additional arguments for process_all_nodesets and
+            get_confusion_counts_with_cached_gold, e.g. nodeset_whitelist or gold_cache.
+
+    Returns:
+        A mapping from nodeset IDs to mappings from modes to confusion counts. Nodesets that
+        could not be processed are missing.
+    """
+    nodeset2confusions = {}
+    for nodeset_id, result_or_error in process_all_nodesets(
+        func=get_confusion_counts_with_cached_gold,
+        nodeset_dir=predictions_dir,
+        show_progress=show_progress,
+        num_workers=num_workers,
+        gold_dir=gold_dir,
+        modes=modes,
+        **kwargs,
+    ):
+        if isinstance(result_or_error, Exception):
+            logger.error(
+                f"run={predictions_dir}, nodeset={nodeset_id}: Failed to process: "
+                f"{result_or_error}"
+            )
+        else:
+            nodeset2confusions[nodeset_id] = result_or_error
+    return nodeset2confusions
+
+
+def save_confusion_counts(
+    path: str,
+    nodeset2confusions: Dict[str, Dict[str, Dict[Tuple[Any, Any], int]]],
+    modes: List[str],
+) -> None:
+    """Save confusion counts as returned by collect_confusion_counts to a compressed NumPy file
+    (.npz). The file contains the following arrays:
+        - "nodeset_ids": the IDs of the nodesets, shape (num_nodesets,)
+        - "<mode>.labels": the labels (as strings) per mode, shape (num_labels,)
+        - "<mode>.none_index": the index of the label that encodes "no relation"
+        - "<mode>.confusion": the confusion matrices (rows: gold, columns: predicted labels) per
+          nodeset, shape (num_nodesets, num_labels, num_labels)
+    See src/evaluation/bootstrap.py to compute confidence intervals from these files.
+    """
+
+    nodeset_ids = sorted(nodeset2confusions)
+    arrays = {"nodeset_ids": np.array(nodeset_ids, dtype=str)}
+    for mode in modes:
+        confusions = [nodeset2confusions[nodeset_id][mode] for nodeset_id in nodeset_ids]
+        labels = sorted(
+            {label for confusion in confusions for pair in confusion for label in pair}
+            | {NONE_LABELS[mode]}
+        )
+        arrays[f"{mode}.labels"] = np.array([str(label) for label in labels], dtype=str)
+        arrays[f"{mode}.none_index"] = np.array(labels.index(NONE_LABELS[mode]))
+        arrays[f"{mode}.confusion"] = get_confusion_matrices(confusions, labels)
+    np.savez_compressed(path, **arrays)
+
+
+def collect_run_confusion_counts(
+    predictions_dirs: List[str],
+    gold_dir: str,
+    modes: List[str],
+    show_progress: bool = True,
+    num_workers: int = 0,
+    **kwargs,
+) -> Dict[str, Dict[int, Dict[str, Dict[Tuple[Any, Any], int]]]]:
+    """Get the confusion counts of multiple prediction runs against the same gold data. The gold
+    nodesets are parsed only once: each nodeset is processed in a single task (e.g. by one worker)
+    for all runs.
+
+    Args:
+        predictions_dirs: The directories containing the predicted nodesets, one per run.
+        gold_dir: The directory containing the gold nodesets.
+        modes: The evaluation modes, see EVALUATION_MODES.
+        show_progress: Whether to show a progress bar.
+        num_workers: See process_all_nodesets.
+        **kwargs: Additional arguments for process_all_nodesets, e.g. nodeset_whitelist.
+
+    Returns:
+        A mapping from nodeset IDs to mappings from run indices to mappings from modes to
+        confusion counts. Nodesets that could not be processed for a run are missing.
+    """
+    nodeset_whitelist = kwargs.pop("nodeset_whitelist", None)
+    # the indices of the runs per nodeset (all runs for whitelisted nodesets)
+    nodeset2runs: Dict[str, List[int]] = defaultdict(list)
+    for run_idx, predictions_dir in enumerate(predictions_dirs):
+        if nodeset_whitelist is not None:
+            run_nodeset_ids = nodeset_whitelist
+        else:
+            run_nodeset_ids = get_nodeset_ids_from_directory(predictions_dir)
+        for nodeset_id in run_nodeset_ids:
+            nodeset2runs[nodeset_id].append(run_idx)
+
+    nodeset2confusions: Dict[str, Dict[int, Dict[str, Dict[Tuple[Any, Any], int]]]]
+    nodeset2confusions = defaultdict(dict)
+    for nodeset_id, result_or_error in process_all_nodesets(
+        func=get_run_confusion_counts,
+        nodeset_dir=gold_dir,
+        show_progress=show_progress,
+        num_workers=num_workers,
+        nodeset_whitelist=list(nodeset2runs),
+        predictions_dirs=predictions_dirs,
+        modes=modes,
+        nodeset2runs=dict(nodeset2runs),
+        **kwargs,
+    ):
+        if isinstance(result_or_error, Exception):
+            # the gold nodeset could not be processed
+            run2result = {run_idx: result_or_error for run_idx in nodeset2runs[nodeset_id]}
+        else:
+            run2result = result_or_error
+        for run_idx, mode2confusion_or_error in run2result.items():
+            if isinstance(mode2confusion_or_error, Exception):
+                logger.error(
+                    f"run={predictions_dirs[run_idx]}, nodeset={nodeset_id}: Failed to process: "
+                    f"{mode2confusion_or_error}"
+                )
+            else:
+                nodeset2confusions[nodeset_id][run_idx] = mode2confusion_or_error
+    return dict(nodeset2confusions)
+
+
+def score_run_confusion_counts(
+    nodeset2confusions: Dict[str, Dict[int, Dict[str, Dict[Tuple[Any, Any], int]]]],
+    predictions_dirs: List[str],
+    mode: str,
+) -> List[Dict[str, Dict[str, Any]]]:
+    """Compute the scores of multiple runs from their confusion counts (as returned by
+    collect_run_confusion_counts). The scores of all runs are computed at once per nodeset.
+
+    Returns:
+        A list with the results per run. Each result maps the nodeset IDs to the scores in the
+        format of eval_single_nodeset.
+    """
+    modes = EVALUATION_MODES if mode == "all" else [mode]
+    results: List[Dict[str, Dict[str, Any]]] = [{} for _ in predictions_dirs]
+    for nodeset_id, run2confusions in nodeset2confusions.items():
+        run_indices = sorted(run2confusions)
+        run_results: List[Dict[str, Any]] = [{} for _ in run_indices]
+        for current_mode in modes:
+            scores = batched_score_confusion_counts(
+                [run2confusions[run_idx][current_mode] for run_idx in run_indices],
+                focused_value=NONE_LABELS[current_mode],
+            )
+            for batch_idx, run_idx in enumerate(run_indices):
+                # use nested results per mode for mode="all", see eval_all
+                if mode == "all":
+                    mode_result = run_results[batch_idx].setdefault(current_mode, {})
+                else:
+                    mode_result = run_results[batch_idx]
+                for name, values in scores.items():
+                    # empty confusion counts result in NaN, see batched_score_confusion_counts
+                    if np.isnan(values[batch_idx]).all():
+                        logger.warning(
+                            f"run={predictions_dirs[run_idx]}, nodeset_id={nodeset_id}: "
+                            f"No {name} true relations found"
+                        )
+                        continue
+                    mode_result[name] = dict(zip(["p", "r", "f1"], values[batch_idx].tolist()))
+        for batch_idx, run_idx in enumerate(run_indices):
+            results[run_idx][nodeset_id] = run_results[batch_idx]
+    return results
+
+
+def get_stat_values(
+    nodeset_id2result: Dict[str, Dict[str, Any]], run_name: str
+) -> Dict[str, List[float]]:
+    """Get the values per nodeset of each (flattened) statistic, e.g. "general.f1". Nodesets
+    with NaN values are skipped."""
+
+    stat_name2values: Dict[str, List[float]] = defaultdict(list)
+    for nodeset_id, result in nodeset_id2result.items():
+        result_flat = flatten_dict(result, sep=".")
+        if any(math.isnan(stat_value) for stat_value in result_flat.values()):
+            logger.error(
+                f"run={run_name}, nodeset={nodeset_id}: NaN value found in result, skipping this "
+                f"nodeset: {result_flat}"
+            )
+            continue
+        for stat_name, stat_value in result_flat.items():
+            stat_name2values[stat_name].append(stat_value)
+    return dict(stat_name2values)
+
+
+def evaluate_runs(
+    predictions_dirs: List[str],
+    gold_dir: str,
+    mode: str,
+    show_progress: bool = True,
+    num_workers: int = 0,
+    **kwargs,
+) -> List[Dict[str, List[float]]]:
+    """Evaluate multiple prediction runs against the same gold data. The gold nodesets are parsed
+    only once, see collect_run_confusion_counts and score_run_confusion_counts.
+
+    Args:
+        predictions_dirs: The directories containing the predicted nodesets, one per run.
+        gold_dir: The directory containing the gold nodesets.
+        mode: The evaluation mode, either "arguments", "illocutions" or "all". For "all", the
+            statistic names are prefixed with the respective mode (e.g. "arguments.general.f1").
+        show_progress: Whether to show a progress bar.
+        num_workers: See process_all_nodesets.
+        **kwargs: Additional arguments for process_all_nodesets, e.g. nodeset_whitelist.
+
+    Returns:
+        A list with the results per run. Each result maps the (flattened) statistic names to the
+        values per nodeset.
+    """
+    nodeset2confusions = collect_run_confusion_counts(
+        predictions_dirs=predictions_dirs,
+        gold_dir=gold_dir,
+        modes=EVALUATION_MODES if mode == "all" else [mode],
+        show_progress=show_progress,
+        num_workers=num_workers,
+        **kwargs,
+    )
+    results = score_run_confusion_counts(nodeset2confusions, predictions_dirs, mode=mode)
+    return [
+        get_stat_values(nodeset_id2result, run_name=predictions_dir)
+        for predictions_dir, nodeset_id2result in zip(predictions_dirs, results)
+    ]
+
+
+def get_nodeset_hash(nodeset_dir: str, nodeset_id: str) -> str:
+    """Get the content hash of a nodeset in a directory or in a nodeset pack (for the result
+    cache)."""
+
+    pack = get_nodeset_pack(nodeset_dir)
+    if pack is not None:
+        return pack.get_nodeset_hash(nodeset_id)
+    return get_file_hash(get_nodeset_filename(nodeset_dir, nodeset_id))
+
+
+def get_result_cache(cache_dir: str, **kwargs) -> ResultCache:
+    """Get the cache for the per-nodeset results of eval_single_nodeset. The kwargs are the
+    evaluation settings passed to eval_single_nodeset."""
+
+    settings = {
+        key: kwargs.get(key)
+        for key in ["mode", "sparse", "metrics_backend", "return_confusion_counts"]
+    }
+    # the reading of the nodesets (and the relation extraction) also affects the results
+    version = get_source_version(
+        [
+            __file__,
+            prf_metrics.__file__,
+            nodeset_utils.__file__,
+            json_utils.__file__,
+            nodeset_pack.__file__,
+        ]
+    )
+    return ResultCache(cache_dir=cache_dir, version=version, settings=settings)
+
+
+def get_mean_result(results: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, float]:
+    """Get the mean over the (flattened) results per nodeset. Nodesets with NaN values are
+    skipped.
+
+    Args:
+        results: (nodeset ID, result) tuples where the results are as returned by
+            eval_single_nodeset.
+
+    Returns:
+        A mapping from the statistic names (e.g. "general.f1") to the mean values.
+    """
+    stat_name2values = defaultdict(list)
+    for nodeset_id, result in results:
+        result_flat = flatten_dict(result, sep=".")
+        if any(math.isnan(stat_value) for stat_value in result_flat.values()):
+            logger.error(
+                f"nodeset={nodeset_id}: NaN value found in result, skipping this nodeset: {result_flat}"
+            )
+            continue
+        for stat_name, stat_value in result_flat.items():
+            stat_name2values[stat_name].append(stat_value)
+    return {
+        stat_name: sum(stat_values) / len(stat_values)
+        for stat_name, stat_values in stat_name2values.items()
+    }
+
+
+def save_results_to_db(
+    path: str,
+    run_name: str,
+    mode: str,
+    nodeset_id2result: Dict[str, Dict[str, Any]],
+    nodeset2confusions: Dict[str, Dict[str, Dict[Tuple[Any, Any], int]]],
+    settings: Dict[str, Any],
+) -> None:
+    """Save the results per nodeset (as returned by eval_single_nodeset) and the confusion counts
+    (see pop_confusion_counts) to a results database, see
+    src/evaluation/results_db.py."""
+
+    with ResultsDatabase(path) as database:
+        run_id = database.add_run(run_name, evaluator="eval_official", settings=settings)
+        for nodeset_id, result in nodeset_id2result.items():
+            mode2result = result if mode == "all" else {mode: result}
+            for current_mode, mode_result in mode2result.items():
+                database.add_scores(run_id, nodeset_id, current_mode, flatten_dict(mode_result))
+        for nodeset_id, mode2confusion in nodeset2confusions.items():
+            for current_mode, confusion in mode2confusion.items():
+                confusion_with_names = {
+                    (
+                        get_label_name(true_label, current_mode),
+                        get_label_name(pred_label, current_mode),
+                    ): count
+                    for (true_label, pred_label), count in confusion.items()
+                }
+                database.add_confusion_counts(
+                    run_id, nodeset_id, current_mode, confusion_with_names
+                )
+
+
 def main(
-    predictions_dir: str, nodeset_id: Optional[str] = None, show_progress: bool = True, **kwargs
+    predictions_dir: Union[str, List[str]],
+    nodeset_id: Optional[str] = None,
+    show_progress: bool = True,
+    num_workers: int = 0,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    no_cache: bool = False,
+    confusion_counts_file: Optional[str] = None,
+    disagreements_file: Optional[str] = None,
+    results_db: Optional[str] = None,
+    run_name: Optional[str] = None,
+    **kwargs,
 ):
+    if not isinstance(predictions_dir, str):
+        if len(predictions_dir) > 1:
+            if run_name is not None:
+                raise ValueError(
+                    "run_name can not be used when evaluating multiple runs, the runs are named "
+                    "by their predictions directory"
+                )
+            if confusion_counts_file is not None:
+                logger.warning("confusion counts are not saved when evaluating multiple runs")
+            if disagreements_file is not None:
+                logger.warning("disagreements are not saved when evaluating multiple runs")
+            main_multi_run(
+                predictions_dirs=predictions_dir,
+                nodeset_id=nodeset_id,
+                show_progress=show_progress,
+                num_workers=num_workers,
+                results_db=results_db,
+                **kwargs,
+            )
+            return
+        predictions_dir = predictions_dir[0]
+
+    disagreement_writer = None
+    if disagreements_file is not None:
+        disagreement_writer = DisagreementWriter(disagreements_file)
+        kwargs["return_disagreements"] = True
+        if not no_cache and nodeset_id is None:
+            logger.info("the result cache is disabled because disagreements are requested")
+            no_cache = True
+    if nodeset_id is None and (confusion_counts_file is not None or results_db is not None):
+        # collect the confusion counts in the same pass as the scores (they are also cached)
+        kwargs["return_confusion_counts"] = True
+    nodeset2confusions: Dict[str, Dict[str, Dict[Tuple[Any, Any], int]]] = {}
+
     if nodeset_id is not None:
         result = eval_single_nodeset(
             nodeset_id=nodeset_id, predictions_dir=predictions_dir, **kwargs
         )
+        if disagreement_writer is not None:
+            write_disagreements(disagreement_writer, nodeset_id, kwargs["mode"], result)
         print(result)
     else:
-        result = defaultdict(list)
+        nodeset_ids = get_nodeset_ids_from_directory(predictions_dir)
+        nodeset_id2result: Dict[str, Dict[str, Any]] = {}
+        cache = None if no_cache else get_result_cache(cache_dir=cache_dir, **kwargs)
+        nodeset_id2cache_key = {}
+        if cache is not None:
+            for nodeset_id in nodeset_ids:
+                if not nodeset_exists(kwargs["gold_dir"], nodeset_id):
+                    # evaluate it anyway to get the same error as without cache
+                    continue
+                key = cache.get_key_from_hashes(
+                    get_nodeset_hash(predictions_dir, nodeset_id),
+                    get_nodeset_hash(kwargs["gold_dir"], nodeset_id),
+                )
+                cached_result = cache.get(key)
+                if cached_result is not None:
+                    if kwargs.get("return_confusion_counts"):
+                        nodeset2confusions[nodeset_id] = pop_confusion_counts(
+                            kwargs["mode"], cached_result
+                        )
+                    nodeset_id2result[nodeset_id] = cached_result
+                else:
+                    nodeset_id2cache_key[nodeset_id] = key
+
         for nodeset_id, result_or_error in process_all_nodesets(
             func=eval_single_nodeset,
             nodeset_dir=predictions_dir,
             show_progress=show_progress,
+            num_workers=num_workers,
+            nodeset_blacklist=set(nodeset_id2result),
             predictions_dir=predictions_dir,
             **kwargs,
         ):
             if isinstance(result_or_error, Exception):
                 logger.error(f"nodeset={nodeset_id}: Failed to process: {result_or_error}")
             else:
-                result_flat = flatten_dict(result_or_error, sep=".")
-                if any(math.isnan(stat_value) for stat_value in result_flat.values()):
-                    logger.error(
-                        f"nodeset={nodeset_id}: NaN value found in result, skipping this nodeset: {result_flat}"
+                if disagreement_writer is not None:
+                    write_disagreements(
+                        disagreement_writer, nodeset_id, kwargs["mode"], result_or_error
                     )
-                    continue
-                for stat_name, stat_value in flatten_dict(result_or_error, sep=".").items():
-                    result[stat_name].append(stat_value)
+                # the cached result includes the confusion counts
+                if cache is not None and nodeset_id in nodeset_id2cache_key:
+                    cache.set(nodeset_id2cache_key[nodeset_id], result_or_error)
+                if kwargs.get("return_confusion_counts"):
+                    nodeset2confusions[nodeset_id] = pop_confusion_counts(
+                        kwargs["mode"], result_or_error
+                    )
+                nodeset_id2result[nodeset_id] = result_or_error
+        if cache is not None:
+            cache.log_stats()
+
+        # aggregate in the order of the nodesets in the directory, independent of the cache
+        mean_result = get_mean_result(
+            (nodeset_id, nodeset_id2result[nodeset_id])
+            for nodeset_id in nodeset_ids
+            if nodeset_id in nodeset_id2result
+        )
+        for stat_name, stat_value in mean_result.items():
+            print(f"{stat_name}: {stat_value}")
+
+        if confusion_counts_file is not None:
+            modes = EVALUATION_MODES if kwargs["mode"] == "all" else [kwargs["mode"]]
+            save_confusion_counts(confusion_counts_file, nodeset2confusions, modes=modes)
+            logger.info(f"saved confusion counts to {confusion_counts_file}")
+        if results_db is not None:
+            save_results_to_db(
+                path=results_db,
+                run_name=run_name or predictions_dir,
+                mode=kwargs["mode"],
+                nodeset_id2result=nodeset_id2result,
+                nodeset2confusions=nodeset2confusions,
+                settings=dict(predictions_dir=predictions_dir, **kwargs),
+            )
+            logger.info(f"saved results to {results_db}")
+
+    if disagreement_writer is not None:
+        disagreement_writer.close()
+        logger.info(f"saved disagreements to {disagreements_file}")
+
+
+def main_multi_run(
+    predictions_dirs: List[str],
+    gold_dir: str,
+    mode: str,
+    nodeset_id: Optional[str] = None,
+    show_progress: bool = True,
+    num_workers: int = 0,
+    results_db: Optional[str] = None,
+    **kwargs,
+):
+    # the scores are always computed from confusion counts and without verbose output
+    if kwargs.pop("verbose", False):
+        logger.warning("verbose output is not available when evaluating multiple runs")
+    kwargs.pop("sparse", None)
+    kwargs.pop("metrics_backend", None)
+    if nodeset_id is not None:
+        kwargs["nodeset_whitelist"] = [nodeset_id]
+
+    nodeset2confusions = collect_run_confusion_counts(
+        predictions_dirs=predictions_dirs,
+        gold_dir=gold_dir,
+        modes=EVALUATION_MODES if mode == "all" else [mode],
+        show_progress=show_progress,
+        num_workers=num_workers,
+        **kwargs,
+    )
+    results = score_run_confusion_counts(nodeset2confusions, predictions_dirs, mode=mode)
+    if results_db is not None:
+        # one run per predictions directory
+        for run_idx, (predictions_dir, nodeset_id2result) in enumerate(
+            zip(predictions_dirs, results)
+        ):
+            save_results_to_db(
+                path=results_db,
+                run_name=predictions_dir,
+                mode=mode,
+                nodeset_id2result=nodeset_id2result,
+                nodeset2confusions={
+                    current_nodeset_id: run2confusions[run_idx]
+                    for current_nodeset_id, run2confusions in nodeset2confusions.items()
+                    if run_idx in run2confusions
+                },
+                settings=dict(
+                    predictions_dir=predictions_dir, gold_dir=gold_dir, mode=mode, **kwargs
+                ),
+            )
+        logger.info(f"saved results of {len(predictions_dirs)} runs to {results_db}")
+
+    run_means: Dict[str, List[float]] = defaultdict(list)
+    for predictions_dir, nodeset_id2result in zip(predictions_dirs, results):
+        print(f"run: {predictions_dir}")
+        result = get_stat_values(nodeset_id2result, run_name=predictions_dir)
         for stat_name, stat_values in result.items():
-            print(f"{stat_name}: {sum(stat_values) / len(stat_values)}")
+            mean = sum(stat_values) / len(stat_values)
+            print(f"{stat_name}: {mean}")
+            run_means[stat_name].append(mean)
+    print(f"mean and standard deviation over {len(predictions_dirs)} runs")
+    for stat_name, means in run_means.items():
+        # use the sample standard deviation (same as pandas.DataFrame.describe)
+        std = float(np.std(means, ddof=1)) if len(means) > 1 else float("nan")
+        print(f"{stat_name}: {float(np.mean(means))} +- {std}")
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Evaluate arguments")
     parser.add_argument(
-        "--mode", type=str, required=True, help="Mode of evaluation (arguments/illocutions)"
+        "--mode",
+        type=str,
+        required=True,
+        help="Mode of evaluation (arguments/illocutions/all). For all, arguments and illocutions are "
+        "evaluated in a single pass and the results are prefixed with the respective mode",
     )
     parser.add_argument(
         "--predictions_dir",
         type=str,
+        nargs="+",
         required=True,
-        help="Path to the directory containing the gold nodesets",
+        help="Path to the directory containing the gold nodesets. If multiple directories are "
+        "provided, each is evaluated as a separate run and the mean and standard deviation over "
+        "all runs are shown (the gold data is parsed only once)",
     )
     parser.add_argument(
         "--gold_dir",
@@ -435,6 +1352,61 @@ if __name__ == "__main__":
     parser.add_argument(
         "--silent", dest="verbose", action="store_false", help="Whether to show verbose output"
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=0,
+        help="Number of worker processes to evaluate the nodesets (0 means no multiprocessing)",
+    )
+    parser.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Whether to compute the scores from confusion counts of the related node pairs "
+        "instead of materializing labels for all candidate pairs",
+    )
+    parser.add_argument(
+        "--metrics_backend",
+        type=str,
+        choices=["numpy", "sklearn"],
+        default="numpy",
+        help="Implementation to compute precision, recall and F1 (sklearn is the reference "
+        "implementation, but much slower). Has no effect in combination with --sparse.",
+    )
+
+    parser.add_argument(
+        "--confusion_counts_file",
+        type=str,
+        help="If provided, save the confusion counts per nodeset to this file (.npz), e.g. to "
+        "compute bootstrap confidence intervals with src/evaluation/bootstrap.py",
+    )
+    parser.add_argument(
+        "--disagreements_file",
+        type=str,
+        help="If provided, save the node pairs where the gold and the predicted labels differ to "
+        "this file (gzip compressed JSON lines, e.g. disagreements.jsonl.gz). The verbose output "
+        "then does not show the labels of all candidate pairs",
+    )
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        help="If provided, save the results per nodeset to this SQLite database. Use "
+        "src/evaluation/results_db.py to query them",
+    )
+    parser.add_argument(
+        "--run_name",
+        type=str,
+        help="Name of the run in the results database (default: the predictions directory). An "
+        "existing run with the same name is replaced. Not available for multiple predictions "
+        "directories, each of them is saved as a run named by the directory",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory to cache the results per nodeset. The results are reused if neither the "
+        "predicted nor the gold nodeset, the evaluation code or the evaluation settings changed",
+    )
+    parser.add_argument("--no_cache", action="store_true", help="Whether to disable the cache")
 
     args = vars(parser.parse_args())
     logging.basicConfig(level=logging.INFO)
@@ -1,8 +1,7 @@
 """How to use the evaluation script:
 
 (1) Make sure that you have installed the following libraries (also specified in requirements.txt):
-  - networkx # graphs
-  - pycm # confusion matrix
+  - pycm # (optional) reference implementation of the metrics, see cass_metrics.py
   - segeval # segmentation
   - fuzzywuzzy # fuzzy string matching
   - numpy # used in matching.py
@@ -33,17 +32,36 @@ with the DialAM data): https://github.com/arg-tech/AMF-Evaluation-Metrics
 """
 
 import argparse
+import contextlib
+import csv
 import json
 import logging
+import multiprocessing
 import os
+import pickle
 from collections import defaultdict
-from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar, Union
 
+import cass_metrics
+import compact_graph
 import matching
-from pycm import ConfusionMatrix
+import numpy as np
+from cass_metrics import ConfusionMatrix
+from result_cache import DEFAULT_CACHE_DIR, ResultCache, get_source_version
+from results_db import ResultsDatabase
+
+try:
+    import pycm
+except ImportError:
+    pycm = None
 
 T = TypeVar("T")
 
+METRICS_BACKENDS = ["numpy", "pycm"]
+
+# the metrics per nodeset, as returned by evaluate_nodeset
+METRIC_NAMES = ["Kappa", "CASS", "F1", "Accuracy", "U-Alpha"]
+
 logger = logging.getLogger(__name__)
 
 
@@ -157,6 +175,26 @@ def get_u_alpha(confusion_matrix: ConfusionMatrix) -> float:
     return u_alpha
 
 
+def get_confusion_matrix(matrix: np.ndarray, backend: str = "numpy") -> ConfusionMatrix:
+    """Create the confusion matrix that provides the statistics for the metrics.
+    Args:
+        matrix: Confusion matrix as returned by matching.calculate_matching.
+        backend: "numpy" (default, see cass_metrics.py) or "pycm" (the reference implementation,
+            gives the same values but is much slower).
+
+    Returns:
+        Confusion matrix with the attributes Kappa, KappaNoPrevalence, F1_Macro, ACC and Alpha.
+    """
+    if backend == "numpy":
+        return ConfusionMatrix(matrix)
+    elif backend == "pycm":
+        if pycm is None:
+            raise ImportError("The pycm metrics backend requires pycm to be installed.")
+        return pycm.ConfusionMatrix(matrix=matching.convert_to_dict(matrix.tolist()))
+    else:
+        raise ValueError(f"Unknown metrics backend: {backend}. Use one of {METRICS_BACKENDS}.")
+
+
 def map_and_mean(func: Callable[[T], float], inputs: Sequence[T]) -> float:
     mapped_inputs = map(func, inputs)
     result = sum(mapped_inputs) / len(inputs)
@@ -169,6 +207,9 @@ def evaluate_nodeset(
     ignore_text_annotations: bool,
     ignore_timestamp_casting: bool,
     nodeset_id: str,
+    matching_method: str = "greedy",
+    fast_parsing: bool = False,
+    metrics_backend: str = "numpy",
 ) -> Dict[str, float]:
     """Evaluate a single nodeset in terms of CASS, Accuracy, F1 and U-Alpha.
     Args:
@@ -177,6 +218,11 @@ def evaluate_nodeset(
         ignore_text_annotations: Whether to ignore text field annotations of nodes.
         ignore_timestamp_casting: Whether to ignore timestamp casting errors.
         nodeset_id: Nodeset ID.
+        matching_method: How to align the nodes of both graphs, see matching.calculate_matching.
+        fast_parsing: Whether to skip parsing the timestamps, scheme IDs and locutions, see
+            matching.calculate_matching.
+        metrics_backend: How to compute the metrics from the confusion matrices, see
+            get_confusion_matrix.
 
     Returns:
         Dictionary that contains the mapping between the metrics and the calculated values for the nodeset.
@@ -197,10 +243,18 @@ def evaluate_nodeset(
     nodeset_metrics = dict()
 
     # Evaluate graphs
-    confusion_matrix_dicts = matching.calculate_matching(
-        predicted_data, gold_data, ignore_text_annotations, ignore_timestamp_casting, nodeset_id
+    confusion_matrix_arrays = matching.calculate_matching(
+        predicted_data,
+        gold_data,
+        ignore_text_annotations,
+        ignore_timestamp_casting,
+        nodeset_id,
+        matching_method=matching_method,
+        fast_parsing=fast_parsing,
     )
-    confusion_matrices = [ConfusionMatrix(matrix=d) for d in confusion_matrix_dicts]
+    confusion_matrices = [
+        get_confusion_matrix(array, backend=metrics_backend) for array in confusion_matrix_arrays
+    ]
 
     # Kappa
     kappa = map_and_mean(get_kappa, confusion_matrices)
@@ -231,6 +285,144 @@ def evaluate_nodeset(
     return nodeset_metrics
 
 
+def _evaluate_nodeset_safe(
+    nodeset_id: str, predicted_data: str, gold_data: str, kwargs: Dict[str, Any]
+) -> Tuple[str, Union[Dict[str, float], Exception]]:
+    """Call evaluate_nodeset. If an exception occurs, it is returned instead of the metrics."""
+    try:
+        return nodeset_id, evaluate_nodeset(
+            predicted_data, gold_data, nodeset_id=nodeset_id, **kwargs
+        )
+    except Exception as e:
+        return nodeset_id, e
+
+
+# the arguments of evaluate_nodeset that are the same for all nodesets, set once per worker
+# process (see evaluate_nodesets) to not send them with each nodeset
+_worker_kwargs: Dict[str, Any] = {}
+
+
+def _init_worker(kwargs: Dict[str, Any]):
+    _worker_kwargs.update(kwargs)
+
+
+def _evaluate_nodeset_in_worker(
+    task: Tuple[str, str, str],
+) -> Tuple[str, Union[Dict[str, float], Exception]]:
+    nodeset_id, result = _evaluate_nodeset_safe(*task, kwargs=_worker_kwargs)
+    if isinstance(result, Exception):
+        # the exception is sent back to the main process, so it needs to be picklable
+        try:
+            pickle.dumps(result)
+        except Exception:
+            result = RuntimeError(repr(result))
+    return nodeset_id, result
+
+
+def evaluate_nodesets(
+    tasks: Sequence[Tuple[str, str, str]], num_workers: int = 0, **kwargs
+) -> Iterator[Tuple[str, Union[Dict[str, float], Exception]]]:
+    """Evaluate multiple nodesets, optionally in parallel.
+    Args:
+        tasks: The nodesets to evaluate as (nodeset ID, path to the predicted nodeset, path to
+            the gold nodeset) tuples.
+        num_workers: The number of worker processes. If 0, the nodesets are evaluated in the main
+            process.
+        **kwargs: Additional keyword arguments for evaluate_nodeset, e.g. ignore_text_annotations.
+
+    Yields:
+        The nodeset ID and the metrics (see evaluate_nodeset) for each task, in the order of the
+        tasks. If the evaluation of a nodeset fails, the exception is yielded instead of the
+        metrics, so a single broken nodeset does not abort the evaluation of the others.
+    """
+    if num_workers > 0:
+        with multiprocessing.Pool(
+            processes=num_workers, initializer=_init_worker, initargs=(kwargs,)
+        ) as pool:
+            yield from pool.imap(_evaluate_nodeset_in_worker, tasks)
+    else:
+        for task in tasks:
+            yield _evaluate_nodeset_safe(*task, kwargs=kwargs)
+
+
+class NodesetMetricsWriter:
+    """Write the metrics per nodeset to a CSV or JSON lines file (depending on the file
+    extension: .csv or .jsonl). Each row is written (and flushed) immediately, so the results of
+    a long evaluation are available while it is running and are not lost if it is aborted.
+
+    Args:
+        path: The path to the output file, e.g. "metrics.csv".
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        if path.endswith(".csv"):
+            self.format = "csv"
+        elif path.endswith(".jsonl"):
+            self.format = "jsonl"
+        else:
+            raise ValueError(f"Unknown file format of {path}, use .csv or .jsonl.")
+        self._file = open(path, "w", newline="" if self.format == "csv" else None)
+        if self.format == "csv":
+            self._csv_writer = csv.DictWriter(
+                self._file, fieldnames=["nodeset_id"] + METRIC_NAMES + ["error"]
+            )
+            self._csv_writer.writeheader()
+
+    def write(self, nodeset_id: str, result: Union[Dict[str, float], Exception]) -> None:
+        """Write the metrics of a nodeset, or the error if its evaluation failed."""
+        record: Dict[str, Any] = {"nodeset_id": nodeset_id}
+        if isinstance(result, Exception):
+            record["error"] = repr(result)
+        else:
+            record.update(result)
+        if self.format == "csv":
+            self._csv_writer.writerow(record)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "NodesetMetricsWriter":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def get_result_cache(
+    cache_dir: str,
+    ignore_text_annotations: bool,
+    ignore_timestamp_casting: bool,
+    matching_method: str = "greedy",
+    metrics_backend: str = "numpy",
+) -> ResultCache:
+    """Get the cache for the results of evaluate_nodeset. The settings include the similarity
+    backend and whether fuzzywuzzy uses python-Levenshtein, because both depend on the installed
+    packages and change the similarity values."""
+    version = get_source_version(
+        [
+            __file__,
+            cass_metrics.__file__,
+            matching.__file__,
+            matching.centrality.__file__,
+            matching.load_map.__file__,
+            compact_graph.__file__,
+        ]
+    )
+    settings = {
+        "ignore_text_annotations": ignore_text_annotations,
+        "ignore_timestamp_casting": ignore_timestamp_casting,
+        "matching_method": matching_method,
+        "metrics_backend": metrics_backend,
+        "similarity_backend": matching.get_default_similarity_backend(),
+        "fuzz_uses_levenshtein": matching.FUZZ_USES_LEVENSHTEIN,
+    }
+    return ResultCache(cache_dir=cache_dir, version=version, settings=settings)
+
+
 def run_evaluation(
     predicted_nodeset_path: str,
     gold_nodeset_path: str,
@@ -238,6 +430,15 @@ def run_evaluation(
     ignore_timestamp_casting: bool,
     nodeset_blacklist: Optional[List[str]] = None,
     nodeset_id: Optional[str] = None,
+    cache_dir: str = DEFAULT_CACHE_DIR,
+    no_cache: bool = False,
+    results_db: Optional[str] = None,
+    run_name: Optional[str] = None,
+    matching_method: str = "greedy",
+    fast_parsing: bool = False,
+    metrics_backend: str = "numpy",
+    num_workers: int = 0,
+    nodeset_metrics_path: Optional[str] = None,
 ):
     """Compute different scores to evaluate how similar given nodesets are to each other: Kappa,
     CASS, Accuracy, F1, U-Alpha.
@@ -250,8 +451,20 @@ def run_evaluation(
         ignore_timestamp_casting: Whether to ignore timestamp casting errors.
         nodeset_blacklist: List of nodeset IDs that should be ignored.
         nodeset_id: The ID of the nodeset to process. If not provided, all nodesets in the input directories will be processed (matched by their ids) and average metrics will be reported.
+        cache_dir: Directory to cache the metrics per nodeset when processing all nodesets.
+        no_cache: Whether to disable the cache.
+        results_db: Path to a SQLite database to save the metrics per nodeset when processing all nodesets (see results_db.py).
+        run_name: Name of the run in the results database (default: predicted_nodeset_path).
+        matching_method: How to align the nodes of both graphs: "greedy" or "optimal", see matching.calculate_matching.
+        fast_parsing: Whether to skip parsing the timestamps, scheme IDs and locutions (they are not used for the metrics).
+        metrics_backend: How to compute the metrics from the confusion matrices: "numpy" or "pycm", see get_confusion_matrix.
+        num_workers: The number of worker processes to evaluate the nodesets when processing all nodesets (0 means no multiprocessing).
+        nodeset_metrics_path: Path to a CSV (.csv) or JSON lines (.jsonl) file to write the metrics per nodeset to when processing all nodesets, see NodesetMetricsWriter.
+
+    Nodesets that can not be evaluated are logged and ignored for the average metrics.
     """
     all_nodeset_metrics = defaultdict(list)
+    nodeset_id2metrics = {}
     if nodeset_id is not None:
         predicted_data = os.path.join(
             predicted_nodeset_path, "nodeset" + str(nodeset_id) + ".json"
@@ -263,27 +476,101 @@ def run_evaluation(
             ignore_text_annotations,
             ignore_timestamp_casting,
             nodeset_id,
+            matching_method=matching_method,
+            fast_parsing=fast_parsing,
+            metrics_backend=metrics_backend,
         )
         for k, v in nodeset_metrics.items():
             print(k, v)
     else:
+        cache = None
+        if not no_cache:
+            cache = get_result_cache(
+                cache_dir,
+                ignore_text_annotations,
+                ignore_timestamp_casting,
+                matching_method=matching_method,
+                metrics_backend=metrics_backend,
+            )
+        nodeset_ids = []
+        nodeset_id2result: Dict[str, Union[Dict[str, float], Exception]] = {}
+        # the nodesets that are not in the cache
+        tasks = []
+        nodeset_id2cache_key = {}
         for nodeset_fname in os.listdir(predicted_nodeset_path):
             nodeset_id = nodeset_fname.replace(".json", "").replace("nodeset", "")
             if nodeset_blacklist and (nodeset_id in nodeset_blacklist):
                 logger.info(f"Skipping nodeset {nodeset_id} from the blacklist.")
                 continue
+            nodeset_ids.append(nodeset_id)
             predicted_data = os.path.join(predicted_nodeset_path, nodeset_fname)
             gold_data = os.path.join(gold_nodeset_path, nodeset_fname)
 
-            nodeset_metrics = evaluate_nodeset(
-                predicted_data,
-                gold_data,
-                ignore_text_annotations,
-                ignore_timestamp_casting,
-                nodeset_id,
+            nodeset_metrics = None
+            if cache is not None and os.path.exists(gold_data):
+                cache_key = cache.get_key(predicted_data, gold_data)
+                nodeset_metrics = cache.get(cache_key)
+                nodeset_id2cache_key[nodeset_id] = cache_key
+            if nodeset_metrics is not None:
+                nodeset_id2result[nodeset_id] = nodeset_metrics
+            else:
+                tasks.append((nodeset_id, predicted_data, gold_data))
+
+        with contextlib.ExitStack() as stack:
+            writer = None
+            if nodeset_metrics_path is not None:
+                writer = stack.enter_context(NodesetMetricsWriter(nodeset_metrics_path))
+                for current_nodeset_id, nodeset_metrics in nodeset_id2result.items():
+                    writer.write(current_nodeset_id, nodeset_metrics)
+            results = evaluate_nodesets(
+                tasks,
+                num_workers=num_workers,
+                ignore_text_annotations=ignore_text_annotations,
+                ignore_timestamp_casting=ignore_timestamp_casting,
+                matching_method=matching_method,
+                fast_parsing=fast_parsing,
+                metrics_backend=metrics_backend,
             )
+            for current_nodeset_id, result in results:
+                nodeset_id2result[current_nodeset_id] = result
+                if isinstance(result, Exception):
+                    logger.error(f"nodeset={current_nodeset_id}: Failed to evaluate: {result}")
+                elif current_nodeset_id in nodeset_id2cache_key:
+                    cache.set(nodeset_id2cache_key[current_nodeset_id], result)
+                if writer is not None:
+                    writer.write(current_nodeset_id, result)
+
+        failed_nodeset_ids = []
+        for current_nodeset_id in nodeset_ids:
+            nodeset_metrics = nodeset_id2result[current_nodeset_id]
+            if isinstance(nodeset_metrics, Exception):
+                failed_nodeset_ids.append(current_nodeset_id)
+                continue
+            nodeset_id2metrics[current_nodeset_id] = nodeset_metrics
             for k, v in nodeset_metrics.items():
                 all_nodeset_metrics[k].append(v)
+        if len(failed_nodeset_ids) > 0:
+            logger.warning(
+                f"Failed to evaluate the following nodesets ({len(failed_nodeset_ids)}), they "
+                f"are ignored for the average metrics: {failed_nodeset_ids}"
+            )
+        if cache is not None:
+            print(cache.format_stats())
+        if results_db is not None:
+            with ResultsDatabase(results_db) as database:
+                run_id = database.add_run(
+                    run_name or predicted_nodeset_path,
+                    evaluator="evaluate",
+                    settings={
+                        "predicted_nodeset_path": predicted_nodeset_path,
+                        "gold_nodeset_path": gold_nodeset_path,
+                        "ignore_text_annotations": ignore_text_annotations,
+                        "ignore_timestamp_casting": ignore_timestamp_casting,
+                        "matching_method": matching_method,
+                    },
+                )
+                for current_nodeset_id, nodeset_metrics in nodeset_id2metrics.items():
+                    database.add_scores(run_id, current_nodeset_id, "cass", nodeset_metrics)
 
     for metric, values in all_nodeset_metrics.items():
         print(metric, sum(values) / len(values))
@@ -324,6 +611,63 @@ if __name__ == "__main__":
         action="store_true",
         help="Whether to ignore timestamp casting errors.",
     )
+    parser.add_argument(
+        "--matching_method",
+        type=str,
+        choices=matching.MATCHING_METHODS,
+        default="greedy",
+        help="How to align the I-/L-nodes of the predicted and the gold graph by text similarity: "
+        "greedy (default, as in the original CASS implementation) or optimal (maximizes the total "
+        "similarity).",
+    )
+    parser.add_argument(
+        "--fast_parsing",
+        action="store_true",
+        help="Whether to skip parsing the timestamps, scheme IDs and locutions of the nodesets. "
+        "They are not used for the metrics, so the results are the same.",
+    )
+    parser.add_argument(
+        "--metrics_backend",
+        type=str,
+        choices=METRICS_BACKENDS,
+        default="numpy",
+        help="How to compute the metrics from the confusion matrices: numpy (default) or pycm "
+        "(the reference implementation, gives the same results but is much slower).",
+    )
+
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=0,
+        help="Number of worker processes to evaluate the nodesets (0 means no multiprocessing)",
+    )
+    parser.add_argument(
+        "--nodeset_metrics_path",
+        type=str,
+        default=None,
+        help="Path to a CSV (.csv) or JSON lines (.jsonl) file to write the metrics per nodeset "
+        "to, as soon as they are available.",
+    )
+    parser.add_argument(
+        "--results_db",
+        type=str,
+        default=None,
+        help="Path to a SQLite database to save the metrics per nodeset (see results_db.py).",
+    )
+    parser.add_argument(
+        "--run_name",
+        type=str,
+        default=None,
+        help="Name of the run in the results database (default: predicted_nodeset_path).",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help="Directory to cache the metrics per nodeset. The metrics are reused if neither the "
+        "predicted nor the gold nodeset, the evaluation code or the evaluation settings changed.",
+    )
+    parser.add_argument("--no_cache", action="store_true", help="Whether to disable the cache.")
 
     args = vars(parser.parse_args())
     run_evaluation(**args)
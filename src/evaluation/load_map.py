@@ -1,77 +1,136 @@
 import logging
+from collections import defaultdict
 from datetime import datetime
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-import networkx as nx
-from networkx.classes.digraph import DiGraph
+from compact_graph import CompactGraph
 
 logger = logging.getLogger(__name__)
 
 
-def parse_timestamp(timestamp: str, ignore_timestamp_casting: bool) -> Union[datetime, str]:
+def parse_timestamp(
+    timestamp: str, ignore_timestamp_casting: bool, failures: Optional[List[Any]] = None
+) -> Union[datetime, str]:
     try:
         return datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
     except (ValueError, TypeError):
         if not ignore_timestamp_casting:
-            logger.error(f"Failed datetime(timestamp) casting: {timestamp}")
+            if failures is not None:
+                failures.append(timestamp)
+            else:
+                logger.error(f"Failed datetime(timestamp) casting: {timestamp}")
     return timestamp
 
 
-def parse_scheme_id(scheme_id: str) -> Union[int, str]:
+def parse_scheme_id(scheme_id: str, failures: Optional[List[Any]] = None) -> Union[int, str]:
     try:
         return int(scheme_id)
     except (ValueError, TypeError):
-        logger.error(f"Failed int(schemeID) casting: {scheme_id}")
+        if failures is not None:
+            failures.append(scheme_id)
+        else:
+            logger.error(f"Failed int(schemeID) casting: {scheme_id}")
     return scheme_id
 
 
-def parse_node_id(node_id: str) -> Union[int, str]:
+def parse_node_id(node_id: str, failures: Optional[List[Any]] = None) -> Union[int, str]:
     try:
         return int(node_id)
     except (ValueError, TypeError):
-        logger.error(f"Failed int(nodeID) casting: {node_id}")
+        if failures is not None:
+            failures.append(node_id)
+        else:
+            logger.error(f"Failed int(nodeID) casting: {node_id}")
     return node_id
 
 
-def parse_edge_id(edge_id: str) -> Union[int, str]:
+def parse_edge_id(edge_id: str, failures: Optional[List[Any]] = None) -> Union[int, str]:
     try:
         return int(edge_id)
     except (ValueError, TypeError):
-        logger.error(f"Failed int(edgeID) casting: {edge_id}")
+        if failures is not None:
+            failures.append(edge_id)
+        else:
+            logger.error(f"Failed int(edgeID) casting: {edge_id}")
     return edge_id
 
 
+def log_casting_failures(failures: Dict[str, List[Any]]) -> None:
+    """Log a single warning for all values that could not be cast while parsing a nodeset."""
+    messages = [
+        f"{len(values)} x {name} (e.g. {values[0]!r})"
+        for name, values in failures.items()
+        if values
+    ]
+    if len(messages) > 0:
+        logger.warning(f"Failed casting: {', '.join(messages)}")
+
+
 def parse_json(
-    node_set: Dict[str, List[Dict[str, Any]]], ignore_timestamp_casting: bool
-) -> DiGraph:
-    """Parse JSON file with annotations for nodes, edges and locutions and create a DiGraph."""
-    G = nx.DiGraph()
-    locution_dict = {}
-    # Process nodes.
-    for node in node_set["nodes"]:
-        if "scheme" in node:
-            G.add_node(
-                parse_node_id(node["nodeID"]),
-                text=node.get("text", None),
-                type=node.get("type", None),
-                timestamp=parse_timestamp(node.get("timestamp", None), ignore_timestamp_casting),
-                scheme=node.get("scheme", None),
-                scheme_id=parse_scheme_id(node.get("schemeID", None)),
-            )
-        else:
-            G.add_node(
-                parse_node_id(node["nodeID"]),
-                text=node.get("text", None),
-                type=node.get("type", None),
-                timestamp=parse_timestamp(node.get("timestamp", None), ignore_timestamp_casting),
+    node_set: Dict[str, List[Dict[str, Any]]],
+    ignore_timestamp_casting: bool,
+    fast: bool = False,
+) -> CompactGraph:
+    """Parse JSON file with annotations for nodes, edges and locutions and create a
+    CompactGraph.
+
+    Args:
+        node_set: The nodeset with nodes, edges and locutions.
+        ignore_timestamp_casting: Whether to ignore timestamp casting errors.
+        fast: If True, the timestamps and scheme IDs are kept as they are (they can be parsed
+            later with parse_timestamp and parse_scheme_id, if needed) and the locutions are
+            skipped. None of them is used by the metrics.
+
+    Values that can not be cast (e.g. node IDs that are not integers) are kept as they are and
+    reported in a single warning per nodeset.
+    """
+    failures: Dict[str, List[Any]] = defaultdict(list)
+    # The edges refer to the same node IDs again, so we cache the parsed IDs.
+    parsed_ids: Dict[Any, Union[int, str]] = {}
+
+    def get_id(raw_id: Any, id_type: str) -> Union[int, str]:
+        parse_id = parse_edge_id if id_type == "edgeID" else parse_node_id
+        try:
+            return parsed_ids[raw_id]
+        except KeyError:
+            parsed_id = parse_id(raw_id, failures=failures[id_type])
+        except TypeError:
+            # unhashable IDs are not cached
+            return parse_id(raw_id, failures=failures[id_type])
+        parsed_ids[raw_id] = parsed_id
+        return parsed_id
+
+    def get_nodes() -> Iterator[Tuple[Union[int, str], Dict[str, Any]]]:
+        for node in node_set["nodes"]:
+            timestamp = node.get("timestamp", None)
+            if not fast:
+                timestamp = parse_timestamp(
+                    timestamp, ignore_timestamp_casting, failures=failures["timestamp"]
+                )
+            attributes = dict(
+                text=node.get("text", None), type=node.get("type", None), timestamp=timestamp
             )
-    # Process edges.
-    for edge in node_set["edges"]:
-        from_id = parse_edge_id(edge["fromID"])
-        to_id = parse_edge_id(edge["toID"])
-        G.add_edge(from_id, to_id)
-    # Process locutions. Currently, not being used anywhere.
-    for locution in node_set["locutions"]:
-        node_id = parse_node_id(locution["nodeID"])
-        locution_dict[node_id] = locution
+            if "scheme" in node:
+                attributes["scheme"] = node.get("scheme", None)
+                scheme_id = node.get("schemeID", None)
+                if not fast:
+                    scheme_id = parse_scheme_id(scheme_id, failures=failures["schemeID"])
+                attributes["scheme_id"] = scheme_id
+            yield get_id(node["nodeID"], "nodeID"), attributes
+
+    def get_edges() -> Iterator[Tuple[Union[int, str], Union[int, str]]]:
+        for edge in node_set["edges"]:
+            from_id = get_id(edge["fromID"], "edgeID")
+            to_id = get_id(edge["toID"], "edgeID")
+            yield from_id, to_id
+
+    # Process nodes and edges.
+    G = CompactGraph.from_nodes_and_edges(nodes=get_nodes(), edges=get_edges())
+    if not fast:
+        locution_dict = {}
+        # Process locutions. Currently, not being used anywhere.
+        for locution in node_set["locutions"]:
+            node_id = get_id(locution["nodeID"], "nodeID")
+            locution_dict[node_id] = locution
+    log_casting_failures(failures)
     return G
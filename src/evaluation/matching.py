@@ -1,29 +1,44 @@
-import copy
+import difflib
 import logging
-from typing import Any, Dict, List, Tuple
+import re
+from html.parser import HTMLParser
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import centrality
 import load_map
 import numpy as np
 import segeval
 from bs4 import BeautifulSoup
-from fuzzywuzzy import fuzz
-from networkx.classes.digraph import DiGraph
-from numpy import unravel_index
+from compact_graph import NO_ATTRIBUTES, CompactGraph
+from fuzzywuzzy import fuzz, utils
+from scipy.optimize import linear_sum_assignment
+
+try:
+    from rapidfuzz.distance import Indel
+    from rapidfuzz.process import cdist
+except ImportError:
+    cdist = None
 
 logger = logging.getLogger(__name__)
 
+# Without python-Levenshtein, fuzzywuzzy falls back to difflib.SequenceMatcher. Only the
+# Levenshtein based fuzz.ratio is the normalized Indel similarity that rapidfuzz computes.
+FUZZ_USES_LEVENSHTEIN = fuzz.SequenceMatcher is not difflib.SequenceMatcher
+SIMILARITY_BACKENDS = ["rapidfuzz", "python"]
+MATCHING_METHODS = ["greedy", "optimal"]
+
 
 def get_graphs(
     dt1: Dict[str, List[Dict[str, str]]],
     dt2: Dict[str, List[Dict[str, str]]],
     ignore_timestamp_casting: bool,
-) -> Tuple[DiGraph, DiGraph]:
+    fast_parsing: bool = False,
+) -> Tuple[CompactGraph, CompactGraph]:
     """Load the graphs from the corpus, remove isolated nodes."""
 
     # load graphs
-    graph1 = load_map.parse_json(dt1, ignore_timestamp_casting)
-    graph2 = load_map.parse_json(dt2, ignore_timestamp_casting)
+    graph1 = load_map.parse_json(dt1, ignore_timestamp_casting, fast=fast_parsing)
+    graph2 = load_map.parse_json(dt2, ignore_timestamp_casting, fast=fast_parsing)
     # remove isolated nodes
     graph1 = centrality.remove_iso_analyst_nodes(graph1)
     graph2 = centrality.remove_iso_analyst_nodes(graph2)
@@ -49,44 +64,9 @@ def get_similarity(text_1: str, text_2: str) -> float:
     if text_1 == "" or text_2 == "":
         raise Exception("Text Input Is Empty")
     else:
-        # Normalize text
-        chars_to_remove = [
-            "`",
-            "’",
-            "'",
-        ]
-        chars_to_replace_with_space = ["  ", "...", "…", ".", ",", "!", "?", "  "]
-
-        for ch in chars_to_remove:
-            text_1 = text_1.replace(ch, "")
-            text_2 = text_2.replace(ch, "")
-
-        text_1 = text_1.strip()
-        text_2 = text_2.strip()
-
-        text_1 = text_1.replace("[", " [")
-        text_2 = text_2.replace("[", " [")
-        text_1 = text_1.replace("]", "] ")
-        text_2 = text_2.replace("]", "] ")
-
-        for ch in chars_to_replace_with_space:
-            text_1 = text_1.replace(ch, " ")
-            text_2 = text_2.replace(ch, " ")
-
-        # Parse text using BeautifulSoup
-        xml_soup_1 = BeautifulSoup(text_1, features="lxml")
-        xml_soup_2 = BeautifulSoup(text_2, features="lxml")
-
-        # Remove unwanted HTML tags
-        xml_soup_1 = remove_html_tags(xml_soup_1)
-        # xml_soup_1 = BeautifulSoup(str(xml_soup_1), features="lxml").text
-
-        xml_soup_2 = remove_html_tags(xml_soup_2)
-        # xml_soup_2 = BeautifulSoup(str(xml_soup_2), features="lxml").text
-
         # Get segments
-        segments_1, words_1 = get_segements(xml_soup_1)
-        segments_2, words_2 = get_segements(xml_soup_2)
+        segments_1, words_1 = get_segments_and_words(text_1)
+        segments_2, words_2 = get_segments_and_words(text_2)
 
         # Check segment length
         seg_check, seg1, seg2 = check_segment_length(segments_1, words_1, segments_2, words_2)
@@ -106,6 +86,152 @@ def get_similarity(text_1: str, text_2: str) -> float:
     return ss
 
 
+def normalize_text(text: str) -> str:
+    """Normalize the text for the segmentation: remove apostrophes and replace punctuation with
+    spaces."""
+    chars_to_remove = [
+        "`",
+        "’",
+        "'",
+    ]
+    chars_to_replace_with_space = ["  ", "...", "…", ".", ",", "!", "?", "  "]
+
+    for ch in chars_to_remove:
+        text = text.replace(ch, "")
+
+    text = text.strip()
+
+    text = text.replace("[", " [")
+    text = text.replace("]", "] ")
+
+    for ch in chars_to_replace_with_space:
+        text = text.replace(ch, " ")
+    return text
+
+
+# The same normalization as normalize_text in two passes. Only the number of consecutive spaces
+# differs, which does not matter for the segmentation.
+_CHARS_TO_REMOVE = str.maketrans("", "", "`’'")
+# a "<" that may start a tag (or comment etc.)
+_TAG_START = re.compile(r"<[^\s<]")
+_CHARS_TO_REPLACE = str.maketrans(
+    {"[": " [", "]": "] ", "…": " ", ".": " ", ",": " ", "!": " ", "?": " "}
+)
+
+
+class SpanSegmenter(HTMLParser):
+    """Split a text with span annotations into segments in a single pass, like parsing it with
+    BeautifulSoup (and lxml), removing the div, p and br tags (remove_html_tags) and collecting
+    the top-level children (get_segements): each span and each text between two tags is a child.
+
+    Markup that lxml may restructure or that get_segements handles differently (other tags,
+    comments, unbalanced tags, ...) is not supported. In this case, supported is False after
+    feeding the text and the BeautifulSoup based segmentation should be used.
+    """
+
+    UNWRAPPED_TAGS = ("div", "p", "br")
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.supported = True
+        # the text of the top-level children
+        self.children: List[str] = []
+        self._text_parts: List[str] = []
+        self._span_depth = 0
+        # the open div and p tags with the span depth at which they were opened
+        self._open_tags: List[Tuple[str, int]] = []
+        self._seen_tag = False
+
+    def _end_child(self, is_span: bool = False) -> None:
+        text = "".join(self._text_parts)
+        self._text_parts = []
+        # lxml may parse it as a (broken) tag
+        if _TAG_START.search(text) is not None:
+            self.supported = False
+        # lxml drops whitespace at the beginning of the document (before the first tag), but
+        # keeps empty spans. Only ASCII whitespace counts, e.g. a text of &nbsp; is kept.
+        if is_span or (text != "" and (self._seen_tag or text.strip(" \t\n\r\f") != "")):
+            self.children.append(text)
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "span":
+            if self._span_depth == 0:
+                self._end_child()
+            self._span_depth += 1
+        elif tag in self.UNWRAPPED_TAGS:
+            if self._span_depth == 0:
+                self._end_child()
+            if tag != "br":
+                # lxml closes an open p when a block starts
+                if any(open_tag == "p" for open_tag, _ in self._open_tags):
+                    self.supported = False
+                self._open_tags.append((tag, self._span_depth))
+        else:
+            self.supported = False
+        self._seen_tag = True
+
+    def handle_startendtag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag == "br":
+            self.handle_starttag(tag, attrs)
+        else:
+            self.supported = False
+
+    def handle_endtag(self, tag: str) -> None:
+        self._seen_tag = True
+        if tag == "span" and self._span_depth > 0:
+            self._span_depth -= 1
+            if self._span_depth == 0:
+                self._end_child(is_span=True)
+        elif tag in ("div", "p") and self._open_tags[-1:] == [(tag, self._span_depth)]:
+            self._open_tags.pop()
+            if self._span_depth == 0:
+                self._end_child()
+        else:
+            self.supported = False
+
+    def handle_data(self, data: str) -> None:
+        self._text_parts.append(data)
+
+    def handle_comment(self, data: str) -> None:
+        self.supported = False
+
+    def handle_decl(self, decl: str) -> None:
+        self.supported = False
+
+    def handle_pi(self, data: str) -> None:
+        self.supported = False
+
+    def unknown_decl(self, data: str) -> None:
+        self.supported = False
+
+    def close(self) -> None:
+        super().close()
+        if self._span_depth > 0 or len(self._open_tags) > 0:
+            self.supported = False
+        self._end_child()
+
+
+def get_segments_and_words(text: str) -> Tuple[List[int], List[str]]:
+    """Normalize the text and retrieve the segments and words from it (see get_segements).
+
+    The text is segmented with SpanSegmenter. Only if it contains markup that SpanSegmenter does
+    not support, it is parsed with BeautifulSoup.
+    """
+    segmenter = SpanSegmenter()
+    segmenter.feed(text.translate(_CHARS_TO_REMOVE).strip().translate(_CHARS_TO_REPLACE))
+    segmenter.close()
+    if not segmenter.supported:
+        xml_soup = BeautifulSoup(normalize_text(text), features="lxml")
+        return get_segements(remove_html_tags(xml_soup))
+    segment_list = []
+    word_list = []
+    for i, child_text in enumerate(segmenter.children):
+        words = child_text.split()
+        segment_list += len(words) * [i + 1]
+        word_list += words
+    return segment_list, word_list
+
+
 def remove_html_tags(xml_soup: BeautifulSoup) -> BeautifulSoup:
     """Remove HTML tags from the XML-formatted document."""
     for match in xml_soup.findAll("div"):
@@ -149,22 +275,23 @@ def check_segment_length(
         return True, seg_1, seg_2
     else:
         if seg_1_len > seg_2_len:
+            # the words of the other text do not change, so we index them once
+            word_2_set = set(word_2)
             for i in range(len(word_1) - 1):
-                if word_1[i] + word_1[i + 1] in word_2:
+                if word_1[i] + word_1[i + 1] in word_2_set:
                     word_1[i : i + 2] = [word_1[i] + word_1[i + 1]]
 
-                    seg_1 = [seg_1[0]] * len(word_1)
-                    if len(seg_1) == len(seg_2):
-                        return True, seg_1, seg_2
+                    if len(word_1) == seg_2_len:
+                        return True, [seg_1[0]] * len(word_1), seg_2
             return False, None, None
         else:
+            word_1_set = set(word_1)
             for i in range(len(word_2) - 1):
-                if word_2[i] + word_2[i + 1] in word_1:
+                if word_2[i] + word_2[i + 1] in word_1_set:
                     word_2[i : i + 2] = [word_2[i] + word_2[i + 1]]
 
-                    seg_2 = [seg_2[0]] * len(word_2)
-                    if len(seg_1) == len(seg_2):
-                        return True, seg_1, seg_2
+                    if seg_1_len == len(word_2):
+                        return True, seg_1, [seg_2[0]] * len(word_2)
             return False, None, None
 
 
@@ -188,34 +315,44 @@ def rels_to_dict(
     return new_list
 
 
-def get_sim_matrix(graph1: DiGraph, graph2: DiGraph, rel_type: str) -> List[Dict[str, Any]]:
+REL_TYPE2NODE_TYPE = {"propositions": "I", "locutions": "L"}
+
+
+def get_sim_matrix(
+    graph1: CompactGraph,
+    graph2: CompactGraph,
+    rel_type: str,
+    matching_method: str = "greedy",
+    type2nodes1: Optional[Dict[str, List[Tuple[int, str]]]] = None,
+    type2nodes2: Optional[Dict[str, List[Tuple[int, str]]]] = None,
+) -> List[Dict[str, Any]]:
     """Create similarity matrix for propositional or locutional relations (w/o similarity
-    values)."""
-
-    g1_copy = graph1.copy()
-    g2_copy = graph2.copy()
-    g1_inodes = []
-    g2_inodes = []
-
-    if rel_type == "propositions":
-        g1_inodes = centrality.get_i_node_list(g1_copy)
-        g2_inodes = centrality.get_i_node_list(g2_copy)
-    elif rel_type == "locutions":
-        g1_inodes = centrality.get_l_node_list(g1_copy)
-        g2_inodes = centrality.get_l_node_list(g2_copy)
-    else:
+    values).
+
+    The nodes of each graph grouped by type (see centrality.get_type2node_list) can be passed
+    via type2nodes1 and type2nodes2 to not collect them again for each relation type.
+    """
+
+    if rel_type not in REL_TYPE2NODE_TYPE:
         raise Exception(
             f"Unknown relation type: {rel_type}. Must be either propositions or locutions."
         )
-
-    relsi, valsi, switched = text_sim_matrix(g1_inodes, g2_inodes)
+    node_type = REL_TYPE2NODE_TYPE[rel_type]
+    if type2nodes1 is None:
+        type2nodes1 = centrality.get_type2node_list(graph1)
+    if type2nodes2 is None:
+        type2nodes2 = centrality.get_type2node_list(graph2)
+    g1_inodes = type2nodes1.get(node_type, [])
+    g2_inodes = type2nodes2.get(node_type, [])
+
+    relsi, valsi, switched = text_sim_matrix(g1_inodes, g2_inodes, matching_method)
     # If switched is True, the relations have been in a switched order, so they need to be reversed when creating the dictionary.
     rels_dict = rels_to_dict(relsi, switched)
     return rels_dict
 
 
 def text_sim_matrix(
-    g1_list: List[Tuple[int, str]], g2_list: List[Tuple[int, str]]
+    g1_list: List[Tuple[int, str]], g2_list: List[Tuple[int, str]], matching_method: str = "greedy"
 ) -> Tuple[
     List[Tuple[Tuple[int, str], Tuple[int, str]]],
     List[Tuple[Tuple[int, str], Tuple[int, str]]],
@@ -229,59 +366,164 @@ def text_sim_matrix(
 
     if g1_size >= g2_size:
         mat = loop_nodes(g1_list, g2_list)
-        rels, vals = select_max_vals(mat, g2_size, g1_list, g2_list)
+        rels, vals = select_max_vals(mat, g2_size, g1_list, g2_list, matching_method)
     else:
         switch_flag = True
         mat = loop_nodes(g2_list, g1_list)
-        rels, vals = select_max_vals(mat, g1_size, g2_list, g1_list)
+        rels, vals = select_max_vals(mat, g1_size, g2_list, g1_list, matching_method)
     return rels, vals, switch_flag
 
 
-def loop_nodes(g1_list: List[Tuple[int, str]], g2_list: List[Tuple[int, str]]):
-    """Compute paiwise similarity (for nodes texts) based on fuzzy string matching."""
-    matrix = np.zeros((len(g1_list), len(g2_list)))
-    for i1, node1 in enumerate(g1_list):
-        text1 = node1[1].lower()
-        for i2, node2 in enumerate(g2_list):
-            text2 = node2[1].lower()
-            # lev_val = normalized_levenshtein.distance(text1, text2)
-            lev_val = (fuzz.ratio(text1, text2)) / 100
-            matrix[i1][i2] = lev_val
+def get_default_similarity_backend() -> str:
+    """Use rapidfuzz if it is installed and gives the same values as fuzz.ratio, otherwise fall
+    back to pure Python."""
+    if cdist is not None and FUZZ_USES_LEVENSHTEIN:
+        return "rapidfuzz"
+    return "python"
+
+
+def get_similarity_matrix(
+    texts1: Sequence[str], texts2: Sequence[str], backend: Optional[str] = None
+) -> np.ndarray:
+    """Compute the pairwise similarity between two lists of texts based on fuzzy string matching,
+    i.e. fuzz.ratio(text1.lower(), text2.lower()) / 100.
+
+    Args:
+        texts1: Texts for the rows of the matrix.
+        texts2: Texts for the columns of the matrix.
+        backend: "rapidfuzz" (batched with rapidfuzz.process.cdist, multithreaded) or "python"
+            (fuzzywuzzy, with one matcher per column). If None, see
+            get_default_similarity_backend.
+
+    Returns:
+        A float array of shape (len(texts1), len(texts2)).
+    """
+    if backend is None:
+        backend = get_default_similarity_backend()
+    if backend not in SIMILARITY_BACKENDS:
+        raise ValueError(
+            f"Unknown similarity backend: {backend}. Must be one of {SIMILARITY_BACKENDS}."
+        )
+    texts1 = [text.lower() for text in texts1]
+    texts2 = [text.lower() for text in texts2]
+    matrix = np.zeros((len(texts1), len(texts2)))
+    if len(texts1) == 0 or len(texts2) == 0:
+        return matrix
+
+    if backend == "rapidfuzz":
+        if cdist is None:
+            raise ImportError(
+                "The rapidfuzz similarity backend requires rapidfuzz to be installed."
+            )
+        similarities = cdist(
+            texts1, texts2, scorer=Indel.normalized_similarity, dtype=np.float64, workers=-1
+        )
+        # fuzz.ratio rounds to integer percentages (round half to even, as np.round does)
+        matrix[:] = np.round(100 * similarities) / 100
+        return matrix
+
+    for i2, text2 in enumerate(texts2):
+        # the matcher caches its analysis of the second sequence, so we build it once per column
+        matcher = fuzz.SequenceMatcher(None, "", text2)
+        for i1, text1 in enumerate(texts1):
+            # same special cases as the decorators of fuzz.ratio
+            if text1 == text2:
+                ratio = 100
+            elif len(text1) == 0 or len(text2) == 0:
+                ratio = 0
+            else:
+                matcher.set_seq1(text1)
+                ratio = utils.intr(100 * matcher.ratio())
+            matrix[i1, i2] = ratio / 100
     return matrix
 
 
+def loop_nodes(g1_list: List[Tuple[int, str]], g2_list: List[Tuple[int, str]]) -> np.ndarray:
+    """Compute paiwise similarity (for nodes texts) based on fuzzy string matching."""
+    return get_similarity_matrix([node[1] for node in g1_list], [node[1] for node in g2_list])
+
+
+def get_greedy_assignment(matrix: np.ndarray, num_matches: int) -> List[Tuple[int, int]]:
+    """Greedily match rows and columns of the similarity matrix: repeatedly take the cell with the
+    highest value whose row and column are both still unmatched. Ties are broken in row-major
+    order, i.e. in the same way as np.argmax. All cells are sorted only once, so this takes
+    O(n * m * log(n * m)) instead of a full scan of the matrix per match.
+
+    Returns:
+        The matched (row index, column index) pairs in the order they were selected.
+    """
+    num_rows, num_cols = matrix.shape
+    # a stable sort of the negated values keeps equal values in row-major order
+    order = np.argsort(-matrix, axis=None, kind="stable").tolist()
+    used_rows = bytearray(num_rows)
+    used_cols = bytearray(num_cols)
+    assignment: List[Tuple[int, int]] = []
+    for flat_index in order:
+        if len(assignment) >= num_matches:
+            break
+        row_i, col_i = divmod(flat_index, num_cols)
+        if used_rows[row_i] or used_cols[col_i]:
+            continue
+        used_rows[row_i] = 1
+        used_cols[col_i] = 1
+        assignment.append((row_i, col_i))
+    return assignment
+
+
+def get_optimal_assignment(matrix: np.ndarray) -> List[Tuple[int, int]]:
+    """Match rows and columns of the similarity matrix such that the sum of the similarities of the
+    matched cells is maximal (Hungarian algorithm).
+
+    Returns:
+        The matched (row index, column index) pairs sorted by the row index.
+    """
+    row_indices, col_indices = linear_sum_assignment(matrix, maximize=True)
+    return list(zip(row_indices.tolist(), col_indices.tolist()))
+
+
 def select_max_vals(
-    matrix: Any,
+    matrix: np.ndarray,
     smallest_value: int,
     g1_list: List[Tuple[int, str]],
     g2_list: List[Tuple[int, str]],
+    matching_method: str = "greedy",
 ):
     """Find maximum values and corresponding relations in the similarity matrix (g2_list is the
-    shortest list)."""
-    counter = 0
+    shortest list).
+
+    Args:
+        matrix: The similarity matrix of shape (len(g1_list), len(g2_list)).
+        smallest_value: The number of nodes to match, i.e. len(g2_list).
+        g1_list: The nodes for the rows of the matrix.
+        g2_list: The nodes for the columns of the matrix.
+        matching_method: "greedy" (see get_greedy_assignment) or "optimal" (see
+            get_optimal_assignment).
+    """
+    if matching_method == "greedy":
+        assignment = get_greedy_assignment(matrix, smallest_value)
+    elif matching_method == "optimal":
+        assignment = get_optimal_assignment(matrix)
+    else:
+        raise ValueError(
+            f"Unknown matching method: {matching_method}. Must be one of {MATCHING_METHODS}."
+        )
     lev_vals = []
     lev_rels = []
-    index_list = list(range(len(g1_list)))
-    m_copy = copy.deepcopy(matrix)
-    while counter <= smallest_value - 1:
-        index_tup = unravel_index(m_copy.argmax(), m_copy.shape)
-        row_i = index_tup[0]
-        col_i = index_tup[1]
-        m_copy[row_i] = 0  # zeroes out row i
-        m_copy[:, col_i] = 0  # zeroes out column i
+    matched_rows = set()
+    for row_i, col_i in assignment:
         lev_rels.append((g1_list[row_i], g2_list[col_i]))
-        lev_vals.append(matrix[row_i][col_i])
-        index_list.remove(row_i)
-        counter += 1
+        lev_vals.append(matrix[row_i, col_i])
+        matched_rows.add(row_i)
     # Fill the rest of the (non-aligned) positions with 0s, note that g1_list is always longer than g2_list.
-    for vals in index_list:
-        lev_rels.append((g1_list[vals], (0, "")))
-        lev_vals.append(0)
+    for row_i in range(len(g1_list)):
+        if row_i not in matched_rows:
+            lev_rels.append((g1_list[row_i], (0, "")))
+            lev_vals.append(0)
     return lev_rels, lev_vals
 
 
 def convert_to_dict(conf_matrix: List[List[int]]) -> Dict[int, Dict[int, int]]:
-    """Convert confusion matrix to a dictionary."""
+    """Convert confusion matrix to a dictionary (the input format of pycm)."""
     dicts: Dict[int, Dict[int, int]] = dict()
     for i, col in enumerate(conf_matrix):
         dicts[i] = dict()
@@ -290,17 +532,146 @@ def convert_to_dict(conf_matrix: List[List[int]]) -> Dict[int, Dict[int, int]]:
     return dicts
 
 
+class GraphAnchors:
+    """Lookup tables for the anchors of the nodes of a graph that are needed to build the
+    confusion matrices, e.g. the text of the YA-node that is a successor of a node. All tables are
+    computed in a single pass over the graph, so the confusion matrix builders do not need to
+    traverse the graph for each aligned node pair.
+
+    A node is missing in a table if it is not in the graph or if the lookup fails because a
+    neighbor without attributes (i.e. without a type) is visited before a match is found. The
+    helper functions (e.g. get_ya_node_text_from_id) log an error in this case and return a
+    default value.
+    """
+
+    def __init__(self, graph: CompactGraph):
+        self.graph = graph
+        # texts of all YA-nodes
+        self.ya_texts: List[str] = []
+        # text of the first YA-node that is a successor of the node
+        self.ya_text_from_id: Dict[int, str] = {}
+        # the first YA-node that is a predecessor of the node and its text
+        self.ya_node_from_prop: Dict[int, int] = {}
+        self.ya_text_from_prop: Dict[int, str] = {}
+        # text of the first L- or TA-node that is a predecessor of the node
+        self.anchor_text: Dict[int, str] = {}
+        # TA-nodes that are successors of the node
+        self.ta_nodes: Dict[int, List[int]] = {}
+        # number of TA-nodes that are successors of the node (if the lookup fails, only the TA-nodes
+        # before the failing neighbor are counted)
+        self.ta_counts: Dict[int, int] = {}
+        # number of RA-, CA- and MA-nodes that are predecessors of the node (None if any
+        # predecessor has no attributes)
+        self.s_counts: Dict[int, Optional[Tuple[int, int, int]]] = {}
+
+        node_ids = graph.node_ids
+        texts = graph.texts
+        types = [
+            graph.type_names[code] if code != NO_ATTRIBUTES else NO_ATTRIBUTES
+            for code in graph.type_codes.tolist()
+        ]
+        succ_indptr = graph.succ_indptr.tolist()
+        succ_indices = graph.succ_indices.tolist()
+        pred_indptr = graph.pred_indptr.tolist()
+        pred_indices = graph.pred_indices.tolist()
+        for idx, node_id in enumerate(node_ids):
+            if types[idx] == "YA":
+                self.ya_texts.append(texts[idx])
+
+            successors = succ_indices[succ_indptr[idx] : succ_indptr[idx + 1]]
+            ya_idx = self._find_first(successors, types, ["YA"])
+            if ya_idx is not None:
+                self.ya_text_from_id[node_id] = texts[ya_idx] if ya_idx != -1 else ""
+            ta_nodes = []
+            for succ_idx in successors:
+                if types[succ_idx] == NO_ATTRIBUTES:
+                    break
+                if types[succ_idx] == "TA":
+                    ta_nodes.append(node_ids[succ_idx])
+            else:
+                self.ta_nodes[node_id] = ta_nodes
+            self.ta_counts[node_id] = len(ta_nodes)
+
+            predecessors = pred_indices[pred_indptr[idx] : pred_indptr[idx + 1]]
+            ya_idx = self._find_first(predecessors, types, ["YA"])
+            if ya_idx is not None:
+                self.ya_node_from_prop[node_id] = node_ids[ya_idx] if ya_idx != -1 else -1
+                self.ya_text_from_prop[node_id] = texts[ya_idx] if ya_idx != -1 else ""
+            anchor_idx = self._find_first(predecessors, types, ["L", "TA"])
+            if anchor_idx is not None:
+                self.anchor_text[node_id] = texts[anchor_idx] if anchor_idx != -1 else ""
+            predecessor_types = [types[pred_idx] for pred_idx in predecessors]
+            if NO_ATTRIBUTES in predecessor_types:
+                self.s_counts[node_id] = None
+            else:
+                self.s_counts[node_id] = (
+                    predecessor_types.count("RA"),
+                    predecessor_types.count("CA"),
+                    predecessor_types.count("MA"),
+                )
+
+    @staticmethod
+    def _find_first(
+        neighbors: List[int], types: List[Any], node_types: List[str]
+    ) -> Optional[int]:
+        """Get the first neighbor with one of the node types (-1 if there is none) or None if a
+        neighbor without attributes is visited before."""
+        for neighbor in neighbors:
+            if types[neighbor] == NO_ATTRIBUTES:
+                return None
+            if types[neighbor] in node_types:
+                return neighbor
+        return -1
+
+
+class YATextVocabulary:
+    """The text annotations of the YA-nodes (see get_ya_node_texts) plus the empty text for missing
+    annotations as the last label. These are the labels of the rows and columns of the confusion
+    matrices for the YA-nodes. The mapping from the texts to their indices is built once, so looking
+    up a label does not need to search the list.
+    """
+
+    def __init__(self, texts: List[str]):
+        self.texts = texts + [""]
+        self.text2index: Dict[str, int] = {}
+        for index, text in enumerate(self.texts):
+            # like list.index, use the first index if a text occurs multiple times
+            self.text2index.setdefault(text, index)
+        # the index of the empty text that is used for missing annotations
+        self.none_index = len(self.texts) - 1
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __contains__(self, text: str) -> bool:
+        return text in self.text2index
+
+    def __repr__(self) -> str:
+        return repr(self.texts)
+
+    def index(self, text: str) -> int:
+        """Get the index of the text. Raises a ValueError if the text is not a label."""
+        try:
+            return self.text2index[text]
+        except KeyError:
+            raise ValueError(f"{text!r} is not in the YA-node texts {self.texts}")
+
+
 def s_rel_anchor(
-    rel_type: str, graph1: DiGraph, graph2: DiGraph, ignore_text_annotations: bool, nodeset_id: str
-) -> List[List[int]]:
+    rel_type: str,
+    anchors1: GraphAnchors,
+    anchors2: GraphAnchors,
+    ignore_text_annotations: bool,
+    nodeset_id: str,
+) -> np.ndarray:
     """Create a confusion matrix for S-nodes of type CA, MA or RA.
 
     Each S-node is anchored in the corresponding YA-node. Confusion matrix shows how many YA-
     anchors are the same (or different) for all S-node pairs coming from two different graphs.
     """
-    conf_matrix = [[0, 0], [0, 0]]
-    rel1 = centrality.get_rels(rel_type, graph1)
-    rel2 = centrality.get_rels(rel_type, graph2)
+    conf_matrix = np.zeros((2, 2), dtype=np.int64)
+    rel1 = centrality.get_rels(rel_type, anchors1.graph)
+    rel2 = centrality.get_rels(rel_type, anchors2.graph)
 
     rel1_len = len(rel1)
     rel2_len = len(rel2)
@@ -309,7 +680,7 @@ def s_rel_anchor(
         if rel1_len > rel2_len:
             for rel_i, rel in enumerate(rel1):
                 rel2_id = ""
-                yas1 = get_ya_node_text_from_prop(rel, graph1, nodeset_id)
+                yas1 = get_ya_node_text_from_prop(rel, anchors1, nodeset_id)
                 try:
                     rel2_id = rel2[rel_i]
                 except Exception as e:
@@ -318,17 +689,17 @@ def s_rel_anchor(
                         f"nodeset={nodeset_id}: Failed to find the predicted node for the gold node {rel} (relation type {rel_type}): {e}"
                     )
                 if rel2_id == "":
-                    conf_matrix[1][0] += 1
+                    conf_matrix[1, 0] += 1
                 else:
-                    yas2 = get_ya_node_text_from_id(int(rel2_id), graph2, nodeset_id)
+                    yas2 = get_ya_node_text_from_id(int(rel2_id), anchors2, nodeset_id)
                     if ignore_text_annotations or yas1 == yas2:
-                        conf_matrix[0][0] += 1
+                        conf_matrix[0, 0] += 1
                     else:
-                        conf_matrix[1][0] += 1
+                        conf_matrix[1, 0] += 1
         elif rel2_len > rel1_len:
             for rel_i, rel in enumerate(rel2):
                 rel1_id = ""
-                yas2 = get_ya_node_text_from_prop(rel, graph2, nodeset_id)
+                yas2 = get_ya_node_text_from_prop(rel, anchors2, nodeset_id)
                 try:
                     rel1_id = rel1[rel_i]
                 except Exception as e:
@@ -337,16 +708,16 @@ def s_rel_anchor(
                         f"nodeset={nodeset_id}: Failed to find the predicted node for the gold node {rel} (relation type {rel_type}): {e}"
                     )
                 if rel1_id == "":
-                    conf_matrix[0][1] = conf_matrix[0][1] + 1
+                    conf_matrix[0, 1] = conf_matrix[0, 1] + 1
                 else:
-                    yas1 = get_ya_node_text_from_id(int(rel1_id), graph1, nodeset_id)
+                    yas1 = get_ya_node_text_from_id(int(rel1_id), anchors1, nodeset_id)
                     if ignore_text_annotations or yas1 == yas2:
-                        conf_matrix[0][0] += 1
+                        conf_matrix[0, 0] += 1
                     else:
-                        conf_matrix[0][1] += 1
+                        conf_matrix[0, 1] += 1
         else:
             for rel_i, rel in enumerate(rel1):
-                ya1 = get_ya_node_text_from_prop(rel, graph1, nodeset_id)
+                ya1 = get_ya_node_text_from_prop(rel, anchors1, nodeset_id)
                 try:
                     rel2_id = rel2[rel_i]
                 except Exception as e:
@@ -355,79 +726,57 @@ def s_rel_anchor(
                         f"nodeset={nodeset_id}: Failed to find the gold node for the predicted node {rel} (relation type {rel_type}): {e}"
                     )
                 if rel2_id == "":
-                    conf_matrix[1][0] += 1
+                    conf_matrix[1, 0] += 1
                 else:
-                    ya2 = get_ya_node_text_from_prop(int(rel2_id), graph2, nodeset_id)
+                    ya2 = get_ya_node_text_from_prop(int(rel2_id), anchors2, nodeset_id)
                     if ignore_text_annotations or ya1 == ya2:
-                        conf_matrix[0][0] += 1
+                        conf_matrix[0, 0] += 1
                     else:
-                        conf_matrix[1][0] += 1
+                        conf_matrix[1, 0] += 1
 
     elif rel1_len == 0 and rel2_len == 0:
-        conf_matrix[1][1] += 1
+        conf_matrix[1, 1] += 1
     elif rel1_len == 0:
-        conf_matrix[0][1] += rel2_len
+        conf_matrix[0, 1] += rel2_len
     elif rel2_len == 0:
-        conf_matrix[1][0] += rel1_len
+        conf_matrix[1, 0] += rel1_len
     return conf_matrix
 
 
-def combine_s_node_matrix(
-    ra: List[List[int]], ca: List[List[int]], ma: List[List[int]]
-) -> List[List[int]]:
+def combine_s_node_matrix(ra: np.ndarray, ca: np.ndarray, ma: np.ndarray) -> np.ndarray:
     """Combine the confusion matrices for all S-nodes (RA, CA, MA)."""
-    result = [[ra[i][j] + ca[i][j] for j in range(len(ra[0]))] for i in range(len(ra))]
-
-    all_result = [
-        [ma[i][j] + result[i][j] for j in range(len(result[0]))] for i in range(len(result))
-    ]
-    return all_result
+    return ra + ca + ma
 
 
-def count_s_nodes(node_id: int, graph: DiGraph, nodeset_id: str) -> Tuple[int, int, int]:
+def count_s_nodes(node_id: int, anchors: GraphAnchors, nodeset_id: str) -> Tuple[int, int, int]:
     """Count how many S-nodes of each type (RA, CA, MA) we have in the graph."""
-    RA_count = 0
-    MA_count = 0
-    CA_count = 0
-    try:
-        s_nodes = list(
-            graph.predecessors(node_id)
-        )  # TODO: Why do we consider *only* predecessors? In principle, RA-nodes can also point down, i.e., RA-node could be in successors of the node with the current node_id!
-    except Exception as e:
+    # TODO: Why do we consider *only* predecessors? In principle, RA-nodes can also point down, i.e., RA-node could be in successors of the node with the current node_id!
+    if node_id not in anchors.s_counts:
         logger.error(
             f"nodeset={nodeset_id}: Failed to get predecessors for node with ID {node_id}"
         )
-        s_nodes = []
-    for s in s_nodes:
-        n_type = graph.nodes[s]["type"]
-        if n_type == "RA":
-            RA_count += 1
-        elif n_type == "CA":
-            CA_count += 1
-        elif n_type == "MA":
-            MA_count += 1
-    return RA_count, CA_count, MA_count
-
-
-def count_ta_nodes(node_id: int, graph: DiGraph, nodeset_id: str) -> int:
+        return 0, 0, 0
+    s_counts = anchors.s_counts[node_id]
+    if s_counts is None:
+        raise KeyError(f"A predecessor of the node {node_id} has no type.")
+    return s_counts
+
+
+def count_ta_nodes(node_id: int, anchors: GraphAnchors, nodeset_id: str) -> int:
     """Count how many successor TA-nodes we have in the graph."""
-    TA_count = 0
-    try:
-        ta_nodes = list(graph.successors(node_id))
-        for ta in ta_nodes:
-            n_type = graph.nodes[ta]["type"]
-            if n_type == "TA":
-                TA_count = TA_count + 1
-    except Exception as e:
+    if node_id not in anchors.ta_nodes:
         logger.error(f"nodeset={nodeset_id}: Failed to get successors for node with ID {node_id}")
-    return TA_count
+    return anchors.ta_counts.get(node_id, 0)
 
 
 def prop_rels_comp(
-    prop_matrix: List[Dict[str, Any]], graph1: DiGraph, graph2: DiGraph, nodeset_id: str
-) -> List[List[int]]:
+    prop_matrix: List[Dict[str, Any]],
+    anchors1: GraphAnchors,
+    anchors2: GraphAnchors,
+    nodeset_id: str,
+) -> np.ndarray:
     """Create a confusion matrix for propositional relations."""
-    conf_matrix = [[0, 0], [0, 0]]
+    conf_matrix = np.zeros((2, 2), dtype=np.int64)
 
     # Check the matching S-nodes (MA, RA, CA) between the two graphs.
     for rel_dict in prop_matrix:
@@ -437,45 +786,44 @@ def prop_rels_comp(
         text2 = rel_dict["text2"]
 
         if ID1 != 0 and ID2 != 0:
-            ras1, cas1, mas1 = count_s_nodes(ID1, graph1, nodeset_id)
-            ras2, cas2, mas2 = count_s_nodes(ID2, graph2, nodeset_id)
+            ras1, cas1, mas1 = count_s_nodes(ID1, anchors1, nodeset_id)
+            ras2, cas2, mas2 = count_s_nodes(ID2, anchors2, nodeset_id)
             for s_rel1, s_rel2 in zip([ras1, cas1, mas1], [ras2, cas2, mas2]):
                 if s_rel1 == s_rel2:
-                    conf_matrix[0][0] += 1
+                    conf_matrix[0, 0] += 1
                 elif s_rel1 > s_rel2:
-                    conf_matrix[1][0] += 1
+                    conf_matrix[1, 0] += 1
                 elif s_rel2 > s_rel1:
-                    conf_matrix[0][1] += 1
+                    conf_matrix[0, 1] += 1
 
         elif ID1 == 0 and ID2 == 0:
-            conf_matrix[1][1] += 1
+            conf_matrix[1, 1] += 1
         elif ID1 == 0:
-            conf_matrix[0][1] += 1
+            conf_matrix[0, 1] += 1
         elif ID2 == 0:
-            conf_matrix[1][0] += 1
+            conf_matrix[1, 0] += 1
 
     overallRelations = len(prop_matrix) * len(prop_matrix)
 
     total_agreed_none = (
-        overallRelations - conf_matrix[0][0] - conf_matrix[0][1] - conf_matrix[1][0]
+        overallRelations - conf_matrix[0, 0] - conf_matrix[0, 1] - conf_matrix[1, 0]
     )
     if total_agreed_none < 0:
         total_agreed_none = 0
-    conf_matrix[1][1] = total_agreed_none
+    conf_matrix[1, 1] = total_agreed_none
     return conf_matrix
 
 
 def loc_ya_rels_comp(
     loc_matrix: List[Dict[str, Any]],
-    graph1: DiGraph,
-    graph2: DiGraph,
+    anchors1: GraphAnchors,
+    anchors2: GraphAnchors,
+    ya_texts: YATextVocabulary,
     ignore_text_annotations: bool,
     nodeset_id: str,
-) -> List[List[int]]:
+) -> np.ndarray:
     """Create a confusion matrix for locutional relations."""
-    all_ya_text = get_ya_node_texts(graph1, graph2)
-    conf_matrix = [[0 for x in range(len(all_ya_text) + 1)] for y in range(len(all_ya_text) + 1)]
-    all_ya_text.append("")
+    conf_matrix = np.zeros((len(ya_texts), len(ya_texts)), dtype=np.int64)
 
     # Get all YAs anchored in locutions (L-nodes).
     for rel_dict in loc_matrix:
@@ -487,72 +835,79 @@ def loc_ya_rels_comp(
         # Check the YA-node annotations (e.g., "Asserting", "Questioning" etc.)
         # ID equals 0 when L-node from one graph could not be aligned to any L-node from the other graph.
         if ID1 != 0 and ID2 != 0:
-            yas1 = get_ya_node_text_from_id(ID1, graph1, nodeset_id)
-            yas2 = get_ya_node_text_from_id(ID2, graph2, nodeset_id)
+            yas1 = get_ya_node_text_from_id(ID1, anchors1, nodeset_id)
+            yas2 = get_ya_node_text_from_id(ID2, anchors2, nodeset_id)
             # for predicted nodes we may have no text field annotations
             assert ignore_text_annotations or (
-                yas1 in all_ya_text
-            ), f"YA-node {yas1} must be in all_ya_text: {all_ya_text}"
-            assert yas2 in all_ya_text, f"YA-node {yas2} must be in all_ya_text: {all_ya_text}"
+                yas1 in ya_texts
+            ), f"YA-node {yas1} must be in ya_texts: {ya_texts}"
+            assert yas2 in ya_texts, f"YA-node {yas2} must be in ya_texts: {ya_texts}"
             if ignore_text_annotations or yas1 == yas2:
-                index = all_ya_text.index(yas1)
-                conf_matrix[index][index] += 1
+                index = ya_texts.index(yas1)
+                conf_matrix[index, index] += 1
             else:
-                index1 = all_ya_text.index(yas1)
-                index2 = all_ya_text.index(yas2)
-                conf_matrix[index2][index1] += 1
+                index1 = ya_texts.index(yas1)
+                index2 = ya_texts.index(yas2)
+                conf_matrix[index2, index1] += 1
         elif ID1 == 0 and ID2 == 0:
-            conf_matrix[len(all_ya_text) - 1][len(all_ya_text) - 1] += 1
+            conf_matrix[ya_texts.none_index, ya_texts.none_index] += 1
         elif ID1 == 0:
-            yas2 = get_ya_node_text_from_id(ID2, graph2, nodeset_id)
-            index = all_ya_text.index(yas2)
-            conf_matrix[len(all_ya_text) - 1][index] += 1
+            yas2 = get_ya_node_text_from_id(ID2, anchors2, nodeset_id)
+            index = ya_texts.index(yas2)
+            conf_matrix[ya_texts.none_index, index] += 1
         elif ID2 == 0:
-            yas1 = get_ya_node_text_from_id(ID1, graph1, nodeset_id)
-            index = all_ya_text.index(yas1)
-            conf_matrix[index][len(all_ya_text) - 1] += 1
+            yas1 = get_ya_node_text_from_id(ID1, anchors1, nodeset_id)
+            index = ya_texts.index(yas1)
+            conf_matrix[index, ya_texts.none_index] += 1
 
         # Get all YA-nodes anchored in transitions (TA-nodes) via locutions (L-nodes) - we only want to loop the matrix once.
-        conf_matrix = get_ta_locs(
-            ID1, ID2, graph1, graph2, conf_matrix, all_ya_text, ignore_text_annotations, nodeset_id
+        get_ta_locs(
+            ID1,
+            ID2,
+            anchors1,
+            anchors2,
+            conf_matrix,
+            ya_texts,
+            ignore_text_annotations,
+            nodeset_id,
         )
     return conf_matrix
 
 
 def update_conf_matrix_tas_in_one_graph(
     tas: List[int],
-    graph: DiGraph,
-    conf_matrix: List[List[int]],
-    all_ya_text_ext: List[str],
+    anchors: GraphAnchors,
+    conf_matrix: np.ndarray,
+    ya_texts: YATextVocabulary,
     nodeset_id: str,
     reverse_idx: bool = False,
 ):
     for ta in tas:
-        yas = get_ya_node_text_from_id(ta, graph, nodeset_id)
+        yas = get_ya_node_text_from_id(ta, anchors, nodeset_id)
         if yas == "":
-            conf_matrix[len(all_ya_text_ext) - 1][len(all_ya_text_ext) - 1] += 1
-        elif yas in all_ya_text_ext:
-            index = all_ya_text_ext.index(yas)
+            conf_matrix[ya_texts.none_index, ya_texts.none_index] += 1
+        elif yas in ya_texts:
+            index = ya_texts.index(yas)
             if reverse_idx:
-                conf_matrix[index][len(all_ya_text_ext) - 1] += 1
+                conf_matrix[index, ya_texts.none_index] += 1
             else:
-                conf_matrix[len(all_ya_text_ext) - 1][index] += 1
+                conf_matrix[ya_texts.none_index, index] += 1
 
 
 def update_conf_matrix_tas_in_both_graphs(
     tas1: List[int],
-    graph1: DiGraph,
+    anchors1: GraphAnchors,
     tas2: List[int],
-    graph2: DiGraph,
-    conf_matrix: List[List[int]],
-    all_ya_text_ext: List[str],
+    anchors2: GraphAnchors,
+    conf_matrix: np.ndarray,
+    ya_texts: YATextVocabulary,
     ignore_text_annotations: bool,
     nodeset_id: str,
     reverse_idx: bool = False,
 ):
     for tai, ta in enumerate(tas1):
         tas2_id = -1
-        yas1 = get_ya_node_text_from_id(ta, graph1, nodeset_id)
+        yas1 = get_ya_node_text_from_id(ta, anchors1, nodeset_id)
         try:
             tas2_id = tas2[tai]
         except Exception as e:
@@ -561,57 +916,56 @@ def update_conf_matrix_tas_in_both_graphs(
                 f"nodeset={nodeset_id}: Failed to align the predicted TA-node {ta}, predicted TA-nodes: {tas1}, gold TA-nodes {tas2}: {e}"
             )
 
-        if tas2_id == -1 and yas1 in all_ya_text_ext:
-            index = all_ya_text_ext.index(yas1)
+        if tas2_id == -1 and yas1 in ya_texts:
+            index = ya_texts.index(yas1)
             if reverse_idx:
-                conf_matrix[len(all_ya_text_ext) - 1][index] += 1
+                conf_matrix[ya_texts.none_index, index] += 1
             else:
-                conf_matrix[index][len(all_ya_text_ext) - 1] += 1
+                conf_matrix[index, ya_texts.none_index] += 1
         elif tas2_id != -1:
             # Check YA-node text (annotation): "Arguing" etc.
-            yas2 = get_ya_node_text_from_id(tas2_id, graph2, nodeset_id)
+            yas2 = get_ya_node_text_from_id(tas2_id, anchors2, nodeset_id)
             # if we ignore text field annotations we assume that we always have a match
             # but yas1 could be an empty string, hence we select the index based on yas2
             if ignore_text_annotations:
-                index = all_ya_text_ext.index(yas2)
-                conf_matrix[index][index] += 1
-            elif yas1 == yas2 and yas1 in all_ya_text_ext:
-                index = all_ya_text_ext.index(yas1)
-                conf_matrix[index][index] += 1
-            elif yas1 in all_ya_text_ext and yas2 in all_ya_text_ext:
-                index1 = all_ya_text_ext.index(yas1)
-                index2 = all_ya_text_ext.index(yas2)
+                index = ya_texts.index(yas2)
+                conf_matrix[index, index] += 1
+            elif yas1 == yas2 and yas1 in ya_texts:
+                index = ya_texts.index(yas1)
+                conf_matrix[index, index] += 1
+            elif yas1 in ya_texts and yas2 in ya_texts:
+                index1 = ya_texts.index(yas1)
+                index2 = ya_texts.index(yas2)
                 if reverse_idx:
-                    conf_matrix[index1][index2] += 1
+                    conf_matrix[index1, index2] += 1
                 else:
-                    conf_matrix[index2][index1] += 1
+                    conf_matrix[index2, index1] += 1
 
 
 def get_ta_locs(
     ID1: int,
     ID2: int,
-    graph1: DiGraph,
-    graph2: DiGraph,
-    conf_matrix: List[List[int]],
-    all_ya_text: List[str],
+    anchors1: GraphAnchors,
+    anchors2: GraphAnchors,
+    conf_matrix: np.ndarray,
+    ya_texts: YATextVocabulary,
     ignore_text_annotations: bool,
     nodeset_id: str,
-) -> List[List[int]]:
-    """Create confusion matrix for transitions between the locutions (TA-nodes)."""
-    all_ya_text_ext = copy.deepcopy(all_ya_text)
+) -> None:
+    """Update the confusion matrix (in place) for transitions between the locutions (TA-nodes)."""
     if ID1 != 0 and ID2 != 0:
-        tas1 = get_ta_nodes_from_id(ID1, graph1, nodeset_id)
-        tas2 = get_ta_nodes_from_id(ID2, graph2, nodeset_id)
+        tas1 = get_ta_nodes_from_id(ID1, anchors1, nodeset_id)
+        tas2 = get_ta_nodes_from_id(ID2, anchors2, nodeset_id)
 
         if len(tas1) > 0 and len(tas2) > 0:
             if len(tas1) > len(tas2):
                 update_conf_matrix_tas_in_both_graphs(
                     tas1,
-                    graph1,
+                    anchors1,
                     tas2,
-                    graph2,
+                    anchors2,
                     conf_matrix,
-                    all_ya_text_ext,
+                    ya_texts,
                     ignore_text_annotations,
                     nodeset_id,
                     reverse_idx=False,
@@ -619,75 +973,73 @@ def get_ta_locs(
             elif len(tas2) > len(tas1):
                 update_conf_matrix_tas_in_both_graphs(
                     tas2,
-                    graph2,
+                    anchors2,
                     tas1,
-                    graph1,
+                    anchors1,
                     conf_matrix,
-                    all_ya_text_ext,
+                    ya_texts,
                     ignore_text_annotations,
                     nodeset_id,
                     reverse_idx=True,
                 )
             else:
                 for tai, ta in enumerate(tas1):
-                    yas1 = get_ya_node_text_from_id(ta, graph1, nodeset_id)
-                    yas2 = get_ya_node_text_from_id(tas2[tai], graph2, nodeset_id)
+                    yas1 = get_ya_node_text_from_id(ta, anchors1, nodeset_id)
+                    yas2 = get_ya_node_text_from_id(tas2[tai], anchors2, nodeset_id)
                     if ignore_text_annotations:
-                        index = all_ya_text_ext.index(yas2)
-                        conf_matrix[index][index] += 1
-                    elif yas1 == yas2 and yas1 in all_ya_text_ext:
-                        index = all_ya_text_ext.index(yas1)
-                        conf_matrix[index][index] += 1
-                    elif yas1 in all_ya_text_ext and yas2 in all_ya_text_ext:
-                        index1 = all_ya_text_ext.index(yas1)
-                        index2 = all_ya_text_ext.index(yas2)
-                        conf_matrix[index2][index1] += 1
+                        index = ya_texts.index(yas2)
+                        conf_matrix[index, index] += 1
+                    elif yas1 == yas2 and yas1 in ya_texts:
+                        index = ya_texts.index(yas1)
+                        conf_matrix[index, index] += 1
+                    elif yas1 in ya_texts and yas2 in ya_texts:
+                        index1 = ya_texts.index(yas1)
+                        index2 = ya_texts.index(yas2)
+                        conf_matrix[index2, index1] += 1
 
         elif len(tas1) > 0 and len(tas2) < 1:
             update_conf_matrix_tas_in_one_graph(
-                tas1, graph1, conf_matrix, all_ya_text_ext, nodeset_id, reverse_idx=True
+                tas1, anchors1, conf_matrix, ya_texts, nodeset_id, reverse_idx=True
             )
 
         elif len(tas2) > 0 and len(tas1) < 1:
             update_conf_matrix_tas_in_one_graph(
-                tas2, graph2, conf_matrix, all_ya_text_ext, nodeset_id, reverse_idx=False
+                tas2, anchors2, conf_matrix, ya_texts, nodeset_id, reverse_idx=False
             )
 
         elif len(tas1) < 1 and len(tas2) < 1:
-            conf_matrix[len(all_ya_text_ext) - 1][len(all_ya_text_ext) - 1] += 1
+            conf_matrix[ya_texts.none_index, ya_texts.none_index] += 1
 
     elif ID1 == 0:
-        tas2 = get_ta_nodes_from_id(ID2, graph2, nodeset_id)
+        tas2 = get_ta_nodes_from_id(ID2, anchors2, nodeset_id)
         if len(tas2) > 0:
             update_conf_matrix_tas_in_one_graph(
-                tas2, graph2, conf_matrix, all_ya_text_ext, nodeset_id, reverse_idx=False
+                tas2, anchors2, conf_matrix, ya_texts, nodeset_id, reverse_idx=False
             )
         elif len(tas2) < 1:
-            conf_matrix[len(all_ya_text_ext) - 1][len(all_ya_text_ext) - 1] += 1
+            conf_matrix[ya_texts.none_index, ya_texts.none_index] += 1
 
     elif ID2 == 0:
-        tas1 = get_ta_nodes_from_id(ID1, graph1, nodeset_id)
+        tas1 = get_ta_nodes_from_id(ID1, anchors1, nodeset_id)
         if len(tas1) > 0:
             update_conf_matrix_tas_in_one_graph(
-                tas1, graph1, conf_matrix, all_ya_text_ext, nodeset_id, reverse_idx=True
+                tas1, anchors1, conf_matrix, ya_texts, nodeset_id, reverse_idx=True
             )
         elif len(tas1) < 1:
-            conf_matrix[len(all_ya_text_ext) - 1][len(all_ya_text_ext) - 1] += 1
-    return conf_matrix
+            conf_matrix[ya_texts.none_index, ya_texts.none_index] += 1
 
 
 def prop_ya_comp(
     prop_matrix: List[Dict[str, Any]],
-    graph1: DiGraph,
-    graph2: DiGraph,
+    anchors1: GraphAnchors,
+    anchors2: GraphAnchors,
+    ya_texts: YATextVocabulary,
     ignore_text_annotations: bool,
     nodeset_id: str,
-):
+) -> np.ndarray:
     """Create confusion matrix for YA-nodes: check their text annotations that can be "Restating",
     "Asserting" etc."""
-    all_ya_text = get_ya_node_texts(graph1, graph2)
-    conf_matrix = [[0 for x in range(len(all_ya_text) + 1)] for y in range(len(all_ya_text) + 1)]
-    all_ya_text.append("")
+    conf_matrix = np.zeros((len(ya_texts), len(ya_texts)), dtype=np.int64)
     for rel_dict in prop_matrix:
         ID1 = rel_dict["ID1"]
         ID2 = rel_dict["ID2"]
@@ -695,45 +1047,48 @@ def prop_ya_comp(
         text2 = rel_dict["text2"]
 
         if ID1 != 0 and ID2 != 0:
-            yas1 = get_ya_node_text_from_prop(ID1, graph1, nodeset_id)
-            yas2 = get_ya_node_text_from_prop(ID2, graph2, nodeset_id)
+            yas1 = get_ya_node_text_from_prop(ID1, anchors1, nodeset_id)
+            yas2 = get_ya_node_text_from_prop(ID2, anchors2, nodeset_id)
 
             if ignore_text_annotations:
-                index = all_ya_text.index(yas2)
-                conf_matrix[index][index] += 1
+                index = ya_texts.index(yas2)
+                conf_matrix[index, index] += 1
             elif yas1 == yas2:
-                index = all_ya_text.index(yas1)
-                conf_matrix[index][index] += 1
+                index = ya_texts.index(yas1)
+                conf_matrix[index, index] += 1
             else:
                 if yas1 != "" and yas2 != "":
-                    index1 = all_ya_text.index(yas1)
-                    index2 = all_ya_text.index(yas2)
-                    conf_matrix[index2][index1] += 1
+                    index1 = ya_texts.index(yas1)
+                    index2 = ya_texts.index(yas2)
+                    conf_matrix[index2, index1] += 1
 
         elif ID1 == 0 and ID2 == 0:
-            conf_matrix[len(all_ya_text) - 1][len(all_ya_text) - 1] += 1
+            conf_matrix[ya_texts.none_index, ya_texts.none_index] += 1
 
         elif ID1 == 0:
-            yas2 = get_ya_node_text_from_prop(ID2, graph2, nodeset_id)
-            index = all_ya_text.index(yas2)
-            conf_matrix[len(all_ya_text) - 1][index] += 1
+            yas2 = get_ya_node_text_from_prop(ID2, anchors2, nodeset_id)
+            index = ya_texts.index(yas2)
+            conf_matrix[ya_texts.none_index, index] += 1
 
         elif ID2 == 0:
-            yas2 = get_ya_node_text_from_prop(ID1, graph1, nodeset_id)
-            index = all_ya_text.index(yas1)
-            conf_matrix[index][len(all_ya_text) - 1] += 1
+            yas2 = get_ya_node_text_from_prop(ID1, anchors1, nodeset_id)
+            index = ya_texts.index(yas1)
+            conf_matrix[index, ya_texts.none_index] += 1
 
     return conf_matrix
 
 
 def loc_ta_rels_comp(
-    loc_matrix: List[Dict[str, Any]], graph1: DiGraph, graph2: DiGraph, nodeset_id: str
-) -> List[List[int]]:
+    loc_matrix: List[Dict[str, Any]],
+    anchors1: GraphAnchors,
+    anchors2: GraphAnchors,
+    nodeset_id: str,
+) -> np.ndarray:
     """Create confusion matrix for TA-nodes anchored in L-nodes.
 
     We check whether for each L-node in the relation we have the same amount of outgoing TA- nodes.
     """
-    conf_matrix = [[0, 0], [0, 0]]
+    conf_matrix = np.zeros((2, 2), dtype=np.int64)
 
     for rel_dict in loc_matrix:
         ID1 = rel_dict["ID1"]
@@ -742,42 +1097,42 @@ def loc_ta_rels_comp(
         text2 = rel_dict["text2"]
 
         if ID1 != 0 and ID2 != 0:
-            tas1 = count_ta_nodes(ID1, graph1, nodeset_id)
-            tas2 = count_ta_nodes(ID2, graph2, nodeset_id)
+            tas1 = count_ta_nodes(ID1, anchors1, nodeset_id)
+            tas2 = count_ta_nodes(ID2, anchors2, nodeset_id)
 
             if tas1 == tas2:
-                conf_matrix[0][0] += 1
+                conf_matrix[0, 0] += 1
             elif tas1 > tas2:
-                conf_matrix[1][0] += 1
+                conf_matrix[1, 0] += 1
             elif tas2 > tas1:
-                conf_matrix[0][1] += 1
+                conf_matrix[0, 1] += 1
 
         elif ID1 == 0:
-            conf_matrix[0][1] += 1
+            conf_matrix[0, 1] += 1
 
         elif ID2 == 0:
-            conf_matrix[1][0] += 1
+            conf_matrix[1, 0] += 1
 
     overallRelations = len(loc_matrix) * len(loc_matrix)
 
     total_agreed_none = (
-        overallRelations - conf_matrix[0][0] - conf_matrix[0][1] - conf_matrix[1][0]
+        overallRelations - conf_matrix[0, 0] - conf_matrix[0, 1] - conf_matrix[1, 0]
     )
 
-    conf_matrix[1][1] = total_agreed_none
+    conf_matrix[1, 1] = total_agreed_none
     return conf_matrix
 
 
 def prop_ya_anchor_comp(
     prop_matrix: List[Dict[str, Any]],
-    graph1: DiGraph,
-    graph2: DiGraph,
+    anchors1: GraphAnchors,
+    anchors2: GraphAnchors,
     ignore_text_annotations: bool,
     nodeset_id: str,
-):
+) -> np.ndarray:
     """Create confusion matrix for YA-nodes anchoring the propositions: check for matching text
     field annotations."""
-    conf_matrix = [[0, 0], [0, 0]]
+    conf_matrix = np.zeros((2, 2), dtype=np.int64)
 
     for rel_dict in prop_matrix:
         ID1 = rel_dict["ID1"]
@@ -786,57 +1141,44 @@ def prop_ya_anchor_comp(
         text2 = rel_dict["text2"]
 
         if ID1 != 0 and ID2 != 0:
-            yas1 = get_ya_node_from_prop_id(ID1, graph1, nodeset_id)
-            yas2 = get_ya_node_from_prop_id(ID2, graph2, nodeset_id)
+            yas1 = get_ya_node_from_prop_id(ID1, anchors1, nodeset_id)
+            yas2 = get_ya_node_from_prop_id(ID2, anchors2, nodeset_id)
             n_anch_1 = None
             n_anch_2 = None
             if yas1 != -1:
-                n_anch_1 = get_node_anchor_text(yas1, graph1, nodeset_id)
+                n_anch_1 = get_node_anchor_text(yas1, anchors1, nodeset_id)
             if yas2 != -1:
-                n_anch_2 = get_node_anchor_text(yas2, graph2, nodeset_id)
+                n_anch_2 = get_node_anchor_text(yas2, anchors2, nodeset_id)
 
             if not (n_anch_1 is None):
                 if ignore_text_annotations or n_anch_1 == n_anch_2:
-                    conf_matrix[0][0] += 1
+                    conf_matrix[0, 0] += 1
                 else:
-                    conf_matrix[1][0] += 1
+                    conf_matrix[1, 0] += 1
 
         elif ID1 == 0 and ID2 == 0:
-            conf_matrix[1][1] += 1
+            conf_matrix[1, 1] += 1
         elif ID1 == 0:
-            conf_matrix[0][1] += 1
+            conf_matrix[0, 1] += 1
         elif ID2 == 0:
-            conf_matrix[1][0] += 1
+            conf_matrix[1, 0] += 1
 
     return conf_matrix
 
 
-def get_ta_nodes_from_id(node_id: int, graph: DiGraph, nodeset_id: str) -> List[int]:
+def get_ta_nodes_from_id(node_id: int, anchors: GraphAnchors, nodeset_id: str) -> List[int]:
     """Collect all TA-nodes that are successors of a given node."""
     try:
-        successor_nodes = list(graph.successors(node_id))
-        ta_list = []
-        for n in successor_nodes:
-            n_type = graph.nodes[n]["type"]
-            if n_type == "TA":
-                n_id = n
-                ta_list.append(n_id)
-        return ta_list
-
+        return anchors.ta_nodes[node_id]
     except Exception as e:
         logger.error(f"nodeset={nodeset_id}: Failed to get successors for node with ID {node_id}")
         return []
 
 
-def get_ya_node_from_prop_id(node_id: int, graph: DiGraph, nodeset_id: str) -> int:
+def get_ya_node_from_prop_id(node_id: int, anchors: GraphAnchors, nodeset_id: str) -> int:
     """Get the predecessor YA-node (returns the first match or -1 if not found)."""
     try:
-        predecessor_nodes = list(graph.predecessors(node_id))
-        for n in predecessor_nodes:
-            n_type = graph.nodes[n]["type"]
-            if n_type == "YA":
-                return n
-        return -1
+        return anchors.ya_node_from_prop[node_id]
     except Exception as e:
         logger.error(
             f"nodeset={nodeset_id}: Failed to get predecessors for node with ID {node_id}"
@@ -844,53 +1186,28 @@ def get_ya_node_from_prop_id(node_id: int, graph: DiGraph, nodeset_id: str) -> i
         return -1
 
 
-def get_ya_node_texts(graph1: DiGraph, graph2: DiGraph) -> List[str]:
+def get_ya_node_texts(anchors1: GraphAnchors, anchors2: GraphAnchors) -> List[str]:
     """Collect all possible text annotations for YA-nodes (w/o any duplicates)."""
-    ya_node_list1 = []
-    ya_node_list2 = []
-    ya_text_list = []
-
-    ya_node_list1 = centrality.get_rels("YA", graph1)
-    ya_node_list2 = centrality.get_rels("YA", graph2)
-
-    for ya in ya_node_list1:
-        n_text = graph1.nodes[ya]["text"]
-        ya_text_list.append(n_text)
-    for ya in ya_node_list2:
-        n_text = graph2.nodes[ya]["text"]
-        ya_text_list.append(n_text)
-
+    ya_text_list = anchors1.ya_texts + anchors2.ya_texts
     ya_text_list = list(set(ya_text_list))
     return ya_text_list
 
 
-def get_ya_node_text_from_id(node_id: int, graph: DiGraph, nodeset_id: str) -> str:
+def get_ya_node_text_from_id(node_id: int, anchors: GraphAnchors, nodeset_id: str) -> str:
     """Get text field annotation for a YA-node that is a successor of the given node (returns the
     first match or empty string if not found)."""
     try:
-        successor_nodes = list(graph.successors(node_id))
-        for n in successor_nodes:
-            n_type = graph.nodes[n]["type"]
-            if n_type == "YA":
-                n_text = graph.nodes[n]["text"]
-                return n_text
-        return ""
+        return anchors.ya_text_from_id[node_id]
     except Exception as e:
         logger.error(f"nodeset={nodeset_id}: Failed to get successors for node with ID {node_id}")
         return ""
 
 
-def get_ya_node_text_from_prop(node_id: int, graph: DiGraph, nodeset_id: str) -> str:
+def get_ya_node_text_from_prop(node_id: int, anchors: GraphAnchors, nodeset_id: str) -> str:
     """Get text field annotation for a YA-node that is a predecessor of the given node (returns the
     first match or empty string if not found)."""
     try:
-        predecessor_nodes = list(graph.predecessors(node_id))
-        for n in predecessor_nodes:
-            n_type = graph.nodes[n]["type"]
-            if n_type == "YA":
-                n_text = graph.nodes[n]["text"]
-                return n_text
-        return ""
+        return anchors.ya_text_from_prop[node_id]
     except Exception as e:
         logger.error(
             f"nodeset={nodeset_id}: Failed to get predecessors for node with ID {node_id}"
@@ -898,17 +1215,11 @@ def get_ya_node_text_from_prop(node_id: int, graph: DiGraph, nodeset_id: str) ->
         return ""
 
 
-def get_node_anchor_text(node_id: int, graph: DiGraph, nodeset_id: str) -> str:
+def get_node_anchor_text(node_id: int, anchors: GraphAnchors, nodeset_id: str) -> str:
     """Get text field annotation for L-node or TA-node of the given node (returns the first match
     or empty string if not found)."""
     try:
-        nodes = list(graph.predecessors(node_id))
-        for n in nodes:
-            n_type = graph.nodes[n]["type"]
-            if n_type == "L" or n_type == "TA":
-                n_text = graph.nodes[n]["text"]
-                return n_text
-        return ""
+        return anchors.anchor_text[node_id]
     except Exception as e:
         logger.error(
             f"nodeset={nodeset_id}: Failed to get predecessors for node with ID {node_id}"
@@ -922,7 +1233,9 @@ def calculate_matching(
     ignore_text_annotations: bool,
     ignore_timestamp_casting: bool,
     nodeset_id: str,
-) -> List[Dict[int, Dict[int, int]]]:
+    matching_method: str = "greedy",
+    fast_parsing: bool = False,
+) -> List[np.ndarray]:
     """Build confusion matrices for different types of relations.
     Args:
         predicted_data: A dictionary with nodes, edges and locutions for the predicted nodeset.
@@ -930,9 +1243,14 @@ def calculate_matching(
         ignore_text_annotations: Whether to ignore text annotations of nodes.
         ignore_timestamp_casting: Whether to ignore timestamp casting errors.
         nodeset_id: Nodeset ID.
+        matching_method: How to align the I-/L-nodes of both graphs by text similarity: "greedy"
+            (default) or "optimal" (maximizes the total similarity), see select_max_vals.
+        fast_parsing: Whether to skip parsing the timestamps, scheme IDs and locutions (they are
+            not used for the metrics), see load_map.parse_json.
 
     Returns:
-        Confusion matrices for the following transitions:
+        Confusion matrices (integer arrays, see cass_metrics.ConfusionMatrix) for the following
+        transitions:
             all_s_a_cm: YA > S (S-nodes: MA, RA, CA)
             prop_rels_comp_cm: I > S (S-nodes: MA, RA, CA)
             loc_ya_rels_comp_cm: L > YA
@@ -942,51 +1260,65 @@ def calculate_matching(
 
     """
     # Graph construction.
-    graph1, graph2 = get_graphs(predicted_data, gold_data, ignore_timestamp_casting)
+    graph1, graph2 = get_graphs(
+        predicted_data, gold_data, ignore_timestamp_casting, fast_parsing=fast_parsing
+    )
+    # Collect the nodes of each graph by type once for both similarity matrices.
+    type2nodes1 = centrality.get_type2node_list(graph1)
+    type2nodes2 = centrality.get_type2node_list(graph2)
     # Creating similarity matrix for propositional relations.
-    prop_rels = get_sim_matrix(graph1, graph2, "propositions")
+    prop_rels = get_sim_matrix(
+        graph1, graph2, "propositions", matching_method, type2nodes1, type2nodes2
+    )
     # Creating similarity matrix for locutional relations.
-    loc_rels = get_sim_matrix(graph1, graph2, "locutions")
+    loc_rels = get_sim_matrix(
+        graph1, graph2, "locutions", matching_method, type2nodes1, type2nodes2
+    )
+    # Precompute the anchors of all nodes once per graph for the confusion matrix builders.
+    anchors1 = GraphAnchors(graph1)
+    anchors2 = GraphAnchors(graph2)
+    # The labels (rows and columns) of the confusion matrices for the YA-node annotations.
+    ya_texts = YATextVocabulary(get_ya_node_texts(anchors1, anchors2))
     # (1) Do we have the same YA > S transitions? Do their annotations coincide?
     # Anchoring on S-nodes (RA/CA/MA) and combining them (checking how many YA-anchors,
     # predecessors of S-nodes, have the same/different text field annotations).
-    ra_a = s_rel_anchor("RA", graph1, graph2, ignore_text_annotations, nodeset_id)
-    ma_a = s_rel_anchor("MA", graph1, graph2, ignore_text_annotations, nodeset_id)
-    ca_a = s_rel_anchor("CA", graph1, graph2, ignore_text_annotations, nodeset_id)
+    ra_a = s_rel_anchor("RA", anchors1, anchors2, ignore_text_annotations, nodeset_id)
+    ma_a = s_rel_anchor("MA", anchors1, anchors2, ignore_text_annotations, nodeset_id)
+    ca_a = s_rel_anchor("CA", anchors1, anchors2, ignore_text_annotations, nodeset_id)
     all_s = combine_s_node_matrix(ra_a, ca_a, ma_a)
 
     # (2) Do we have the same S-nodes?
     # Comparing propositional relations, building a confusion matrix for S-node (RA, MA, CA)
     # matches between the two graphs.
-    prop_rels_comp_conf = prop_rels_comp(prop_rels, graph1, graph2, nodeset_id)
+    prop_rels_comp_conf = prop_rels_comp(prop_rels, anchors1, anchors2, nodeset_id)
 
     # (3) Do we have the same L > YA transitions? Do their annotations coincide?
     # Getting all YAs anchored in locutions, comparing the text field annotations of YA-nodes,
     # successors of L-nodes, anchored in locutions.
     loc_ya_rels_comp_conf = loc_ya_rels_comp(
-        loc_rels, graph1, graph2, ignore_text_annotations, nodeset_id
+        loc_rels, anchors1, anchors2, ya_texts, ignore_text_annotations, nodeset_id
     )
 
     # (4) Do we have the same YA > I transitions? Do their annotations coincide?
     # Getting all YAs in propositions, comparing the text field annotations of YA-nodes,
     # predecessors of I-nodes, anchored in propositions.
     prop_ya_comp_conf = prop_ya_comp(
-        prop_rels, graph1, graph2, ignore_text_annotations, nodeset_id
+        prop_rels, anchors1, anchors2, ya_texts, ignore_text_annotations, nodeset_id
     )
 
     # (5) Do we have the same (TA-node) transitions between the L-nodes (L > TA > L transitions)?
     # Getting all TAs anchored in locutions, checking whether each L-node pair (from graph1 and graph2)
     # has the same amount of outgoing TA-nodes.
-    loc_ta_conf = loc_ta_rels_comp(loc_rels, graph1, graph2, nodeset_id)
+    loc_ta_conf = loc_ta_rels_comp(loc_rels, anchors1, anchors2, nodeset_id)
 
     # (6) Do we have I-nodes anchored in the same L-nodes (L > YA > I transitions)? Do their annotations coincide?
     # Getting all YAs anchored in propositions, comparing the text field annotations of L-/TA-nodes
     # that are predecessors of YA-nodes anchored in propositions (I-nodes).
     prop_ya_conf = prop_ya_anchor_comp(
-        prop_rels, graph1, graph2, ignore_text_annotations, nodeset_id
+        prop_rels, anchors1, anchors2, ignore_text_annotations, nodeset_id
     )
 
-    conf_matrices = [
+    return [
         all_s,
         prop_rels_comp_conf,
         loc_ya_rels_comp_conf,
@@ -994,5 +1326,3 @@ def calculate_matching(
         loc_ta_conf,
         prop_ya_conf,
     ]
-    as_dicts = [convert_to_dict(cm) for cm in conf_matrices]
-    return as_dicts
@@ -0,0 +1,170 @@
+"""Lightweight NumPy implementation of the macro averaged precision, recall and F1 scores that
+are used by eval_official.py. The results are the same as the ones of
+sklearn.metrics.precision_recall_fscore_support(..., average="macro"), but importing and calling
+this module is much cheaper."""
+
+import logging
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def encode_labels(y_true: Sequence, y_pred: Sequence) -> Tuple[List, np.ndarray, np.ndarray]:
+    """Encode gold and predicted labels as indices into the sorted list of all labels that occur
+    in any of them (this is the same label set as sklearn uses).
+
+    Args:
+        y_true: The gold labels.
+        y_pred: The predicted labels.
+
+    Returns:
+        A tuple containing the sorted labels, the encoded gold labels and the encoded predicted
+        labels.
+    """
+    if len(y_true) != len(y_pred):
+        raise ValueError(
+            f"y_true and y_pred need to have the same length, but got {len(y_true)} and "
+            f"{len(y_pred)}"
+        )
+    labels, encoded = np.unique(np.asarray(list(y_true) + list(y_pred)), return_inverse=True)
+    encoded = encoded.reshape(-1)
+    return labels.tolist(), encoded[: len(y_true)], encoded[len(y_true) :]
+
+
+def confusion_matrix(true_idx: np.ndarray, pred_idx: np.ndarray, num_labels: int) -> np.ndarray:
+    """Create a confusion matrix (rows: gold labels, columns: predicted labels) from encoded
+    labels."""
+    flat = np.bincount(true_idx * num_labels + pred_idx, minlength=num_labels * num_labels)
+    return flat.reshape(num_labels, num_labels)
+
+
+def _divide(
+    numerator: np.ndarray, denominator: np.ndarray, zero_division: Union[str, float]
+) -> Tuple[np.ndarray, bool]:
+    """Divide element-wise and set the result to zero_division where the denominator is zero.
+    "warn" is handled like 0.0. Also returns whether any division by zero occurred."""
+    mask = denominator == 0
+    result = numerator / np.where(mask, 1, denominator)
+    if mask.any():
+        result[mask] = 0.0 if zero_division == "warn" else zero_division
+    return result, bool(mask.any())
+
+
+def _nanmean(values: np.ndarray) -> float:
+    values = values[~np.isnan(values)]
+    return float(np.mean(values)) if len(values) > 0 else float("nan")
+
+
+def macro_precision_recall_fscore(
+    confusion_matrix: np.ndarray, zero_division: Union[str, float] = "warn"
+) -> Tuple[float, float, float]:
+    """Compute macro averaged precision, recall and F1 from a confusion matrix (rows: gold labels,
+    columns: predicted labels) in the same way as sklearn.metrics.precision_recall_fscore_support
+    does, i.e. only labels that occur as gold or predicted label are taken into account.
+
+    Args:
+        confusion_matrix: A square matrix with the counts.
+        zero_division: The value to use if a division by zero occurs. If "warn", 0.0 is used and a
+            warning is logged.
+
+    Returns:
+        A tuple (precision, recall, f1).
+    """
+    true_sum = confusion_matrix.sum(axis=1)
+    pred_sum = confusion_matrix.sum(axis=0)
+    present = (true_sum + pred_sum) > 0
+    tp_sum = np.diag(confusion_matrix)[present].astype(np.float64)
+    true_sum = true_sum[present].astype(np.float64)
+    pred_sum = pred_sum[present].astype(np.float64)
+
+    precision, precision_ill_defined = _divide(tp_sum, pred_sum, zero_division)
+    recall, recall_ill_defined = _divide(tp_sum, true_sum, zero_division)
+    f_score, _ = _divide(2 * tp_sum, true_sum + pred_sum, zero_division)
+    if zero_division == "warn" and (precision_ill_defined or recall_ill_defined):
+        logger.warning(
+            "Precision or recall is ill-defined and being set to 0.0 for labels without "
+            "predicted or true samples."
+        )
+    return _nanmean(precision), _nanmean(recall), _nanmean(f_score)
+
+
+def precision_recall_fscore(
+    y_true: Sequence, y_pred: Sequence, zero_division: Union[str, float] = "warn"
+) -> Tuple[float, float, float]:
+    """Compute macro averaged precision, recall and F1 for gold and predicted labels.
+
+    Args:
+        y_true: The gold labels.
+        y_pred: The predicted labels.
+        zero_division: See macro_precision_recall_fscore.
+
+    Returns:
+        A tuple (precision, recall, f1).
+    """
+    labels, true_idx, pred_idx = encode_labels(y_true, y_pred)
+    matrix = confusion_matrix(true_idx, pred_idx, num_labels=len(labels))
+    return macro_precision_recall_fscore(matrix, zero_division=zero_division)
+
+
+def batched_macro_precision_recall_fscore(
+    confusion_matrices: np.ndarray, zero_division: float = 0.0
+) -> np.ndarray:
+    """Vectorized version of macro_precision_recall_fscore for a stack of confusion matrices that
+    share the same label axis, e.g. the confusion matrices of multiple prediction runs for the
+    same nodeset. Labels that do not occur in a single confusion matrix are ignored for that
+    matrix, so the results are the same as calling macro_precision_recall_fscore for each matrix.
+
+    Args:
+        confusion_matrices: An array of shape (batch_size, num_labels, num_labels).
+        zero_division: The value to use if a division by zero occurs.
+
+    Returns:
+        An array of shape (batch_size, 3) with the precision, recall and F1 per confusion matrix.
+        Empty confusion matrices result in NaN.
+    """
+    true_sum = confusion_matrices.sum(axis=2).astype(np.float64)
+    pred_sum = confusion_matrices.sum(axis=1).astype(np.float64)
+    tp_sum = np.diagonal(confusion_matrices, axis1=1, axis2=2).astype(np.float64)
+    present = (true_sum + pred_sum) > 0
+
+    precision, _ = _divide(tp_sum, pred_sum, zero_division)
+    recall, _ = _divide(tp_sum, true_sum, zero_division)
+    f_score, _ = _divide(2 * tp_sum, true_sum + pred_sum, zero_division)
+    # shape: (batch_size, 3, num_labels)
+    scores = np.stack([precision, recall, f_score], axis=1)
+    scores = np.where(present[:, None, :], scores, 0.0)
+    num_present = present.sum(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return scores.sum(axis=2) / num_present[:, None]
+
+
+def batched_general_and_focused_scores(
+    confusion_matrices: np.ndarray, focused_index: Optional[int], zero_division: float = 0.0
+) -> Dict[str, np.ndarray]:
+    """Compute the general and the focused macro scores for a stack of confusion matrices. The
+    focused scores ignore all entries whose gold label is the one at focused_index (i.e. the
+    label that encodes "no relation").
+
+    Args:
+        confusion_matrices: An array of shape (batch_size, num_labels, num_labels).
+        focused_index: The index of the label to ignore for the focused scores. None, if the label
+            does not occur in the confusion matrices.
+        zero_division: See batched_macro_precision_recall_fscore.
+
+    Returns:
+        A mapping from "general" and "focused" to arrays of shape (batch_size, 3) with precision,
+        recall and F1. Empty confusion matrices result in NaN.
+    """
+    focused_confusion_matrices = confusion_matrices
+    if focused_index is not None:
+        focused_confusion_matrices = confusion_matrices.copy()
+        focused_confusion_matrices[:, focused_index] = 0
+
+    return {
+        "general": batched_macro_precision_recall_fscore(confusion_matrices, zero_division),
+        "focused": batched_macro_precision_recall_fscore(
+            focused_confusion_matrices, zero_division
+        ),
+    }
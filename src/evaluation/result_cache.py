@@ -0,0 +1,124 @@
+"""On-disk cache for per-nodeset evaluation results.
+
+A result is stored under a key that is derived from the content of the predicted and the gold
+nodeset file, the version of the evaluator (by default, a hash of the source files of the
+evaluation code) and the evaluation settings (mode, flags, ...). If any of these change, the
+result is recomputed. Each result is stored as a separate JSON file, so the cache can be shared
+by multiple processes.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "dialam-2024", "evaluation")
+
+
+def get_file_hash(path: str, chunk_size: int = 1 << 20) -> str:
+    """Get the SHA-256 hash of the content of a file."""
+
+    file_hash = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            file_hash.update(chunk)
+    return file_hash.hexdigest()
+
+
+def get_source_version(paths: Iterable[str]) -> str:
+    """Get a version string for the evaluation code by hashing the content of the source files
+    (e.g. [__file__] of the evaluation script and of the modules it depends on)."""
+
+    source_hash = hashlib.sha256()
+    for path in paths:
+        source_hash.update(get_file_hash(path).encode())
+    return source_hash.hexdigest()
+
+
+class ResultCache:
+    """Cache for evaluation results (JSON serializable dicts) that are computed from a predicted
+    and a gold nodeset file.
+
+    Args:
+        cache_dir: The directory where the results are stored.
+        version: The version of the evaluator, see get_source_version.
+        settings: All evaluation settings that affect the results, e.g. the evaluation mode.
+    """
+
+    def __init__(self, cache_dir: str, version: str, settings: Dict[str, Any]):
+        self.cache_dir = cache_dir
+        self.version = version
+        self.settings = settings
+        self._settings_str = json.dumps(settings, sort_keys=True)
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    def get_key(self, predicted_file: str, gold_file: str) -> str:
+        return self.get_key_from_hashes(get_file_hash(predicted_file), get_file_hash(gold_file))
+
+    def get_key_from_hashes(self, predicted_hash: str, gold_hash: str) -> str:
+        """Get the key from the content hashes of the predicted and the gold nodeset, e.g. if
+        they are not stored as separate files."""
+        key_hash = hashlib.sha256()
+        for part in [
+            predicted_hash,
+            gold_hash,
+            self.version,
+            self._settings_str,
+        ]:
+            key_hash.update(part.encode())
+            # separator to make the key unambiguous
+            key_hash.update(b"\0")
+        return key_hash.hexdigest()
+
+    def _get_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the cached result for a key or None, if there is no (readable) entry."""
+
+        path = self._get_path(key)
+        try:
+            with open(path) as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            result = None
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read cache entry {path}, ignoring it: {e}")
+            result = None
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def set(self, key: str, result: Dict[str, Any]) -> None:
+        path = self._get_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # write to a temporary file first, so that concurrent readers never see partial entries
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(result, f)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.writes += 1
+
+    def get_stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "writes": self.writes}
+
+    def format_stats(self) -> str:
+        return (
+            f"result cache ({self.cache_dir}): {self.hits} hits, {self.misses} misses, "
+            f"{self.writes} writes"
+        )
+
+    def log_stats(self) -> None:
+        logger.info(self.format_stats())
@@ -0,0 +1,334 @@
+"""SQLite database to store the evaluation results per run, nodeset, mode and metric.
+
+The results are written by eval_official.py and evaluate.py if --results_db is provided. The
+query CLI of this module re-aggregates them without reading the nodesets again, e.g.:
+
+$ python src/evaluation/results_db.py --db results.sqlite runs
+$ python src/evaluation/results_db.py --db results.sqlite mean --run RUN_NAME
+$ python src/evaluation/results_db.py --db results.sqlite mean --run RUN_NAME \
+    --nodeset_blacklist @blacklist.txt
+$ python src/evaluation/results_db.py --db results.sqlite micro --run RUN_NAME
+$ python src/evaluation/results_db.py --db results.sqlite compare --run RUN_A --run RUN_B
+
+where blacklist.txt contains one nodeset ID per line.
+
+The mean is the average of the per-nodeset scores (as reported by the evaluation scripts). The
+micro scores are computed from the confusion counts summed over all selected nodesets (only
+available for the results of eval_official.py).
+"""
+
+import argparse
+import json
+import math
+import sqlite3
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pyrootutils
+
+pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], pythonpath=True)
+
+from src.evaluation.prf_metrics import macro_precision_recall_fscore
+
+# the label that encodes "no relation" in the stored confusion counts (for all modes)
+NO_RELATION_LABEL = "None"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    evaluator TEXT NOT NULL,
+    settings TEXT NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    nodeset_id TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    PRIMARY KEY (run_id, nodeset_id, mode, metric)
+);
+CREATE TABLE IF NOT EXISTS confusion_counts (
+    run_id INTEGER NOT NULL REFERENCES runs(run_id) ON DELETE CASCADE,
+    nodeset_id TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    gold_label TEXT NOT NULL,
+    pred_label TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (run_id, nodeset_id, mode, gold_label, pred_label)
+);
+"""
+
+
+class ResultsDatabase:
+    """Store and query evaluation results. The rows are buffered and inserted in batches.
+
+    Args:
+        path: The path to the SQLite database file. It is created if it does not exist.
+        batch_size: The number of rows to collect before inserting them.
+    """
+
+    def __init__(self, path: str, batch_size: int = 10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        self.connection.executescript(SCHEMA)
+        self._score_rows: List[Tuple[int, str, str, str, Optional[float]]] = []
+        self._confusion_rows: List[Tuple[int, str, str, str, str, int]] = []
+
+    def add_run(self, name: str, evaluator: str, settings: Dict[str, Any]) -> int:
+        """Add a run and return its ID. An existing run with the same name is replaced."""
+
+        with self.connection:
+            self.connection.execute("DELETE FROM runs WHERE name = ?", (name,))
+            cursor = self.connection.execute(
+                "INSERT INTO runs (name, evaluator, settings, created_at) VALUES (?, ?, ?, ?)",
+                (
+                    name,
+                    evaluator,
+                    json.dumps(settings, sort_keys=True),
+                    datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+        return cursor.lastrowid
+
+    def add_scores(self, run_id: int, nodeset_id: str, mode: str, scores: Dict[str, float]):
+        for metric, value in scores.items():
+            # NaN is stored as NULL, so it is ignored by the aggregation functions
+            if value is not None and math.isnan(value):
+                value = None
+            self._score_rows.append((run_id, nodeset_id, mode, metric, value))
+        if len(self._score_rows) >= self.batch_size:
+            self.flush()
+
+    def add_confusion_counts(
+        self, run_id: int, nodeset_id: str, mode: str, confusion: Dict[Tuple[str, str], int]
+    ):
+        for (gold_label, pred_label), count in confusion.items():
+            self._confusion_rows.append(
+                (run_id, nodeset_id, mode, str(gold_label), str(pred_label), int(count))
+            )
+        if len(self._confusion_rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO scores VALUES (?, ?, ?, ?, ?)", self._score_rows
+            )
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO confusion_counts VALUES (?, ?, ?, ?, ?, ?)",
+                self._confusion_rows,
+            )
+        self._score_rows = []
+        self._confusion_rows = []
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self) -> "ResultsDatabase":
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def get_runs(self) -> List[Dict[str, Any]]:
+        cursor = self.connection.execute(
+            "SELECT runs.name, runs.evaluator, runs.created_at, COUNT(DISTINCT scores.nodeset_id) "
+            "FROM runs LEFT JOIN scores ON runs.run_id = scores.run_id "
+            "GROUP BY runs.run_id ORDER BY runs.run_id"
+        )
+        return [
+            {"name": name, "evaluator": evaluator, "created_at": created_at, "nodesets": count}
+            for name, evaluator, created_at, count in cursor
+        ]
+
+    def _get_run_id(self, run: str) -> int:
+        row = self.connection.execute("SELECT run_id FROM runs WHERE name = ?", (run,)).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown run: {run}")
+        return row[0]
+
+    def _select(
+        self,
+        table: str,
+        columns: str,
+        run: str,
+        mode: Optional[str] = None,
+        nodeset_whitelist: Optional[Iterable[str]] = None,
+        nodeset_blacklist: Optional[Iterable[str]] = None,
+        group_by: Optional[str] = None,
+    ) -> sqlite3.Cursor:
+        query = f"SELECT {columns} FROM {table} WHERE run_id = ?"
+        params: List[Any] = [self._get_run_id(run)]
+        if mode is not None:
+            query += " AND mode = ?"
+            params.append(mode)
+        for nodeset_ids, operator in [(nodeset_whitelist, "IN"), (nodeset_blacklist, "NOT IN")]:
+            if nodeset_ids is not None:
+                nodeset_ids = list(nodeset_ids)
+                query += f" AND nodeset_id {operator} ({', '.join('?' * len(nodeset_ids))})"
+                params.extend(nodeset_ids)
+        if group_by is not None:
+            query += f" GROUP BY {group_by} ORDER BY MIN(rowid)"
+        return self.connection.execute(query, params)
+
+    def get_mean_scores(self, run: str, **kwargs) -> Dict[Tuple[str, str], Tuple[float, int]]:
+        """Get the mean over the nodesets per mode and metric.
+
+        Args:
+            run: The name of the run.
+            **kwargs: Filters: mode, nodeset_whitelist and nodeset_blacklist.
+
+        Returns:
+            A mapping from (mode, metric) to (mean, number of nodesets).
+        """
+        cursor = self._select(
+            "scores",
+            "mode, metric, AVG(value), COUNT(value)",
+            run=run,
+            group_by="mode, metric",
+            **kwargs,
+        )
+        return {(mode, metric): (mean, count) for mode, metric, mean, count in cursor}
+
+    def get_micro_scores(self, run: str, **kwargs) -> Dict[Tuple[str, str], float]:
+        """Get the general and focused precision, recall and F1 per mode computed from the
+        confusion counts summed over all nodesets.
+
+        Args:
+            run: The name of the run.
+            **kwargs: Filters: mode, nodeset_whitelist and nodeset_blacklist.
+
+        Returns:
+            A mapping from (mode, metric) to the score.
+        """
+        cursor = self._select(
+            "confusion_counts",
+            "mode, gold_label, pred_label, SUM(count)",
+            run=run,
+            group_by="mode, gold_label, pred_label",
+            **kwargs,
+        )
+        mode2confusion: Dict[str, Dict[Tuple[str, str], int]] = defaultdict(dict)
+        for mode, gold_label, pred_label, count in cursor:
+            mode2confusion[mode][(gold_label, pred_label)] = count
+
+        result = {}
+        for mode, confusion in mode2confusion.items():
+            labels = sorted({label for pair in confusion for label in pair})
+            label2idx = {label: idx for idx, label in enumerate(labels)}
+            matrix = np.zeros((len(labels), len(labels)), dtype=np.int64)
+            for (gold_label, pred_label), count in confusion.items():
+                matrix[label2idx[gold_label], label2idx[pred_label]] = count
+            focused_matrix = matrix.copy()
+            if NO_RELATION_LABEL in label2idx:
+                focused_matrix[label2idx[NO_RELATION_LABEL]] = 0
+            for name, current_matrix in [("general", matrix), ("focused", focused_matrix)]:
+                if current_matrix.sum() == 0:
+                    continue
+                scores = macro_precision_recall_fscore(current_matrix, zero_division=0.0)
+                for stat_name, value in zip(["p", "r", "f1"], scores):
+                    result[(mode, f"{name}.{stat_name}")] = value
+        return result
+
+
+def read_nodeset_ids(values: Optional[List[str]]) -> Optional[List[str]]:
+    # allow comma separated values in addition to separate arguments
+    if values is None:
+        return None
+    return [value.strip() for entry in values for value in entry.split(",") if value.strip()]
+
+
+def main(
+    db: str,
+    command: str,
+    run: Optional[List[str]] = None,
+    mode: Optional[str] = None,
+    nodeset_whitelist: Optional[List[str]] = None,
+    nodeset_blacklist: Optional[List[str]] = None,
+):
+    with ResultsDatabase(db) as database:
+        if command == "runs":
+            for entry in database.get_runs():
+                print(
+                    f"{entry['name']}: evaluator={entry['evaluator']}, "
+                    f"nodesets={entry['nodesets']}, created_at={entry['created_at']}"
+                )
+            return
+
+        filters = dict(
+            mode=mode,
+            nodeset_whitelist=read_nodeset_ids(nodeset_whitelist),
+            nodeset_blacklist=read_nodeset_ids(nodeset_blacklist),
+        )
+        # all runs if none are selected
+        runs = run or [entry["name"] for entry in database.get_runs()]
+        if command == "mean":
+            for current_run in runs:
+                print(f"run: {current_run}")
+                scores = database.get_mean_scores(current_run, **filters)
+                for (current_mode, metric), (value, count) in scores.items():
+                    print(f"{current_mode}.{metric}: {value} (nodesets: {count})")
+        elif command == "micro":
+            for current_run in runs:
+                print(f"run: {current_run}")
+                scores = database.get_micro_scores(current_run, **filters)
+                for (current_mode, metric), value in scores.items():
+                    print(f"{current_mode}.{metric}: {value}")
+        elif command == "compare":
+            if len(runs) < 2:
+                raise ValueError("compare requires at least two runs")
+            all_scores = [database.get_mean_scores(current_run, **filters) for current_run in runs]
+            print("\t".join(["metric"] + runs + [f"delta ({runs[-1]} - {runs[0]})"]))
+            for key in all_scores[0]:
+                values = [scores.get(key, (float("nan"), 0))[0] for scores in all_scores]
+                delta = values[-1] - values[0]
+                print("\t".join([".".join(key)] + [str(value) for value in values + [delta]]))
+        else:
+            raise ValueError(f"Unknown command: {command}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Query evaluation results stored with --results_db",
+        fromfile_prefix_chars="@",
+    )
+    parser.add_argument("--db", type=str, required=True, help="Path to the SQLite database")
+    parser.add_argument(
+        "command",
+        type=str,
+        choices=["runs", "mean", "micro", "compare"],
+        help="runs: list all runs, mean: mean over the nodesets, micro: scores computed from the "
+        "confusion counts summed over the nodesets, compare: mean over the nodesets for "
+        "multiple runs side by side",
+    )
+    parser.add_argument(
+        "--run",
+        type=str,
+        action="append",
+        help="Name of the run (can be used multiple times). If not provided, all runs are used",
+    )
+    parser.add_argument("--mode", type=str, help="Only show results for this mode")
+    parser.add_argument(
+        "--nodeset_whitelist",
+        type=str,
+        nargs="+",
+        help="Only use these nodesets (IDs separated by spaces or commas, or @FILE with one ID "
+        "per line)",
+    )
+    parser.add_argument(
+        "--nodeset_blacklist",
+        type=str,
+        nargs="+",
+        help="Ignore these nodesets (IDs separated by spaces or commas, or @FILE with one ID per "
+        "line)",
+    )
+
+    args = vars(parser.parse_args())
+    main(**args)
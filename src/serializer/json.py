@@ -1,4 +1,3 @@
-import json
 import os
 from typing import Dict, List, Optional, Sequence, Type, TypeVar
 
@@ -8,6 +7,7 @@ from pytorch_ie.utils.hydra import resolve_optional_document_type, serialize_doc
 
 from src.serializer.interface import DocumentSerializer
 from src.utils import get_pylogger
+from src.utils.json_utils import dumps_bytes, dumps_lines, read_json, read_json_lines, write_json
 
 log = get_pylogger(__name__)
 
@@ -52,20 +52,18 @@ class JsonSerializer(DocumentSerializer):
                 f"metadata file {full_metadata_file_name} already exists, "
                 "it will be overwritten!"
             )
-        with open(full_metadata_file_name, "w") as f:
-            json.dump(metadata, f, indent=2)
+        write_json(full_metadata_file_name, metadata, indent=2)
 
         if split is not None:
             realpath = os.path.join(realpath, split)
             os.makedirs(realpath, exist_ok=True)
         full_file_name = os.path.join(realpath, file_name)
         if as_json_lines(file_name):
-            with open(full_file_name, "w") as f:
-                for doc in documents:
-                    f.write(json.dumps(doc.asdict(), **kwargs) + "\n")
+            data = dumps_lines((doc.asdict() for doc in documents), **kwargs)
         else:
-            with open(full_file_name, "w") as f:
-                json.dump([doc.asdict() for doc in documents], fp=f, **kwargs)
+            data = dumps_bytes([doc.asdict() for doc in documents], **kwargs)
+        with open(full_file_name, "wb") as f:
+            f.write(data)
         return {"path": realpath, "file_name": file_name, "metadata_file_name": metadata_file_name}
 
     @classmethod
@@ -83,8 +81,7 @@ class JsonSerializer(DocumentSerializer):
         # try to load metadata including the document_type
         full_metadata_file_name = os.path.join(realpath, metadata_file_name)
         if os.path.exists(full_metadata_file_name):
-            with open(full_metadata_file_name) as f:
-                metadata = json.load(f)
+            metadata = read_json(full_metadata_file_name)
             document_type = resolve_optional_document_type(metadata.get("document_type"))
 
         if document_type is None:
@@ -93,18 +90,9 @@ class JsonSerializer(DocumentSerializer):
         if split is not None:
             realpath = os.path.join(realpath, split)
         full_file_name = os.path.join(realpath, file_name)
-        documents = []
         if as_json_lines(str(file_name)):
-            with open(full_file_name) as f:
-                for line in f:
-                    json_dict = json.loads(line)
-                    documents.append(document_type.fromdict(json_dict))
-        else:
-            with open(full_file_name) as f:
-                json_list = json.load(f)
-            for json_dict in json_list:
-                documents.append(document_type.fromdict(json_dict))
-        return documents
+            return read_json_lines(full_file_name, func=document_type.fromdict)
+        return [document_type.fromdict(json_dict) for json_dict in read_json(full_file_name)]
 
     def read_with_defaults(self, **kwargs) -> List[D]:
         all_kwargs = {**self.default_kwargs, **kwargs}
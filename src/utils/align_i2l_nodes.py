@@ -311,6 +311,12 @@ if __name__ == "__main__":
         "nodeset_dir are processed",
         default=None,
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=0,
+        help="number of worker processes to process all nodesets (0 means no multiprocessing)",
+    )
     args = vars(parser.parse_args())
     if args["similarity_measure"] == "cossim":
         # Options: # "all-distilroberta-v1", "all-mpnet-base-v2", "all-MiniLM-L6-v2"
@@ -330,7 +336,10 @@ if __name__ == "__main__":
     else:
         alignments = dict()
         for nodeset_id, nodeset_or_error in process_all_nodesets(
-            func=evaluate_align_nodes, nodeset_dir=args["nodeset_dir"], **kwargs
+            func=evaluate_align_nodes,
+            nodeset_dir=args["nodeset_dir"],
+            num_workers=args["num_workers"],
+            **kwargs,
         ):
             if isinstance(nodeset_or_error, Exception):
                 logger.error(f"nodeset={nodeset_id}: Failed to process: {nodeset_or_error}")
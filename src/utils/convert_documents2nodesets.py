@@ -3,12 +3,29 @@ import pyrootutils
 pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], pythonpath=True)
 
 import argparse
-import json
 import os
+from typing import Tuple
 
 from dataset_builders.pie.dialam2024.dialam2024 import convert_to_example, unmerge_relations
 from src.document.types import TextDocumentWithLabeledEntitiesAndNaryRelations
 from src.serializer import JsonSerializer
+from src.utils.json_utils import write_json
+from src.utils.nodeset_utils import Nodeset
+
+
+def convert_to_nodeset(
+    document: TextDocumentWithLabeledEntitiesAndNaryRelations,
+) -> Tuple[str, Nodeset]:
+    """Convert a document with predictions into a nodeset in the format required by the DialAM
+    Shared Task. Returns the nodeset ID and the nodeset."""
+
+    # convert to SimplifiedDialAM2024Document
+    unmerged_document = unmerge_relations(document)
+    # convert to shared task format
+    result = convert_to_example(unmerged_document, use_predictions=True)
+    # remove the doc id, it should not be part of the file content
+    result.pop("id")
+    return document.id, result
 
 
 def main(args):
@@ -20,17 +37,16 @@ def main(args):
 
     output_dir = args.output_dir
     for doc in docs:
-        # convert to SimplifiedDialAM2024Document
-        unmerged_document = unmerge_relations(doc)
-        # convert to shared task format
-        result = convert_to_example(unmerged_document, use_predictions=True)
-        # get and remove the doc id, it should not be part of the file content
-        doc_id = result.pop("id")
+        nodeset_id, result = convert_to_nodeset(doc)
         # create output directory if it doesn't exist
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-        with open(f"{output_dir}/{doc.id}.json", "w") as f:
-            json.dump(result, f, indent=2)
+        write_json(
+            f"{output_dir}/{nodeset_id}.json",
+            result,
+            indent=None if args.compact else 2,
+            compact=args.compact,
+        )
 
 
 if __name__ == "__main__":
@@ -43,5 +59,10 @@ if __name__ == "__main__":
         type=str,
         help="path to the directory with nodesets where each nodeset is stored in a separate JSON file (in the format required by the DialAM Shared Task)",
     )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help="write the nodesets without indentation (smaller and faster, but less readable)",
+    )
     args = parser.parse_args()
     main(args)
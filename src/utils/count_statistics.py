@@ -6,7 +6,6 @@ pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], python
 
 import argparse
 import io
-import json
 import logging
 import os
 from collections import Counter, defaultdict
@@ -14,6 +13,8 @@ from collections import Counter, defaultdict
 import pandas as pd
 from tqdm import tqdm
 
+from src.utils.json_utils import read_json
+
 logger = logging.getLogger(__name__)
 
 
@@ -77,8 +78,7 @@ def generate_transitions_per_input_table(dir_name):
     input_pairs = [(i, j) for i in input_node_types for j in input_node_types]
 
     for filename in tqdm(os.listdir(dir_name)):
-        with open(os.path.join(dir_name, filename)) as f:
-            data = json.load(f)
+        data = read_json(os.path.join(dir_name, filename))
         # Store the node mapping
         node_id2node = dict()
         for n in data["nodes"]:
@@ -142,8 +142,7 @@ def generate_transitions_per_input_table(dir_name):
 def generate_stats_table(dir_name):
     node2node_stats = dict()
     for filename in os.listdir(dir_name):
-        with open(os.path.join(dir_name, filename)) as f:
-            data = json.load(f)
+        data = read_json(os.path.join(dir_name, filename))
         # Store the node mapping
         node_id2node = dict()
         for n in data["nodes"]:
@@ -200,8 +199,7 @@ def generate_stats_table(dir_name):
 def get_relation_and_node_dicts(file_name: str) -> tuple[dict, dict, set]:
 
     # load the nodes and edges from the json file
-    with open(file_name) as f:
-        data = json.load(f)
+    data = read_json(file_name)
 
     # collect all incoming and outgoing edges for each node
     src2trg = defaultdict(set)
@@ -0,0 +1,222 @@
+"""Read and write JSON with the fastest available backend.
+
+The backend is orjson if it is installed, then ujson, and the json module of the standard library
+otherwise (see set_json_backend to select it explicitly). All backends produce the same Python
+objects when reading and valid JSON with the same content when writing, but the whitespace and the
+escaping of non-ASCII characters may differ: the fast backends write UTF-8 instead of \\uXXXX
+escapes. Input that a fast backend can not handle, e.g. NaN, lone surrogates or dict keys that are
+not strings, is passed on to the standard library, so it is read and written as before. Note that
+orjson reads integers beyond 64 bit as floats and writes NaN and Infinity as null.
+
+Use compact=True to write files without any whitespace that are only consumed by programs and
+indent=2 (the default of write_nodeset) for files that are also read by humans.
+
+Run this module as a script to compare the backends on a directory of JSON files:
+    python src/utils/json_utils.py --input_dir data/evaluation_data
+"""
+
+import argparse
+import glob
+import json
+import os
+import timeit
+from typing import Any, Callable, Dict, Iterable, List, Optional, Union
+
+JSON_BACKENDS = ("orjson", "ujson", "json")
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+
+def get_available_json_backends() -> List[str]:
+    """Get the names of the installed backends, the fastest first."""
+    modules = {"orjson": orjson, "ujson": ujson, "json": json}
+    return [name for name in JSON_BACKENDS if modules[name] is not None]
+
+
+_backend = get_available_json_backends()[0]
+
+
+def get_json_backend() -> str:
+    return _backend
+
+
+def set_json_backend(name: Optional[str] = None) -> None:
+    """Set the backend that is used by all functions in this module. If name is None, the fastest
+    available backend is used."""
+    global _backend
+    if name is None:
+        name = get_available_json_backends()[0]
+    if name not in JSON_BACKENDS:
+        raise ValueError(f"Unknown JSON backend: {name}. Use one of {JSON_BACKENDS}.")
+    if name not in get_available_json_backends():
+        raise ValueError(f"The JSON backend {name} is not installed.")
+    _backend = name
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Parse a JSON string (or UTF-8 encoded bytes)."""
+    if _backend == "orjson":
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # e.g. NaN or lone surrogates that are accepted by the standard library
+            pass
+    elif _backend == "ujson":
+        try:
+            return ujson.loads(data)
+        except ValueError:
+            pass
+    return json.loads(data)
+
+
+def _dumps_stdlib(obj: Any, indent: Optional[int], compact: bool, **kwargs) -> str:
+    if compact and indent is not None:
+        raise ValueError("compact can not be combined with indent.")
+    if compact:
+        kwargs["separators"] = (",", ":")
+    return json.dumps(obj, indent=indent, **kwargs)
+
+
+def dumps_bytes(obj: Any, indent: Optional[int] = None, compact: bool = False, **kwargs) -> bytes:
+    """Serialize an object to UTF-8 encoded JSON.
+
+    Args:
+        obj: The object to serialize.
+        indent: Pretty-print with this indentation. orjson supports only indent=2, for any other
+            indentation the standard library is used.
+        compact: Write without any whitespace. Can not be combined with indent.
+        **kwargs: Further arguments for json.dumps. The fast backends support only sort_keys, for
+            any other argument, e.g. default or ensure_ascii, the standard library is used.
+    """
+    if compact and indent is not None:
+        raise ValueError("compact can not be combined with indent.")
+    sort_keys = kwargs.get("sort_keys", False)
+    use_fast_backend = set(kwargs) <= {"sort_keys"}
+    if _backend == "orjson" and use_fast_backend and indent in (None, 2):
+        option = 0
+        if indent is not None:
+            option |= orjson.OPT_INDENT_2
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        try:
+            return orjson.dumps(obj, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. non-string dict keys or integers beyond 64 bit
+            pass
+    elif _backend == "ujson" and use_fast_backend:
+        try:
+            return ujson.dumps(
+                obj,
+                indent=indent or 0,
+                sort_keys=sort_keys,
+                ensure_ascii=False,
+                escape_forward_slashes=False,
+            ).encode("utf-8")
+        except (TypeError, ValueError, OverflowError):
+            pass
+    # JSON strings may contain lone surrogates
+    return _dumps_stdlib(obj, indent, compact, **kwargs).encode("utf-8", errors="surrogatepass")
+
+
+def dumps(obj: Any, indent: Optional[int] = None, compact: bool = False, **kwargs) -> str:
+    """Serialize an object to a JSON string. See dumps_bytes for the arguments."""
+    if _backend == "json":
+        # avoid encoding and decoding the result
+        return _dumps_stdlib(obj, indent, compact, **kwargs)
+    return dumps_bytes(obj, indent=indent, compact=compact, **kwargs).decode(
+        "utf-8", errors="surrogatepass"
+    )
+
+
+def read_json(path: str) -> Any:
+    """Read a JSON file."""
+    with open(path, "rb") as f:
+        return loads(f.read())
+
+
+def write_json(path: str, obj: Any, indent: Optional[int] = None, compact: bool = False) -> None:
+    """Write an object to a JSON file. See dumps_bytes for the arguments."""
+    data = dumps_bytes(obj, indent=indent, compact=compact)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def read_json_lines(path: str, func: Optional[Callable[[Any], Any]] = None) -> List[Any]:
+    """Read a JSON lines file, optionally applying func to each parsed line."""
+    result = []
+    with open(path, "rb") as f:
+        for line in f:
+            value = loads(line)
+            result.append(value if func is None else func(value))
+    return result
+
+
+def dumps_lines(objects: Iterable[Any], **kwargs) -> bytes:
+    """Serialize objects to JSON lines (each object on its own line, terminated by a newline).
+    See dumps_bytes for the arguments (indent is not supported)."""
+    return b"".join(dumps_bytes(obj, **kwargs) + b"\n" for obj in objects)
+
+
+def benchmark(file_names: List[str], repeat: int = 5) -> Dict[str, Dict[str, float]]:
+    """Measure the time per file to parse and serialize the JSON files with each available
+    backend (the minimum over the repetitions, in seconds)."""
+    contents = []
+    for file_name in file_names:
+        with open(file_name, "rb") as f:
+            contents.append(f.read())
+    objects = [json.loads(content) for content in contents]
+    tasks = {
+        "parse": lambda: [loads(content) for content in contents],
+        "serialize (indent=2)": lambda: [dumps_bytes(obj, indent=2) for obj in objects],
+        "serialize (compact)": lambda: [dumps_bytes(obj, compact=True) for obj in objects],
+    }
+    previous_backend = get_json_backend()
+    result: Dict[str, Dict[str, float]] = {}
+    try:
+        for backend in get_available_json_backends():
+            set_json_backend(backend)
+            result[backend] = {
+                task_name: min(timeit.repeat(task, number=1, repeat=repeat)) / len(file_names)
+                for task_name, task in tasks.items()
+            }
+    finally:
+        set_json_backend(previous_backend)
+    return result
+
+
+def main(input_dir: str, repeat: int = 5) -> None:
+    file_names = sorted(glob.glob(os.path.join(input_dir, "*.json")))
+    if len(file_names) == 0:
+        raise ValueError(f"No JSON files found in {input_dir}.")
+    result = benchmark(file_names, repeat=repeat)
+    print(f"time per file (in ms) for {len(file_names)} files from {input_dir}:")
+    print(f"{'backend':<8}" + "".join(f"{task_name:>24}" for task_name in result["json"]))
+    for backend, times in result.items():
+        row = ""
+        for task_name, time in times.items():
+            speedup = result["json"][task_name] / time
+            row += f"{time * 1000:>15.3f} ({speedup:.1f}x)"
+        print(f"{backend:<8}{row}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the JSON backends on a directory of JSON files (e.g. nodesets)."
+    )
+    parser.add_argument(
+        "--input_dir",
+        type=str,
+        default="data/evaluation_data",
+        help="The directory containing the JSON files.",
+    )
+    parser.add_argument("--repeat", type=int, default=5, help="Number of repetitions.")
+    args = vars(parser.parse_args())
+    main(**args)
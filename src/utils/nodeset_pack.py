@@ -0,0 +1,565 @@
+"""Pack a directory of nodeset JSON files into a single memory-mapped file.
+
+The pack stores the nodes and edges of all nodesets column-wise: the node IDs are interned per
+nodeset (the edges refer to the nodes by their int32 index), the node types are stored as an
+uint8 column of codes into a table of type names, and the node IDs and texts are stored in a
+UTF-8 string heap. All remaining values (e.g. timestamps, edge IDs and locutions) are stored as a
+small JSON string per nodeset, together with the key order of the nodes and edges, so that a
+nodeset is restored exactly as it was read from its JSON file. Nodesets that can not be stored
+column-wise (e.g. because an edge refers to an unknown node) are stored as JSON strings.
+
+A table with the offsets of each nodeset into the columns allows to decode a single nodeset
+without reading the rest of the file. read_nodeset, get_nodeset_ids_from_directory and
+process_all_nodesets (see nodeset_utils) accept the path to a pack instead of a directory.
+
+Usage:
+    python src/utils/nodeset_pack.py --input_dir data/train --output_path data/train.nodesetpack
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+from array import array
+from itertools import repeat
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+if __name__ == "__main__":
+    # only when running as a script, importers already have the project root in the path
+    import pyrootutils
+
+    pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], pythonpath=True)
+
+from src.utils.json_utils import dumps, loads
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"NSETPACK"
+VERSION = 1
+# the header starts with the magic bytes and the length of the JSON header (uint64)
+HEADER_PREFIX = struct.Struct("<8sQ")
+# all arrays start at multiples of 8 bytes
+ALIGNMENT = 8
+# the maximum number of node types and key layouts that fit into the respective columns
+MAX_NUM_TYPES = np.iinfo(np.uint8).max + 1
+MAX_NUM_LAYOUTS = np.iinfo(np.uint16).max + 1
+# the arrays with the data of a single nodeset, grouped by the array with their offsets
+NODESET_SLICES = (
+    ("nodeset_bytes", ("heap",)),
+    ("nodeset_strings", ("string_ends",)),
+    ("nodeset_nodes", ("node_types", "node_layouts")),
+    ("nodeset_edges", ("edges", "edge_layouts")),
+)
+# the keys of nodes and edges that are stored in the columns
+NODE_COLUMNS = ("nodeID", "type", "text")
+EDGE_COLUMNS = ("fromID", "toID")
+
+
+def is_nodeset_pack(path: str) -> bool:
+    """Check whether the path points to a nodeset pack (and not to a directory)."""
+    if not os.path.isfile(path):
+        return False
+    with open(path, "rb") as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def _align(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class NodesetPackWriter:
+    """Collect nodesets and write them to a nodeset pack.
+
+    Args:
+        path: The path of the pack file. The pack is written when leaving the context or when
+            calling write.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.nodeset_ids: List[str] = []
+        self._nodeset_id_set = set()
+        self.type_names: List[str] = []
+        self._type_name2code: Dict[str, int] = {}
+        self.node_layouts: List[Tuple[str, ...]] = []
+        self._node_layout2code: Dict[Tuple[str, ...], int] = {}
+        self.edge_layouts: List[Tuple[str, ...]] = []
+        self._edge_layout2code: Dict[Tuple[str, ...], int] = {}
+        self.num_raw = 0
+        # the columns
+        self._nodeset_nodes = array("q", [0])
+        self._nodeset_edges = array("q", [0])
+        self._nodeset_strings = array("q", [0])
+        self._nodeset_bytes = array("q", [0])
+        self._nodeset_raw = array("B")
+        self._node_types = array("B")
+        self._node_layouts = array("H")
+        self._edges = array("i")
+        self._edge_layouts = array("H")
+        self._string_ends = array("q")
+        self._heap: List[bytes] = []
+
+    def __enter__(self) -> "NodesetPackWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.write()
+
+    def _get_code(self, value: Any, value2code: Dict[Any, int], values: List[Any], limit: int):
+        if value not in value2code:
+            if len(values) >= limit:
+                return None
+            value2code[value] = len(values)
+            values.append(value)
+        return value2code[value]
+
+    def _encode_columns(self, nodeset: Any) -> Optional[Tuple[List[str], list, list, list, list]]:
+        """Get the strings, the node types and layouts, the edges and the edge layouts of the
+        nodeset, or None if it can not be stored column-wise."""
+        if not (
+            isinstance(nodeset, dict)
+            and isinstance(nodeset.get("nodes"), list)
+            and isinstance(nodeset.get("edges"), list)
+        ):
+            return None
+        node_id2index: Dict[str, int] = {}
+        node_strings = []
+        node_types = []
+        node_layouts = []
+        node_extras = []
+        for node in nodeset["nodes"]:
+            if not isinstance(node, dict):
+                return None
+            node_id = node.get("nodeID")
+            node_type = node.get("type", "")
+            text = node.get("text", "")
+            if not (
+                isinstance(node_id, str) and isinstance(node_type, str) and isinstance(text, str)
+            ):
+                return None
+            if node_id in node_id2index:
+                return None
+            node_id2index[node_id] = len(node_id2index)
+            type_code = self._get_code(
+                node_type, self._type_name2code, self.type_names, MAX_NUM_TYPES
+            )
+            layout_code = self._get_code(
+                tuple(node), self._node_layout2code, self.node_layouts, MAX_NUM_LAYOUTS
+            )
+            if type_code is None or layout_code is None:
+                return None
+            node_strings.extend((node_id, text))
+            node_types.append(type_code)
+            node_layouts.append(layout_code)
+            node_extras.append([value for key, value in node.items() if key not in NODE_COLUMNS])
+
+        edges = []
+        edge_layouts = []
+        edge_extras = []
+        for edge in nodeset["edges"]:
+            if not isinstance(edge, dict):
+                return None
+            try:
+                edges.extend((node_id2index[edge["fromID"]], node_id2index[edge["toID"]]))
+            except (KeyError, TypeError):
+                return None
+            layout_code = self._get_code(
+                tuple(edge), self._edge_layout2code, self.edge_layouts, MAX_NUM_LAYOUTS
+            )
+            if layout_code is None:
+                return None
+            edge_layouts.append(layout_code)
+            edge_extras.append([value for key, value in edge.items() if key not in EDGE_COLUMNS])
+
+        extra = {
+            "keys": list(nodeset),
+            "other": {
+                key: value for key, value in nodeset.items() if key not in ("nodes", "edges")
+            },
+            "nodes": node_extras,
+            "edges": edge_extras,
+        }
+        return (
+            [dumps(extra, compact=True)] + node_strings,
+            node_types,
+            node_layouts,
+            edges,
+            edge_layouts,
+        )
+
+    def add(self, nodeset_id: str, nodeset: Any) -> None:
+        """Add a (JSON serializable) nodeset to the pack."""
+        if nodeset_id in self._nodeset_id_set:
+            raise ValueError(f"nodeset={nodeset_id}: The nodeset is already in the pack.")
+        columns = self._encode_columns(nodeset)
+        if columns is None:
+            strings = [dumps(nodeset, compact=True)]
+            node_types, node_layouts, edges, edge_layouts = [], [], [], []
+            self.num_raw += 1
+        else:
+            strings, node_types, node_layouts, edges, edge_layouts = columns
+
+        string_end = 0
+        for string in strings:
+            string_end += len(string)
+            self._string_ends.append(string_end)
+        # JSON strings may contain lone surrogates
+        chunk = "".join(strings).encode("utf-8", errors="surrogatepass")
+        self._heap.append(chunk)
+        self._node_types.extend(node_types)
+        self._node_layouts.extend(node_layouts)
+        self._edges.extend(edges)
+        self._edge_layouts.extend(edge_layouts)
+        self._nodeset_nodes.append(len(self._node_types))
+        self._nodeset_edges.append(len(self._edge_layouts))
+        self._nodeset_strings.append(len(self._string_ends))
+        self._nodeset_bytes.append(self._nodeset_bytes[-1] + len(chunk))
+        self._nodeset_raw.append(columns is None)
+        self.nodeset_ids.append(nodeset_id)
+        self._nodeset_id_set.add(nodeset_id)
+
+    def write(self) -> None:
+        """Write the pack file."""
+        arrays = {
+            "nodeset_nodes": np.frombuffer(self._nodeset_nodes, dtype=np.int64),
+            "nodeset_edges": np.frombuffer(self._nodeset_edges, dtype=np.int64),
+            "nodeset_strings": np.frombuffer(self._nodeset_strings, dtype=np.int64),
+            "nodeset_bytes": np.frombuffer(self._nodeset_bytes, dtype=np.int64),
+            "nodeset_raw": np.frombuffer(self._nodeset_raw, dtype=np.uint8),
+            "node_types": np.frombuffer(self._node_types, dtype=np.uint8),
+            "node_layouts": np.frombuffer(self._node_layouts, dtype=np.uint16),
+            "edges": np.frombuffer(self._edges, dtype=np.int32).reshape(-1, 2),
+            "edge_layouts": np.frombuffer(self._edge_layouts, dtype=np.uint16),
+            "string_ends": np.frombuffer(self._string_ends, dtype=np.int64),
+        }
+        array_specs = {}
+        offset = 0
+        for name, values in arrays.items():
+            array_specs[name] = {
+                "dtype": values.dtype.str,
+                "offset": offset,
+                "shape": list(values.shape),
+            }
+            offset = _align(offset + values.nbytes)
+        array_specs["heap"] = {"dtype": "|u1", "offset": offset, "shape": [self._heap_size]}
+        header = json.dumps(
+            {
+                "version": VERSION,
+                "nodeset_ids": self.nodeset_ids,
+                "type_names": self.type_names,
+                "node_layouts": self.node_layouts,
+                "edge_layouts": self.edge_layouts,
+                "arrays": array_specs,
+            }
+        ).encode("utf-8")
+        data_start = _align(HEADER_PREFIX.size + len(header))
+        with open(self.path, "wb") as f:
+            f.write(HEADER_PREFIX.pack(MAGIC, len(header)))
+            f.write(header)
+            for name, values in arrays.items():
+                f.write(b"\0" * (data_start + array_specs[name]["offset"] - f.tell()))
+                f.write(values.tobytes())
+            f.write(b"\0" * (data_start + array_specs["heap"]["offset"] - f.tell()))
+            for chunk in self._heap:
+                f.write(chunk)
+
+    @property
+    def _heap_size(self) -> int:
+        return self._nodeset_bytes[-1]
+
+
+def _get_layout_positions(keys: Tuple[str, ...], columns: Tuple[str, ...]) -> List[int]:
+    """Get the position of the value of each key in the column values followed by the other
+    values of a node or edge (see NodesetPackWriter._encode_columns)."""
+    positions = []
+    num_other = 0
+    for key in keys:
+        if key in columns:
+            positions.append(columns.index(key))
+        else:
+            positions.append(len(columns) + num_other)
+            num_other += 1
+    return positions
+
+
+def _build_records(
+    layouts: List[Tuple[str, ...]],
+    layout_positions: List[List[int]],
+    layout_codes: np.ndarray,
+    columns: List[List[Any]],
+    other_values: List[List[Any]],
+) -> List[Dict[str, Any]]:
+    """Build the nodes or edges from the column values and the other values.
+
+    The records are built column-wise per layout, i.e. for all records with the same keys at
+    once, and then put back into their original order.
+    """
+    records: List[Dict[str, Any]] = []
+    indices: List[int] = []
+    unique_layout_codes = np.unique(layout_codes).tolist()
+    for layout_code in unique_layout_codes:
+        if len(unique_layout_codes) == 1:
+            # all records have the same keys (this is the usual case)
+            layout_indices = None
+            layout_columns = columns
+            layout_other_values = other_values
+        else:
+            layout_indices = np.flatnonzero(layout_codes == layout_code).tolist()
+            layout_columns = [list(map(column.__getitem__, layout_indices)) for column in columns]
+            layout_other_values = list(map(other_values.__getitem__, layout_indices))
+        value_columns = layout_columns + [list(values) for values in zip(*layout_other_values)]
+        rows = zip(*(value_columns[position] for position in layout_positions[layout_code]))
+        layout_records = list(map(dict, map(zip, repeat(layouts[layout_code]), rows)))
+        if layout_indices is None:
+            return layout_records
+        records.extend(layout_records)
+        indices.extend(layout_indices)
+    # restore the original order
+    return list(map(records.__getitem__, np.argsort(indices, kind="stable").tolist()))
+
+
+class NodesetPack:
+    """Read nodesets from a nodeset pack. The file is memory-mapped and each nodeset is only
+    decoded when it is accessed.
+
+    Args:
+        path: The path of the pack file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            magic, header_length = HEADER_PREFIX.unpack(f.read(HEADER_PREFIX.size))
+            if magic != MAGIC:
+                raise ValueError(f"The file {path} is not a nodeset pack.")
+            header = json.loads(f.read(header_length))
+            if header["version"] != VERSION:
+                raise ValueError(
+                    f"The nodeset pack {path} has version {header['version']}, but only "
+                    f"version {VERSION} is supported."
+                )
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.nodeset_ids: List[str] = header["nodeset_ids"]
+        self.nodeset_id2index = {
+            nodeset_id: idx for idx, nodeset_id in enumerate(self.nodeset_ids)
+        }
+        self.type_names: List[str] = header["type_names"]
+        self._type_names = np.array(self.type_names + [None], dtype=object)
+        self.node_layouts = [tuple(layout) for layout in header["node_layouts"]]
+        self.edge_layouts = [tuple(layout) for layout in header["edge_layouts"]]
+        self._node_positions = [
+            _get_layout_positions(keys, NODE_COLUMNS) for keys in self.node_layouts
+        ]
+        self._edge_positions = [
+            _get_layout_positions(keys, EDGE_COLUMNS) for keys in self.edge_layouts
+        ]
+        self._tables_hash = hashlib.sha256(
+            json.dumps([self.type_names, header["node_layouts"], header["edge_layouts"]]).encode()
+        ).digest()
+        data_start = _align(HEADER_PREFIX.size + header_length)
+        self._arrays: Dict[str, np.ndarray] = {}
+        for name, spec in header["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            shape = tuple(spec["shape"])
+            self._arrays[name] = np.frombuffer(
+                self._mmap,
+                dtype=dtype,
+                count=int(np.prod(shape)),
+                offset=data_start + spec["offset"],
+            ).reshape(shape)
+
+    def __enter__(self) -> "NodesetPack":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def close(self) -> None:
+        # the arrays are views into the memory map, so they need to be released first
+        self._arrays = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            # some views are still in use (e.g. in a traceback), the memory map is closed when
+            # they are garbage collected
+            pass
+
+    def __len__(self) -> int:
+        return len(self.nodeset_ids)
+
+    def __contains__(self, nodeset_id: str) -> bool:
+        return nodeset_id in self.nodeset_id2index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.nodeset_ids)
+
+    def _get_range(self, name: str, idx: int) -> Tuple[int, int]:
+        start, end = self._arrays[name][idx : idx + 2].tolist()
+        return start, end
+
+    def get_strings(self, idx: int) -> List[str]:
+        """Get the strings of the nodeset with the given index (see NodesetPackWriter.add)."""
+        byte_start, byte_end = self._get_range("nodeset_bytes", idx)
+        chunk = (
+            self._arrays["heap"][byte_start:byte_end]
+            .tobytes()
+            .decode("utf-8", errors="surrogatepass")
+        )
+        string_start, string_end = self._get_range("nodeset_strings", idx)
+        ends = self._arrays["string_ends"][string_start:string_end].tolist()
+        return [chunk[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+    def _get_index(self, nodeset_id: str) -> int:
+        try:
+            return self.nodeset_id2index[nodeset_id]
+        except KeyError:
+            raise KeyError(f"nodeset={nodeset_id}: The nodeset is not in the pack {self.path}.")
+
+    def get_nodeset_hash(self, nodeset_id: str) -> str:
+        """Get the SHA-256 hash of the stored data of a nodeset, without decoding it. The hash
+        also covers the type and layout tables of the pack that are needed to decode the nodeset,
+        so it changes if the nodeset (or these tables) change, e.g. for result caching."""
+        idx = self._get_index(nodeset_id)
+        nodeset_hash = hashlib.sha256(self._tables_hash)
+        nodeset_hash.update(self._arrays["nodeset_raw"][idx : idx + 1].tobytes())
+        for range_name, array_names in NODESET_SLICES:
+            start, end = self._get_range(range_name, idx)
+            for name in array_names:
+                data = self._arrays[name][start:end].tobytes()
+                # the length makes the concatenation unambiguous
+                nodeset_hash.update(len(data).to_bytes(8, "little"))
+                nodeset_hash.update(data)
+        return nodeset_hash.hexdigest()
+
+    def __getitem__(self, nodeset_id: str) -> Dict[str, Any]:
+        idx = self._get_index(nodeset_id)
+        strings = self.get_strings(idx)
+        if self._arrays["nodeset_raw"][idx]:
+            return loads(strings[0])
+
+        extra = loads(strings[0])
+        node_ids = strings[1::2]
+        node_start, node_end = self._get_range("nodeset_nodes", idx)
+        node_types = self._type_names[self._arrays["node_types"][node_start:node_end]].tolist()
+        nodes = _build_records(
+            layouts=self.node_layouts,
+            layout_positions=self._node_positions,
+            layout_codes=self._arrays["node_layouts"][node_start:node_end],
+            # in the order of NODE_COLUMNS
+            columns=[node_ids, node_types, strings[2::2]],
+            other_values=extra["nodes"],
+        )
+
+        edge_start, edge_end = self._get_range("nodeset_edges", idx)
+        edge_nodes = self._arrays["edges"][edge_start:edge_end]
+        edges = _build_records(
+            layouts=self.edge_layouts,
+            layout_positions=self._edge_positions,
+            layout_codes=self._arrays["edge_layouts"][edge_start:edge_end],
+            # in the order of EDGE_COLUMNS
+            columns=[
+                list(map(node_ids.__getitem__, edge_nodes[:, 0].tolist())),
+                list(map(node_ids.__getitem__, edge_nodes[:, 1].tolist())),
+            ],
+            other_values=extra["edges"],
+        )
+
+        result = {}
+        for key in extra["keys"]:
+            if key == "nodes":
+                result[key] = nodes
+            elif key == "edges":
+                result[key] = edges
+            else:
+                result[key] = extra["other"][key]
+        return result
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        for nodeset_id in self.nodeset_ids:
+            yield nodeset_id, self[nodeset_id]
+
+
+# the opened packs of this process (see open_nodeset_pack)
+_open_packs: Dict[str, Tuple[Tuple[int, int], NodesetPack]] = {}
+
+
+def open_nodeset_pack(path: str) -> NodesetPack:
+    """Open a nodeset pack. The pack is kept open and returned again for the same path, unless
+    the file was modified in the meantime."""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    if path in _open_packs:
+        pack_version, pack = _open_packs[path]
+        if pack_version == version:
+            return pack
+    pack = NodesetPack(path)
+    _open_packs[path] = (version, pack)
+    return pack
+
+
+def write_nodeset_pack(path: str, nodesets: Iterable[Tuple[str, Any]]) -> NodesetPackWriter:
+    """Write (nodeset ID, nodeset) pairs to a nodeset pack.
+
+    Returns:
+        The writer with the statistics of the pack, e.g. the number of nodesets that are stored
+        as JSON strings (num_raw).
+    """
+    with NodesetPackWriter(path) as writer:
+        for nodeset_id, nodeset in nodesets:
+            writer.add(nodeset_id, nodeset)
+    return writer
+
+
+def main(input_dir: str, output_path: str, show_progress: bool = True, **kwargs) -> None:
+    # import here to avoid a circular import (nodeset_utils reads nodesets from packs)
+    from src.utils.nodeset_utils import get_nodeset_ids_from_directory, process_all_nodesets
+
+    def get_nodesets() -> Iterator[Tuple[str, Any]]:
+        for nodeset_id, nodeset_or_error in process_all_nodesets(
+            nodeset_dir=input_dir,
+            func=lambda nodeset, nodeset_id: nodeset,
+            show_progress=show_progress,
+            nodeset_whitelist=sorted(get_nodeset_ids_from_directory(input_dir)),
+            **kwargs,
+        ):
+            if isinstance(nodeset_or_error, Exception):
+                logger.error(f"nodeset={nodeset_id}: Failed to read: {nodeset_or_error}")
+            else:
+                yield nodeset_id, nodeset_or_error
+
+    writer = write_nodeset_pack(output_path, get_nodesets())
+    logger.info(
+        f"Packed {len(writer.nodeset_ids)} nodesets ({writer.num_raw} stored as JSON) "
+        f"into {output_path} ({os.path.getsize(output_path)} bytes)."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Pack a directory of nodesets into a single memory-mapped file."
+    )
+    parser.add_argument(
+        "--input_dir", type=str, required=True, help="The directory containing the nodesets."
+    )
+    parser.add_argument("--output_path", type=str, required=True, help="The path of the pack.")
+    parser.add_argument(
+        "--nodeset_blacklist",
+        type=str,
+        nargs="+",
+        default=None,
+        help="List of nodeset IDs to exclude from the pack.",
+    )
+    parser.add_argument(
+        "--silent", action="store_false", dest="show_progress", help="Disable progress bar."
+    )
+
+    args = vars(parser.parse_args())
+    logging.basicConfig(level=logging.INFO)
+    main(**args)
@@ -1,8 +1,11 @@
 import argparse
+import contextlib
 import copy
 import json
 import logging
+import multiprocessing
 import os
+import pickle
 from collections import Counter, defaultdict
 from typing import (
     Any,
@@ -13,6 +16,7 @@ from typing import (
     Iterator,
     List,
     Mapping,
+    NamedTuple,
     Optional,
     Set,
     Tuple,
@@ -23,6 +27,15 @@ from typing import (
 
 import tqdm
 
+if __name__ == "__main__":
+    # only when running as a script, importers already have the project root in the path
+    import pyrootutils
+
+    pyrootutils.setup_root(search_from=__file__, indicator=[".project-root"], pythonpath=True)
+
+from src.utils.json_utils import read_json, write_json
+from src.utils.nodeset_pack import NodesetPack, is_nodeset_pack, open_nodeset_pack
+
 FuncResult = TypeVar("FuncResult")
 # add "scheme" and "schemeID"? both seem to be optional. add "timestamp"?
 Node = TypedDict("Node", {"nodeID": str, "type": str, "text": str, "timestamp": str}, total=False)
@@ -50,47 +63,118 @@ def get_node_id_from_filename(filename: str) -> str:
         return fn_no_ext
 
 
+def get_nodeset_pack(nodeset_dir: str) -> Optional[NodesetPack]:
+    """Get the opened nodeset pack if nodeset_dir is the path to a pack (see nodeset_pack) and
+    not a directory, otherwise None."""
+
+    if not is_nodeset_pack(nodeset_dir):
+        return None
+    return open_nodeset_pack(nodeset_dir)
+
+
 def get_nodeset_ids_from_directory(nodeset_dir: str) -> List[str]:
-    """Get the IDs of all nodesets in a directory."""
+    """Get the IDs of all nodesets in a directory (or in a nodeset pack, see nodeset_pack)."""
 
+    pack = get_nodeset_pack(nodeset_dir)
+    if pack is not None:
+        return list(pack.nodeset_ids)
     return [get_node_id_from_filename(f) for f in os.listdir(nodeset_dir) if f.endswith(".json")]
 
 
-def read_nodeset(nodeset_dir: str, nodeset_id: str) -> Nodeset:
-    """Read a nodeset with a given ID from a directory."""
+def get_nodeset_filename(nodeset_dir: str, nodeset_id: str) -> str:
+    """Get the path to the file of a nodeset with a given ID in a directory."""
 
     filename = os.path.join(nodeset_dir, f"nodeset{nodeset_id}.json")
     if not os.path.exists(filename):
         filename = os.path.join(nodeset_dir, f"{nodeset_id}.json")
+    return filename
+
+
+def nodeset_exists(nodeset_dir: str, nodeset_id: str) -> bool:
+    """Check whether a nodeset with a given ID is in a directory (or in a nodeset pack)."""
 
-    with open(filename) as f:
-        return json.load(f)
+    pack = get_nodeset_pack(nodeset_dir)
+    if pack is not None:
+        return nodeset_id in pack
+    return os.path.exists(get_nodeset_filename(nodeset_dir, nodeset_id))
+
+
+def read_nodeset(nodeset_dir: str, nodeset_id: str) -> Nodeset:
+    """Read a nodeset with a given ID from a directory (or from a nodeset pack, see
+    nodeset_pack)."""
 
+    pack = get_nodeset_pack(nodeset_dir)
+    if pack is not None:
+        return pack[nodeset_id]
+    return read_json(get_nodeset_filename(nodeset_dir, nodeset_id))
 
-def write_nodeset(nodeset_dir: str, nodeset_id: str, data: Nodeset) -> None:
-    """Write a nodeset with a given ID to a directory."""
+
+def write_nodeset(nodeset_dir: str, nodeset_id: str, data: Nodeset, compact: bool = False) -> None:
+    """Write a nodeset with a given ID to a directory. The file is indented, unless compact is
+    True (see json_utils)."""
 
     filename = os.path.join(nodeset_dir, f"nodeset{nodeset_id}.json")
-    with open(filename, "w") as f:
-        json.dump(data, f, indent=2)
+    write_json(filename, data, indent=None if compact else 2, compact=compact)
+
+
+def _process_nodeset(
+    nodeset_dir: str, nodeset_id: str, func: Callable[..., FuncResult], kwargs: Dict[str, Any]
+) -> Tuple[str, Union[FuncResult, Exception]]:
+    """Read a nodeset and apply the function to it. If an exception occurs, it is returned
+    instead of the result."""
+    try:
+        nodeset = read_nodeset(nodeset_dir=nodeset_dir, nodeset_id=nodeset_id)
+        return nodeset_id, func(nodeset=nodeset, nodeset_id=nodeset_id, **kwargs)
+    except Exception as e:
+        return nodeset_id, e
+
+
+# the arguments of _process_nodeset that are the same for all nodesets, set once per worker
+# process (see process_all_nodesets) to not send them with each nodeset ID
+_worker_kwargs: Dict[str, Any] = {}
+
+
+def _init_worker(nodeset_dir: str, func: Callable[..., FuncResult], kwargs: Dict[str, Any]):
+    _worker_kwargs.update(nodeset_dir=nodeset_dir, func=func, kwargs=kwargs)
+
+
+def _process_nodeset_in_worker(nodeset_id: str) -> Tuple[str, Union[FuncResult, Exception]]:
+    nodeset_id, result = _process_nodeset(nodeset_id=nodeset_id, **_worker_kwargs)
+    if isinstance(result, Exception):
+        # the exception is sent back to the main process, so it needs to be picklable
+        try:
+            pickle.dumps(result)
+        except Exception:
+            result = RuntimeError(repr(result))
+    return nodeset_id, result
 
 
 def process_all_nodesets(
     nodeset_dir: str,
     func: Callable[..., FuncResult],
     show_progress: bool = True,
-    nodeset_blacklist: Optional[List[str]] = None,
-    nodeset_whitelist: Optional[List[str]] = None,
+    nodeset_blacklist: Optional[Collection[str]] = None,
+    nodeset_whitelist: Optional[Collection[str]] = None,
+    num_workers: int = 0,
+    chunksize: int = 1,
+    ordered: bool = True,
     **kwargs,
 ) -> Iterator[Tuple[str, Union[FuncResult, Exception]]]:
     """Process all nodesets in a directory.
 
     Args:
-        nodeset_dir: The directory containing the nodesets.
+        nodeset_dir: The directory containing the nodesets or the path to a nodeset pack (see
+            nodeset_pack).
         func: The function to apply to each nodeset.
         show_progress: Whether to show a progress bar.
         nodeset_blacklist: Whether to ignore some nodeset IDs.
-        nodeset_whitelist: Whether to only process some nodeset IDs.
+        nodeset_whitelist: Whether to only process some nodeset IDs (in the given order, unless
+            it is a set).
+        num_workers: The number of worker processes. If 0, the nodesets are processed in the
+            main process. Otherwise, func and kwargs need to be picklable.
+        chunksize: The number of nodesets that are sent to a worker process at once.
+        ordered: Whether to yield the results in the order of the nodeset IDs. If False, the
+            results are yielded as soon as they are available. Has no effect if num_workers is 0.
         **kwargs: Additional keyword arguments to pass to the function.
 
     Yields:
@@ -99,26 +183,48 @@ def process_all_nodesets(
     """
 
     if nodeset_whitelist is not None:
-        nodeset_ids = nodeset_whitelist
+        # remove duplicates, but keep the order
+        nodeset_ids = list(dict.fromkeys(nodeset_whitelist))
     else:
         nodeset_ids = get_nodeset_ids_from_directory(nodeset_dir=nodeset_dir)
+    n_blacklisted = 0
+    if nodeset_blacklist:
+        # the blacklist may be large, e.g. all nodesets with cached results
+        nodeset_blacklist = set(nodeset_blacklist)
+        nodeset_ids_filtered = [
+            nodeset_id for nodeset_id in nodeset_ids if nodeset_id not in nodeset_blacklist
+        ]
+        n_blacklisted = len(nodeset_ids) - len(nodeset_ids_filtered)
+        nodeset_ids = nodeset_ids_filtered
     failed_nodesets = []
     n_success = 0
-    n_blacklisted = 0
-    for nodeset_id in tqdm.tqdm(
-        nodeset_ids, desc="Processing nodesets", disable=not show_progress
-    ):
-        if nodeset_blacklist and nodeset_id in nodeset_blacklist:
-            n_blacklisted += 1
-            continue
-        try:
-            nodeset = read_nodeset(nodeset_dir=nodeset_dir, nodeset_id=nodeset_id)
-            result = func(nodeset=nodeset, nodeset_id=nodeset_id, **kwargs)
+    with contextlib.ExitStack() as stack:
+        results: Iterable[Tuple[str, Union[FuncResult, Exception]]]
+        if num_workers > 0:
+            pool = stack.enter_context(
+                multiprocessing.Pool(
+                    processes=num_workers,
+                    initializer=_init_worker,
+                    initargs=(nodeset_dir, func, kwargs),
+                )
+            )
+            imap = pool.imap if ordered else pool.imap_unordered
+            results = imap(_process_nodeset_in_worker, nodeset_ids, chunksize=chunksize)
+        else:
+            results = (
+                _process_nodeset(
+                    nodeset_dir=nodeset_dir, nodeset_id=nodeset_id, func=func, kwargs=kwargs
+                )
+                for nodeset_id in nodeset_ids
+            )
+        for nodeset_id, result in tqdm.tqdm(
+            results, total=len(nodeset_ids), desc="Processing nodesets", disable=not show_progress
+        ):
+            if isinstance(result, Exception):
+                failed_nodesets.append((nodeset_id, result))
+            else:
+                n_success += 1
             yield nodeset_id, result
-            n_success += 1
-        except Exception as e:
-            failed_nodesets.append((nodeset_id, e))
-            yield nodeset_id, e
 
     logger.info(
         f"Successfully processed {n_success} nodesets ({n_blacklisted} blacklisted). "
@@ -144,6 +250,180 @@ def get_node_ids_by_type(nodeset: Nodeset, node_types: Collection[str]) -> List[
     return [node["nodeID"] for node in nodeset["nodes"] if node["type"] in node_types]
 
 
+# The relation node type, the allowed source and target node types, and the maximum number of
+# source and target nodes (None means no limit, see get_relations) for each basic relation type.
+RelationTypeSpec = NamedTuple(
+    "RelationTypeSpec",
+    [
+        ("node_type", str),
+        ("source_types", Tuple[str, ...]),
+        ("target_types", Tuple[str, ...]),
+        ("max_sources", Optional[int]),
+        ("max_targets", Optional[int]),
+    ],
+)
+RELATION_TYPE_SPECS: Dict[str, RelationTypeSpec] = {
+    # no limit on the sources, see e.g. nodeset 21455 TA-node 718440
+    "TA": RelationTypeSpec("TA", ("L",), ("L",), None, None),
+    # Note: the targets are not constrained because for reverted RA-relations the source and
+    #  target are swapped and, thus, we also need to allow multiple targets
+    "RA": RelationTypeSpec("RA", ("I",), ("I",), None, None),
+    "CA": RelationTypeSpec("CA", ("I",), ("I",), 1, 1),
+    "MA": RelationTypeSpec("MA", ("I",), ("I",), 1, 1),
+    "YA-L2I": RelationTypeSpec("YA", ("L",), ("I",), 1, 1),
+    "YA-TA2S": RelationTypeSpec("YA", ("TA",), ("RA", "CA", "MA"), 1, 1),
+    # Note: this is a kind of rare case where the source is a TA-node and the target is an I-node
+    "YA-TA2I": RelationTypeSpec("YA", ("TA",), ("I",), 1, 1),
+    # Note: YA-relations L -> YA -> L encode (in-)direct speech
+    "YA-L2L": RelationTypeSpec("YA", ("L",), ("L",), 1, 1),
+}
+# relation types that are composed of other relation types
+COMPOSITE_RELATION_TYPES: Dict[str, List[str]] = {
+    "S": ["RA", "CA", "MA"],
+    "YA": ["YA-L2I", "YA-TA2S", "YA-TA2I", "YA-L2L"],
+}
+
+
+class NodesetIndex:
+    """Lookup tables for a nodeset: the nodes by ID, the adjacency lists of the edges and the node
+    IDs by type.
+
+    The index is a snapshot of the nodeset, i.e. it needs to be re-created when the nodeset is
+    modified. It can be passed to get_relations, get_two_hop_connections and
+    sort_nodes_by_hierarchy to not re-create these tables with every call.
+
+    Args:
+        nodeset: A nodeset.
+    """
+
+    def __init__(self, nodeset: Nodeset):
+        self.nodeset = nodeset
+        self.node_id2node = get_id2node(nodeset)
+        self.src2targets: Dict[str, List[str]] = defaultdict(list)
+        self.trg2sources: Dict[str, List[str]] = defaultdict(list)
+        for edge in nodeset["edges"]:
+            src_id = edge["fromID"]
+            trg_id = edge["toID"]
+            self.src2targets[src_id].append(trg_id)
+            self.trg2sources[trg_id].append(src_id)
+        # do not add entries when accessing unknown node IDs
+        self.src2targets.default_factory = None
+        self.trg2sources.default_factory = None
+        self.type2node_ids: Dict[str, List[str]] = defaultdict(list)
+        for node_id, node in self.node_id2node.items():
+            self.type2node_ids[node["type"]].append(node_id)
+        self.type2node_ids.default_factory = None
+
+    def successors(self, node_id: str) -> List[str]:
+        """Get the targets of all edges from the node (with duplicates, in edge order)."""
+        return self.src2targets.get(node_id, [])
+
+    def predecessors(self, node_id: str) -> List[str]:
+        """Get the sources of all edges to the node (with duplicates, in edge order)."""
+        return self.trg2sources.get(node_id, [])
+
+    def get_node_ids(self, node_types: Collection[str]) -> List[str]:
+        """Get the IDs of nodes with a given type (in the order of the nodes, see
+        get_node_ids)."""
+        if len(node_types) == 1:
+            return list(self.type2node_ids.get(next(iter(node_types)), []))
+        return [
+            node_id for node_id, node in self.node_id2node.items() if node["type"] in node_types
+        ]
+
+    def get_node_type(self, node_id: str) -> str:
+        return self.node_id2node[node_id]["type"]
+
+    def get_all_relations(
+        self, relation_types: Optional[Iterable[str]] = None, enforce_cardinality: bool = False
+    ) -> Dict[str, List[Relation]]:
+        """Get the relations of several types in a single sweep over the relation nodes, see
+        get_relations.
+
+        Args:
+            relation_types: The relation types, including composite ones like "S" and "YA". If
+                None, all basic and composite relation types are collected.
+            enforce_cardinality: Whether to enforce the cardinality constraints of the relation
+                types.
+
+        Returns:
+            A dictionary mapping each relation type to its relations.
+        """
+        if relation_types is None:
+            relation_types = list(RELATION_TYPE_SPECS) + list(COMPOSITE_RELATION_TYPES)
+        else:
+            relation_types = list(relation_types)
+        basic_relation_types = []
+        for relation_type in relation_types:
+            for basic_relation_type in COMPOSITE_RELATION_TYPES.get(
+                relation_type, [relation_type]
+            ):
+                if basic_relation_type not in RELATION_TYPE_SPECS:
+                    raise ValueError(f"Unknown relation type: {relation_type}")
+                if basic_relation_type not in basic_relation_types:
+                    basic_relation_types.append(basic_relation_type)
+
+        node_type2relation_types: Dict[str, List[str]] = defaultdict(list)
+        for relation_type in basic_relation_types:
+            node_type2relation_types[RELATION_TYPE_SPECS[relation_type].node_type].append(
+                relation_type
+            )
+
+        relations: Dict[str, List[Relation]] = {
+            relation_type: [] for relation_type in basic_relation_types
+        }
+        for node_type, current_relation_types in node_type2relation_types.items():
+            for relation_node_id in self.type2node_ids.get(node_type, []):
+                # the types of the neighbors are the same for all relation types of the node
+                sources = self.predecessors(relation_node_id)
+                targets = self.successors(relation_node_id)
+                source_types = [self.get_node_type(src_id) for src_id in sources]
+                target_types = [self.get_node_type(trg_id) for trg_id in targets]
+                for relation_type in current_relation_types:
+                    spec = RELATION_TYPE_SPECS[relation_type]
+                    relation_sources = [
+                        src_id
+                        for src_id, src_type in zip(sources, source_types)
+                        if src_type in spec.source_types
+                    ]
+                    relation_targets = [
+                        trg_id
+                        for trg_id, trg_type in zip(targets, target_types)
+                        if trg_type in spec.target_types
+                    ]
+                    if enforce_cardinality:
+                        if (
+                            spec.max_sources is not None
+                            and len(relation_sources) > spec.max_sources
+                        ):
+                            continue
+                        if (
+                            spec.max_targets is not None
+                            and len(relation_targets) > spec.max_targets
+                        ):
+                            continue
+                    # check whether we have non-empty sources and targets
+                    if len(relation_sources) > 0 and len(relation_targets) > 0:
+                        relations[relation_type].append(
+                            {
+                                "sources": relation_sources,
+                                "targets": relation_targets,
+                                "relation": relation_node_id,
+                            }
+                        )
+
+        result: Dict[str, List[Relation]] = {}
+        for relation_type in relation_types:
+            result[relation_type] = [
+                relation
+                for basic_relation_type in COMPOSITE_RELATION_TYPES.get(
+                    relation_type, [relation_type]
+                )
+                for relation in relations[basic_relation_type]
+            ]
+        return result
+
+
 def create_edges_from_relations(
     relations: List[Relation],
     edges: List[Edge],
@@ -180,7 +460,6 @@ def create_relation_nodes_from_alignment(
     node_text: str,
     swap_direction: bool = False,
 ) -> Tuple[List[Relation], Dict[str, Node]]:
-
     """Create relation nodes from alignments between two nodes.
 
     Args:
@@ -263,7 +542,10 @@ def get_binary_relations(
 
 
 def get_two_hop_connections(
-    src_node_ids: Collection[str], trg_node_ids: Collection[str], edges: Iterable[Edge]
+    src_node_ids: Collection[str],
+    trg_node_ids: Collection[str],
+    edges: Iterable[Edge],
+    index: Optional[NodesetIndex] = None,
 ) -> Set[Tuple[str, str, str]]:
     """Get all two-hop edges (i.e. binary relations) between the given node ids.
 
@@ -271,19 +553,25 @@ def get_two_hop_connections(
         src_node_ids: A collection of source node ids.
         trg_node_ids: A collection of target node ids.
         edges: A collection of edges.
+        index: A NodesetIndex of the nodeset with the edges. If provided, its adjacency lists are
+            used instead of the edges.
 
     Returns:
         A set of tuples containing the source node id, target node id, and relation node id.
     """
 
-    src2targets = defaultdict(list)
-    for edge in edges:
-        src2targets[edge["fromID"]].append(edge["toID"])
+    src2targets: Mapping[str, List[str]]
+    if index is not None:
+        src2targets = index.src2targets
+    else:
+        src2targets = defaultdict(list)
+        for edge in edges:
+            src2targets[edge["fromID"]].append(edge["toID"])
 
     result = set()
     for src_node_id in src_node_ids:
-        for rel_node_id in src2targets[src_node_id]:
-            for trg_node_id in src2targets[rel_node_id]:
+        for rel_node_id in src2targets.get(src_node_id, []):
+            for trg_node_id in src2targets.get(rel_node_id, []):
                 if trg_node_id in trg_node_ids:
                     result.add((src_node_id, trg_node_id, rel_node_id))
 
@@ -291,127 +579,33 @@ def get_two_hop_connections(
 
 
 def get_relations(
-    nodeset: Nodeset, relation_type: str, enforce_cardinality: bool = False
+    nodeset: Nodeset,
+    relation_type: str,
+    enforce_cardinality: bool = False,
+    index: Optional[NodesetIndex] = None,
 ) -> List[Relation]:
     """Get all relations of a given type from a nodeset.
 
     Args:
         nodeset: A nodeset.
-        relation_type: The type of the relations to extract.
+        relation_type: The type of the relations to extract (see RELATION_TYPE_SPECS). The
+            composite types "S" and "YA" are composed of the "RA", "CA", and "MA" relations and
+            the "YA-L2I", "YA-TA2S", "YA-TA2I", and "YA-L2L" relations, respectively.
         enforce_cardinality: Whether to enforce the cardinality constraints of the relation type.
             All relations need to have exactly one source and one target node, except for the "S"
             relation type which can have multiple source nodes.
+        index: A NodesetIndex of the nodeset. If not provided, it is created from the nodeset.
 
     Returns:
         A list of binary relations: tuples containing the source node ID, target node ID, and relation node ID.
     """
-    result = []
-    if relation_type == "TA":
-        allowed_node_types = ["TA"]
-        allowed_source_types = ["L"]
-        allowed_target_types = ["L"]
-        allowed_max_sources = None  # see e.g. nodeset 21455 TA-node 718440
-        allowed_max_targets = None
-    elif relation_type == "S":
-        result.extend(get_relations(nodeset, "RA", enforce_cardinality))
-        result.extend(get_relations(nodeset, "CA", enforce_cardinality))
-        result.extend(get_relations(nodeset, "MA", enforce_cardinality))
-        return result  # "S" relations are composed of "RA", "CA", and "MA" relations
-    elif relation_type == "RA":
-        allowed_node_types = ["RA"]
-        allowed_source_types = ["I"]
-        allowed_target_types = ["I"]
-        allowed_max_sources = None
-        # Note: this is not constrained because for reverted RA-relations the source and target are swapped
-        #  and, thus, we also need to allow multiple targets
-        allowed_max_targets = None
-    elif relation_type == "CA":
-        allowed_node_types = ["CA"]
-        allowed_source_types = ["I"]
-        allowed_target_types = ["I"]
-        allowed_max_sources = 1
-        allowed_max_targets = 1
-    elif relation_type == "MA":
-        allowed_node_types = ["MA"]
-        allowed_source_types = ["I"]
-        allowed_target_types = ["I"]
-        allowed_max_sources = 1
-        allowed_max_targets = 1
-    elif relation_type == "YA":
-        result.extend(get_relations(nodeset, "YA-L2I", enforce_cardinality))
-        result.extend(get_relations(nodeset, "YA-TA2S", enforce_cardinality))
-        result.extend(get_relations(nodeset, "YA-TA2I", enforce_cardinality))
-        result.extend(get_relations(nodeset, "YA-L2L", enforce_cardinality))
-        return result  # "YA" relations are composed of "YA-L2I", "YA-TA2S", "YA-TA2I", and "YA-L2L" relations
-    elif relation_type == "YA-L2I":
-        allowed_node_types = ["YA"]
-        allowed_source_types = ["L"]
-        allowed_target_types = ["I"]
-        allowed_max_sources = 1
-        allowed_max_targets = 1
-    elif relation_type == "YA-TA2S":
-        allowed_node_types = ["YA"]
-        allowed_source_types = ["TA"]
-        allowed_target_types = ["RA", "CA", "MA"]
-        allowed_max_sources = 1
-        allowed_max_targets = 1
-    elif relation_type == "YA-TA2I":
-        # Note: this is a kind of rare case where the source is a TA-node and the target is an I-node
-        allowed_node_types = ["YA"]
-        allowed_source_types = ["TA"]
-        allowed_target_types = ["I"]
-        allowed_max_sources = 1
-        allowed_max_targets = 1
-    elif relation_type == "YA-L2L":
-        # Note: YA-relations L -> YA -> L encode (in-)direct speech
-        allowed_node_types = ["YA"]
-        allowed_source_types = ["L"]
-        allowed_target_types = ["L"]
-        allowed_max_sources = 1
-        allowed_max_targets = 1
-    else:
+    if relation_type not in RELATION_TYPE_SPECS and relation_type not in COMPOSITE_RELATION_TYPES:
         raise ValueError(f"Unknown relation type: {relation_type}")
-
-    # helper constructs
-    node_id2node = {node["nodeID"]: node for node in nodeset["nodes"]}
-    src2targets = defaultdict(list)
-    trg2sources = defaultdict(list)
-    for edge in nodeset["edges"]:
-        src_id = edge["fromID"]
-        trg_id = edge["toID"]
-        src2targets[src_id].append(trg_id)
-        trg2sources[trg_id].append(src_id)
-
-    # get all relation nodes
-    relation_node_ids = get_node_ids(node_id2node, allowed_node_types)
-    for relation_node_id in relation_node_ids:
-        # get all source and target nodes
-        sources = [
-            src_id
-            for src_id in trg2sources[relation_node_id]
-            if node_id2node[src_id]["type"] in allowed_source_types
-        ]
-        targets = [
-            trg_id
-            for trg_id in src2targets[relation_node_id]
-            if node_id2node[trg_id]["type"] in allowed_target_types
-        ]
-
-        if enforce_cardinality:
-            if allowed_max_sources is not None and len(sources) > allowed_max_sources:
-                continue
-            if allowed_max_targets is not None and len(targets) > allowed_max_targets:
-                continue
-        # check whether we have non-empty sources and targets
-        if len(sources) > 0 and len(targets) > 0:
-            result.append(
-                {
-                    "sources": sources,
-                    "targets": targets,
-                    "relation": relation_node_id,
-                }
-            )
-    return result
+    if index is None:
+        index = NodesetIndex(nodeset)
+    return index.get_all_relations(
+        relation_types=[relation_type], enforce_cardinality=enforce_cardinality
+    )[relation_type]
 
 
 def remove_relation_nodes_and_edges(nodeset: Nodeset, relations: List[Relation]) -> Nodeset:
@@ -575,7 +769,7 @@ def connected_via_path(source: str, target: str, src2targets: Dict[str, List[str
         Whether there is a path between source and target.
     """
 
-    visited = []
+    visited = set()
     successors = src2targets.get(source, [])
     while len(successors) > 0:
         if target in successors:
@@ -585,14 +779,92 @@ def connected_via_path(source: str, target: str, src2targets: Dict[str, List[str
             # avoid endless loops
             if successor in visited:
                 continue
-            visited.append(successor)
+            visited.add(successor)
             successors_new.extend(src2targets.get(successor, []))
         successors = successors_new
     return False
 
 
+def get_strongly_connected_components(src2targets: Mapping[str, List[str]]) -> List[List[str]]:
+    """Get the strongly connected components of a graph with Tarjan's algorithm (iterative, to
+    not hit the recursion limit for long dialogues).
+
+    Args:
+        src2targets: Edges from source nodes to their targets.
+
+    Returns:
+        The strongly connected components, in reverse topological order (i.e. a component comes
+        after all components that are reachable from it).
+    """
+
+    node2index: Dict[str, int] = {}
+    node2lowlink: Dict[str, int] = {}
+    on_stack: Set[str] = set()
+    stack: List[str] = []
+    result: List[List[str]] = []
+    for start in src2targets:
+        if start in node2index:
+            continue
+        # the nodes of the current depth-first search path with the iterators over their targets
+        path = [(start, iter(src2targets.get(start, [])))]
+        node2index[start] = node2lowlink[start] = len(node2index)
+        stack.append(start)
+        on_stack.add(start)
+        while path:
+            node, targets = path[-1]
+            for trg in targets:
+                if trg not in node2index:
+                    node2index[trg] = node2lowlink[trg] = len(node2index)
+                    stack.append(trg)
+                    on_stack.add(trg)
+                    path.append((trg, iter(src2targets.get(trg, []))))
+                    break
+                if trg in on_stack:
+                    node2lowlink[node] = min(node2lowlink[node], node2index[trg])
+            else:
+                # all targets are processed
+                path.pop()
+                if path:
+                    parent = path[-1][0]
+                    node2lowlink[parent] = min(node2lowlink[parent], node2lowlink[node])
+                if node2lowlink[node] == node2index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    result.append(component)
+    return result
+
+
+def get_loop_nodes(src2targets: Mapping[str, List[str]]) -> Set[str]:
+    """Get all nodes that are part of a loop, i.e. for which there is a path back to the node
+    itself (see connected_via_path). These are the nodes of the strongly connected components with
+    more than one node and the nodes with self-loops.
+
+    Args:
+        src2targets: Edges from source nodes to their targets.
+
+    Returns:
+        The IDs of the loop nodes.
+    """
+
+    loop_nodes = set()
+    for component in get_strongly_connected_components(src2targets):
+        if len(component) > 1:
+            loop_nodes.update(component)
+        elif component[0] in src2targets.get(component[0], []):
+            loop_nodes.add(component[0])
+    return loop_nodes
+
+
 def sort_nodes_by_hierarchy(
-    node_ids: Collection[str], edges: Collection[Edge], nodeset_id: Optional[str] = None
+    node_ids: Collection[str],
+    edges: Collection[Edge],
+    nodeset_id: Optional[str] = None,
+    index: Optional[NodesetIndex] = None,
 ) -> List[str]:
     """Sort nodes in reversed depth-first order. The nodes are sorted in such a way that parents
     are always before children.
@@ -601,6 +873,8 @@ def sort_nodes_by_hierarchy(
         node_ids (Collection[str]): List of ids of nodes to sort.
         edges (Collection[Edge]): List of edges.
         nodeset_id (Optional[str]): The ID of the nodeset for better logging.
+        index (Optional[NodesetIndex]): A NodesetIndex of the nodeset with the edges, see
+            get_two_hop_connections.
 
     Returns:
         List[str]: List of sorted node ids.
@@ -608,7 +882,7 @@ def sort_nodes_by_hierarchy(
 
     # first, get all two-hop edges between the given node ids (i.e. bridging relation nodes)
     valid_binary_relations = get_two_hop_connections(
-        src_node_ids=node_ids, trg_node_ids=node_ids, edges=edges
+        src_node_ids=node_ids, trg_node_ids=set(node_ids), edges=edges, index=index
     )
 
     src2targets = defaultdict(list)
@@ -617,14 +891,8 @@ def sort_nodes_by_hierarchy(
         src2targets[src].append(trg)
         trg2sources[trg].append(src)
 
-    # collect loop nodes
-    loop_nodes = set()
-    for src, targets in src2targets.items():
-        for trg in targets:
-            # if there is a path from trg to src, we have a loop
-            if connected_via_path(source=trg, target=src, src2targets=src2targets):
-                loop_nodes.add(src)
-                loop_nodes.add(trg)
+    # collect loop nodes, i.e. nodes in strongly connected components
+    loop_nodes = get_loop_nodes(src2targets)
 
     if len(loop_nodes) > 0:
         logger.warning(f"nodeset_id={nodeset_id}: Detected loop nodes: {loop_nodes}")
@@ -632,7 +900,10 @@ def sort_nodes_by_hierarchy(
     # all nodes that are no source of a relation are leaves
     leaves = set(node_ids) - set(src2targets)
 
-    # do a reversed depth-first search starting from the leaves
+    # Do a reversed topological sort (Kahn's algorithm with a stack, i.e. depth-first) starting
+    # from the leaves: a parent is added to the stack when all its children have been visited.
+    # Nodes in loops never get to this point, so they are added to the stack from the start.
+    num_unvisited_children = {src: len(targets) for src, targets in src2targets.items()}
     result_reverted = []
     visited = set()
     # First, start with leaves, then process loop nodes, if they are not already handled.
@@ -646,9 +917,9 @@ def sort_nodes_by_hierarchy(
         result_reverted.append(node_id)
 
         # add all parents to the stack where all children have been visited
-        parents = trg2sources.get(node_id, [])
-        for parent in parents:
-            if parent is not None and all(child in visited for child in src2targets[parent]):
+        for parent in trg2sources.get(node_id, []):
+            num_unvisited_children[parent] -= 1
+            if num_unvisited_children[parent] == 0:
                 stack.append(parent)
 
     result = list(reversed(result_reverted))
@@ -675,11 +946,10 @@ def get_relation_statistics(
         - "edges_covered_multi_times": A list of edges that are covered by multiple relations.
         - "covered_relations": A dictionary containing the number of covered relations for each type.
     """
-    node_id2node = {node["nodeID"]: node for node in nodeset["nodes"]}
+    index = NodesetIndex(nodeset)
+    node_id2node = index.node_id2node
 
-    all_relations = {
-        rel_type: get_relations(nodeset, relation_type=rel_type) for rel_type in ["TA", "S", "YA"]
-    }
+    all_relations = index.get_all_relations(relation_types=["TA", "S", "YA"])
     covered_edges: Dict[Tuple[str, str], int] = Counter()
     empty_sources = set()
     empty_targets = set()
@@ -741,7 +1011,11 @@ def get_relation_statistics(
 
 
 def main(
-    nodeset_id: Optional[str] = None, input_dir: str = "data", show_progress: bool = True, **kwargs
+    nodeset_id: Optional[str] = None,
+    input_dir: str = "data",
+    show_progress: bool = True,
+    num_workers: int = 0,
+    **kwargs,
 ) -> None:
     result: Dict[str, Any]
     if nodeset_id is not None:
@@ -754,6 +1028,7 @@ def main(
             func=get_relation_statistics,
             nodeset_dir=input_dir,
             show_progress=show_progress,
+            num_workers=num_workers,
             **kwargs,
         ):
             if isinstance(result_or_error, Exception):
@@ -788,6 +1063,12 @@ if __name__ == "__main__":
     parser.add_argument(
         "--silent", action="store_false", dest="show_progress", help="Disable progress bar."
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=0,
+        help="Number of worker processes (0 means no multiprocessing).",
+    )
 
     args = vars(parser.parse_args())
     logging.basicConfig(level=logging.INFO)
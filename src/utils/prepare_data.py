@@ -25,6 +25,7 @@ from src.utils.create_relation_nodes import (
 from src.utils.nodeset_utils import (
     Node,
     Nodeset,
+    NodesetIndex,
     Relation,
     get_id2node,
     get_node_ids_by_type,
@@ -54,16 +55,12 @@ Clean-up the data as follows:
 
 
 def get_valid_relations(nodeset: Nodeset) -> List[Relation]:
-    # collect L > TA > L relations
-    ta_relations = get_relations(nodeset, "TA", enforce_cardinality=True)
-
-    # collect valid I > {MA, RA, CA} > I relations
-    s_relations = get_relations(nodeset, "S", enforce_cardinality=True)
-
-    # collect {L, TA} > YA > {I, L, MA, RA, CA} relations
-    ya_relations = get_relations(nodeset, "YA", enforce_cardinality=True)
-
-    return s_relations + ya_relations + ta_relations
+    # collect L > TA > L relations, valid I > {MA, RA, CA} > I relations, and
+    # {L, TA} > YA > {I, L, MA, RA, CA} relations
+    relations = NodesetIndex(nodeset).get_all_relations(
+        relation_types=["TA", "S", "YA"], enforce_cardinality=True
+    )
+    return relations["S"] + relations["YA"] + relations["TA"]
 
 
 def normalize_ra_relation_direction(
@@ -436,6 +433,7 @@ def get_reversed_ra_relations(
     nodeset: Nodeset,
     nodeset_id: str,
     verbose: bool = True,
+    index: Optional[NodesetIndex] = None,
 ) -> Iterator[Relation]:
     """Collect all S-node relations that need to be reversed (this affects RA-nodes).
 
@@ -443,13 +441,19 @@ def get_reversed_ra_relations(
         nodeset: Nodeset.
         nodeset_id: Nodeset ID.
         verbose: Whether to show verbose output.
+        index: A NodesetIndex of the nodeset. If not provided, it is created from the nodeset.
 
     Returns:
         Iterator over the S-node relations that need to be reversed.
     """
-    ra_relations = get_relations(nodeset, "RA", enforce_cardinality=True)
-    ta_relations = get_relations(nodeset, "TA", enforce_cardinality=True)
-    ya_relations = get_relations(nodeset, "YA", enforce_cardinality=True)
+    if index is None:
+        index = NodesetIndex(nodeset)
+    relations = index.get_all_relations(
+        relation_types=["RA", "TA", "YA"], enforce_cardinality=True
+    )
+    ra_relations = relations["RA"]
+    ta_relations = relations["TA"]
+    ya_relations = relations["YA"]
 
     # helper structures
     ya_trg2sources = defaultdict(list)
@@ -463,14 +467,13 @@ def get_reversed_ra_relations(
             for trg_id in rel["targets"]:
                 ta_src_trg.add((src_id, trg_id))
     # for multi-hop L -> TA -> ... -> TA -> L relations
-    node2type = {n["nodeID"]: n["type"] for n in nodeset["nodes"]}
     l2l_nodes = defaultdict(list)
     for rel in ta_relations:
         targets = rel["targets"]
         sources = rel["sources"]
         for src in sources:
-            if node2type[src] == "L":
-                l2l_nodes[src].extend([trg for trg in targets if node2type[trg] == "L"])
+            if index.get_node_type(src) == "L":
+                l2l_nodes[src].extend([trg for trg in targets if index.get_node_type(trg) == "L"])
 
     # collect for each S-node all source-anchor and target-anchor pairs
     already_checked: Dict[str, bool] = dict()
@@ -631,13 +634,13 @@ def prepare_nodeset(
         )
 
         if re_revert_ra_relations:
-            node_id2node = get_id2node(nodeset_with_dummy_relations)
+            index = NodesetIndex(nodeset_with_dummy_relations)
             normalized_re_relations = [
                 ra_relation
                 for ra_relation in get_relations(
-                    nodeset_with_dummy_relations, "RA", enforce_cardinality=True
+                    nodeset_with_dummy_relations, "RA", enforce_cardinality=True, index=index
                 )
-                if node_id2node[ra_relation["relation"]]["text"].endswith("-rev")
+                if index.node_id2node[ra_relation["relation"]]["text"].endswith("-rev")
             ]
             nodeset_with_dummy_relations = reverse_relations_nodes(
                 relations=normalized_re_relations,
@@ -647,17 +650,15 @@ def prepare_nodeset(
                 redo=True,
             )
         if re_remove_none_relations:
-            node_id2node = get_id2node(nodeset_with_dummy_relations)
+            index = NodesetIndex(nodeset_with_dummy_relations)
+            node_id2node = index.node_id2node
             # collect S and YA relations
-            s_relations = list(
-                get_relations(nodeset=nodeset_with_dummy_relations, relation_type="S")
-            )
+            relations = index.get_all_relations(relation_types=["S", "YA"])
+            s_relations = relations["S"]
             new_s_relations = [
                 rel for rel in s_relations if node_id2node[rel["relation"]]["text"] == s_node_text
             ]
-            ya_relations = list(
-                get_relations(nodeset=nodeset_with_dummy_relations, relation_type="YA")
-            )
+            ya_relations = relations["YA"]
             new_ya_relations = [
                 rel
                 for rel in ya_relations
@@ -686,6 +687,7 @@ def main(
     nodeset_id: Optional[str] = None,
     nodeset_blacklist: Optional[List[str]] = None,
     nodeset_whitelist: Optional[List[str]] = None,
+    num_workers: int = 0,
     **kwargs,
 ):
     # create the output directory if it does not exist
@@ -706,6 +708,9 @@ def main(
             show_progress=show_progress,
             nodeset_blacklist=nodeset_blacklist,
             nodeset_whitelist=nodeset_whitelist,
+            num_workers=num_workers,
+            # write the results as soon as they are available
+            ordered=False,
             **kwargs,
         ):
             if isinstance(result_or_error, Exception):
@@ -785,6 +790,12 @@ if __name__ == "__main__":
         action="store_true",
         help="Whether to execute in debug mode.",
     )
+    parser.add_argument(
+        "--num_workers",
+        type=int,
+        default=0,
+        help="The number of worker processes to process the nodesets (0 means no multiprocessing).",
+    )
     parser.add_argument(
         "--dont_show_progress",
         dest="show_progress",
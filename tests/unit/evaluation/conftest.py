@@ -0,0 +1,7 @@
+import os
+import sys
+
+# the CASS evaluation modules (evaluate.py, matching.py, ...) import each other as top-level
+# modules, i.e. they expect to be run as scripts from within src/evaluation. We append the
+# directory (instead of prepending it) to not shadow installed packages, e.g. evaluate.
+sys.path.append(os.path.join(os.path.dirname(__file__), "..", "..", "..", "src", "evaluation"))
@@ -0,0 +1,119 @@
+import os
+
+import numpy as np
+import pytest
+
+from src.evaluation.bootstrap import (
+    align_runs,
+    bootstrap_confidence_intervals,
+    get_scores_per_nodeset,
+    load_confusion_counts,
+    paired_bootstrap_test,
+    weighted_nanmean,
+)
+from src.evaluation.eval_official import (
+    EVALUATION_MODES,
+    collect_confusion_counts,
+    eval_all,
+    flatten_dict,
+    save_confusion_counts,
+)
+from src.utils.nodeset_utils import get_nodeset_ids_from_directory
+
+GOLD_DIR = "data/evaluation_data"
+
+
+@pytest.fixture(scope="module")
+def confusion_counts_file(tmp_path_factory):
+    path = os.path.join(tmp_path_factory.mktemp("bootstrap"), "confusion_counts.npz")
+    nodeset2confusions = collect_confusion_counts(
+        predictions_dir=GOLD_DIR, gold_dir=GOLD_DIR, modes=EVALUATION_MODES, show_progress=False
+    )
+    save_confusion_counts(path, nodeset2confusions, modes=EVALUATION_MODES)
+    return path
+
+
+def test_get_scores_per_nodeset(confusion_counts_file):
+    arrays = load_confusion_counts(confusion_counts_file)
+    nodeset_ids = sorted(get_nodeset_ids_from_directory(GOLD_DIR))
+    assert arrays["nodeset_ids"].tolist() == nodeset_ids
+    assert arrays["arguments.labels"].tolist() == ["0", "1", "2", "3"]
+    assert int(arrays["arguments.none_index"]) == 3
+
+    stat_names, scores = get_scores_per_nodeset(arrays)
+    assert scores.shape == (len(nodeset_ids), len(stat_names))
+    for nodeset_id, nodeset_scores in zip(nodeset_ids, scores):
+        expected = flatten_dict(
+            eval_all(
+                nodeset_id=nodeset_id, predictions_dir=GOLD_DIR, gold_dir=GOLD_DIR, verbose=False
+            )
+        )
+        assert dict(zip(stat_names, nodeset_scores.tolist())) == pytest.approx(expected)
+
+
+def test_weighted_nanmean():
+    scores = np.array([[1.0, np.nan], [0.0, 0.5], [0.5, 1.0]])
+    weights = np.array([[1, 1, 1], [0, 3, 0], [2, 0, 1]])
+    result = weighted_nanmean(scores, weights)
+    expected = [[0.5, 0.75], [0.0, 0.5], [2.5 / 3, 1.0]]
+    np.testing.assert_allclose(result, expected)
+
+
+def test_bootstrap_confidence_intervals():
+    rng = np.random.default_rng(0)
+    scores = rng.random((50, 3))
+    scores[0, 1] = np.nan
+
+    result = bootstrap_confidence_intervals(scores, num_samples=2000, seed=42)
+    np.testing.assert_allclose(result["mean"], np.nanmean(scores, axis=0))
+    assert (result["lower"] < result["mean"]).all()
+    assert (result["mean"] < result["upper"]).all()
+    # the standard error of the mean is about 0.04, so the 95% interval spans about 0.16
+    np.testing.assert_allclose(result["upper"] - result["lower"], 0.16, atol=0.05)
+
+    # the same seed gives the same result
+    other_result = bootstrap_confidence_intervals(scores, num_samples=2000, seed=42)
+    for key, values in result.items():
+        np.testing.assert_array_equal(values, other_result[key])
+
+
+def test_paired_bootstrap_test():
+    rng = np.random.default_rng(0)
+    scores = rng.random((50, 2))
+    # the first statistic is clearly better in the first run, the second is the same
+    other_scores = scores.copy()
+    other_scores[:, 0] -= 0.2
+
+    result = paired_bootstrap_test(scores, other_scores, num_samples=2000, seed=42)
+    np.testing.assert_allclose(result["delta"], [0.2, 0.0], atol=1e-12)
+    assert result["p_value"][0] < 0.01
+    assert result["p_value"][1] == 1.0
+    assert result["lower"][0] == pytest.approx(0.2)
+    assert result["upper"][0] == pytest.approx(0.2)
+
+
+def test_paired_bootstrap_test_shape_mismatch():
+    with pytest.raises(ValueError) as excinfo:
+        paired_bootstrap_test(np.zeros((3, 2)), np.zeros((2, 2)))
+    assert str(excinfo.value) == (
+        "scores and other_scores need to have the same shape, but got (3, 2) and (2, 2)"
+    )
+
+
+def test_align_runs(confusion_counts_file):
+    arrays = load_confusion_counts(confusion_counts_file)
+    # the other run contains only the argument scores for a subset of the nodesets
+    other_arrays = {
+        "nodeset_ids": arrays["nodeset_ids"][3:],
+        "arguments.labels": arrays["arguments.labels"],
+        "arguments.none_index": arrays["arguments.none_index"],
+        "arguments.confusion": arrays["arguments.confusion"][3:],
+    }
+    stat_names, scores, other_scores = align_runs(arrays, other_arrays)
+    assert stat_names == [
+        f"arguments.{name}.{stat_name}"
+        for name in ["general", "focused"]
+        for stat_name in ["p", "r", "f1"]
+    ]
+    assert scores.shape == other_scores.shape == (len(arrays["nodeset_ids"]) - 3, 6)
+    np.testing.assert_array_equal(scores, other_scores)
@@ -0,0 +1,131 @@
+import copy
+import json
+import os
+
+import numpy as np
+import pytest
+
+import evaluate
+import matching
+from cass_metrics import NONE, ConfusionMatrix
+
+pycm = pytest.importorskip("pycm")
+
+GOLD_DIR = "data/evaluation_data"
+
+STATISTICS = ["Kappa", "KappaNoPrevalence", "F1_Macro", "ACC", "Alpha"]
+
+
+def perturb_nodeset(nodeset):
+    """Change the type of every third S-node and the text of every fourth YA-node."""
+    result = copy.deepcopy(nodeset)
+    s_node_types = ["RA", "CA", "MA"]
+    s_nodes = [node for node in result["nodes"] if node["type"] in s_node_types]
+    for node in s_nodes[::3]:
+        node["type"] = s_node_types[(s_node_types.index(node["type"]) + 1) % 3]
+    ya_nodes = [node for node in result["nodes"] if node["type"] == "YA"]
+    for node in ya_nodes[::4]:
+        node["text"] = "Questioning" if node["text"] == "Asserting" else "Asserting"
+    return result
+
+
+@pytest.fixture(scope="module")
+def confusion_matrix_arrays():
+    result = []
+    # the matching is slow, so we use only some of the nodesets
+    for file_name in sorted(os.listdir(GOLD_DIR))[:5]:
+        with open(os.path.join(GOLD_DIR, file_name)) as f:
+            gold = json.load(f)
+        for predicted in [gold, perturb_nodeset(gold)]:
+            for ignore_text_annotations in [False, True]:
+                result.extend(
+                    matching.calculate_matching(
+                        predicted, gold, ignore_text_annotations, True, file_name
+                    )
+                )
+    # add some edge cases: no samples at all, a class without samples, only disagreements
+    result.extend(
+        np.array(array) for array in [[[0, 0], [0, 0]], [[3, 0], [0, 0]], [[0, 3], [2, 0]]]
+    )
+    return result
+
+
+def assert_same_statistics(confusion_matrix, expected):
+    for name in STATISTICS:
+        value = getattr(confusion_matrix, name)
+        expected_value = getattr(expected, name)
+        # exactly the same values, including the "None" fallback of pycm
+        assert value == expected_value, name
+        assert type(value) is type(expected_value), name
+
+
+def test_confusion_matrix_same_as_pycm(confusion_matrix_arrays):
+    assert len(confusion_matrix_arrays) > 100
+    for array in confusion_matrix_arrays:
+        assert array.dtype == np.int64
+        d = matching.convert_to_dict(array.tolist())
+        expected = pycm.ConfusionMatrix(matrix=d)
+        assert_same_statistics(ConfusionMatrix(array), expected)
+        # the counts can also be passed in the format of pycm
+        assert_same_statistics(ConfusionMatrix(d), expected)
+
+
+def test_confusion_matrix_same_as_pycm_random():
+    rng = np.random.default_rng(42)
+    for num_classes in range(2, 8):
+        for max_count in [2, 10, 1000]:
+            for _ in range(50):
+                array = rng.integers(0, max_count, size=(num_classes, num_classes))
+                # a class without any actual samples
+                array[rng.integers(num_classes)] = 0
+                expected = pycm.ConfusionMatrix(matrix=array.tolist())
+                assert_same_statistics(ConfusionMatrix(array), expected)
+
+
+def test_confusion_matrix_none_fallback():
+    confusion_matrix = ConfusionMatrix([[0, 0], [0, 0]])
+    for name in ["Kappa", "KappaNoPrevalence", "F1_Macro", "Alpha"]:
+        assert getattr(confusion_matrix, name) == NONE
+    assert confusion_matrix.ACC == {0: NONE, 1: NONE}
+
+    # perfect agreement on a single class: Kappa is not defined, but KappaNoPrevalence is
+    confusion_matrix = ConfusionMatrix([[3, 0], [0, 0]])
+    assert confusion_matrix.Kappa == NONE
+    assert confusion_matrix.KappaNoPrevalence == 1.0
+    assert confusion_matrix.F1_Macro == NONE
+    assert confusion_matrix.ACC == {0: 1.0, 1: 1.0}
+    assert evaluate.get_kappa(confusion_matrix) == 1.0
+    assert evaluate.get_f1(confusion_matrix) == 1.0
+    assert evaluate.get_u_alpha(confusion_matrix) == 1.0
+
+
+def test_confusion_matrix_invalid():
+    with pytest.raises(ValueError, match="at least 2"):
+        ConfusionMatrix({0: {0: 5}})
+    with pytest.raises(ValueError, match="must be square"):
+        ConfusionMatrix(np.zeros((2, 3), dtype=int))
+
+
+@pytest.mark.parametrize("metrics_backend", evaluate.METRICS_BACKENDS)
+def test_get_confusion_matrix(metrics_backend):
+    array = np.array([[5, 1], [2, 4]])
+    confusion_matrix = evaluate.get_confusion_matrix(array, backend=metrics_backend)
+    assert_same_statistics(confusion_matrix, pycm.ConfusionMatrix(matrix=array.tolist()))
+
+
+def test_get_confusion_matrix_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown metrics backend"):
+        evaluate.get_confusion_matrix(np.eye(2, dtype=int), backend="unknown")
+
+
+def test_evaluate_nodeset_same_as_pycm():
+    file_name = sorted(os.listdir(GOLD_DIR))[0]
+    path = os.path.join(GOLD_DIR, file_name)
+    results = {
+        metrics_backend: evaluate.evaluate_nodeset(
+            path, path, False, True, file_name, metrics_backend=metrics_backend
+        )
+        for metrics_backend in evaluate.METRICS_BACKENDS
+    }
+    assert results["numpy"] == results["pycm"]
+    assert set(results["numpy"]) == {"Kappa", "CASS", "F1", "Accuracy", "U-Alpha"}
@@ -0,0 +1,108 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import centrality
+import load_map
+from compact_graph import CompactGraph
+
+GOLD_DIR = "data/evaluation_data"
+
+
+@pytest.fixture
+def graph():
+    return CompactGraph.from_nodes_and_edges(
+        nodes=[
+            (1, {"type": "L", "text": "a"}),
+            (2, {"type": "YA", "text": "Asserting", "timestamp": "t"}),
+            (3, {"type": "I", "text": "b"}),
+            (4, {"type": "L", "text": "isolated"}),
+            (5, {"type": None, "text": None}),
+            (2, {"text": "Restating"}),
+        ],
+        edges=[(1, 2), (2, 3), (1, 2), (6, 3), (3, 3)],
+    )
+
+
+def test_compact_graph(graph):
+    assert len(graph) == 6
+    assert graph.num_edges == 4
+    assert graph.node_ids == [1, 2, 3, 4, 5, 6]
+    assert 6 in graph
+    assert 7 not in graph
+    assert graph.successors(1) == [2]
+    assert graph.successors(3) == [3]
+    assert graph.predecessors(3) == [2, 6, 3]
+    assert graph.predecessors(1) == []
+    assert graph.get_type(2) == "YA"
+    # adding a node again updates its attributes
+    assert graph.get_text(2) == "Restating"
+    assert graph.attributes["timestamp"] == [None, "t", None, None, None, None]
+    assert graph.get_type(5) is None
+    # nodes that only occur in edges have no attributes
+    with pytest.raises(KeyError):
+        graph.get_type(6)
+    with pytest.raises(KeyError):
+        graph.get_text(6)
+    with pytest.raises(KeyError):
+        graph.successors(7)
+    assert graph.get_nodes_by_type(["L", "I"]) == [1, 3, 4]
+    assert graph.get_isolate_mask().tolist() == [False, False, False, True, True, False]
+
+
+def test_without_nodes(graph):
+    result = graph.without_nodes(np.array([False, True, False, True, False, False]))
+    assert result.node_ids == [1, 3, 5, 6]
+    assert result.successors(1) == []
+    assert result.predecessors(3) == [6, 3]
+    assert result.get_text(3) == "b"
+    assert result.attributes["timestamp"] == [None, None, None, None]
+    assert graph.without_nodes(np.zeros(len(graph), dtype=bool)) is graph
+
+
+def test_remove_iso_analyst_nodes(graph):
+    result = centrality.remove_iso_analyst_nodes(graph)
+    # node 5 is isolated, but not an L-node
+    assert result.node_ids == [1, 2, 3, 5, 6]
+
+
+def test_parse_json_same_as_networkx():
+    nx = pytest.importorskip("networkx")
+
+    for file_name in sorted(os.listdir(GOLD_DIR)):
+        with open(os.path.join(GOLD_DIR, file_name)) as f:
+            nodeset = json.load(f)
+        # add a duplicated edge, a self loop and an edge from an unknown node
+        first_id = nodeset["nodes"][0]["nodeID"]
+        nodeset["edges"] += [
+            nodeset["edges"][0],
+            {"fromID": first_id, "toID": first_id},
+            {"fromID": "123456789", "toID": first_id},
+        ]
+        graph = load_map.parse_json(nodeset, ignore_timestamp_casting=True)
+
+        # this is how load_map.parse_json created the graph before
+        nx_graph = nx.DiGraph()
+        for node in nodeset["nodes"]:
+            nx_graph.add_node(int(node["nodeID"]), text=node.get("text"), type=node.get("type"))
+        for edge in nodeset["edges"]:
+            nx_graph.add_edge(int(edge["fromID"]), int(edge["toID"]))
+
+        assert graph.node_ids == list(nx_graph.nodes)
+        for node_id, attributes in nx_graph.nodes(data=True):
+            assert graph.successors(node_id) == list(nx_graph.successors(node_id))
+            assert graph.predecessors(node_id) == list(nx_graph.predecessors(node_id))
+            if "type" in attributes:
+                assert graph.get_type(node_id) == attributes["type"]
+                assert graph.get_text(node_id) == attributes["text"]
+        for node_type in ["I", "L", "YA", "TA", "RA", "CA", "MA"]:
+            assert centrality.get_rels(node_type, graph) == [
+                x for x, y in nx_graph.nodes(data=True) if "type" in y and y["type"] == node_type
+            ]
+        isolated_l_nodes = [
+            node for node in nx.isolates(nx_graph) if nx_graph.nodes[node]["type"] == "L"
+        ]
+        nx_graph.remove_nodes_from(isolated_l_nodes)
+        assert centrality.remove_iso_analyst_nodes(graph).node_ids == list(nx_graph.nodes)
@@ -0,0 +1,55 @@
+import argparse
+import os
+import shutil
+
+import pytest
+
+from src.document.types import TextDocumentWithLabeledEntitiesAndNaryRelations
+from src.evaluation.eval_documents import evaluate_documents
+from src.evaluation.eval_official import eval_all, get_mean_result
+from src.serializer import JsonSerializer
+from src.utils import convert_documents2nodesets
+
+GOLD_DIR = "data/evaluation_data"
+DOCUMENTS_DIR = "tests/fixtures/dataset_builders/pie/dialam2024/test_with_predictions"
+DOCUMENTS_FILE_NAME = "test_documents_roberta_large.jsonl"
+
+
+@pytest.fixture(scope="module")
+def documents():
+    return JsonSerializer.read(
+        path=DOCUMENTS_DIR,
+        file_name=DOCUMENTS_FILE_NAME,
+        document_type=TextDocumentWithLabeledEntitiesAndNaryRelations,
+    )
+
+
+def test_evaluate_documents(documents, tmp_path):
+    result = evaluate_documents(
+        documents, gold_dir=GOLD_DIR, mode="all", verbose=False, show_progress=False
+    )
+    assert sorted(result) == sorted(doc.id for doc in documents)
+
+    # compare with the results of writing the nodesets to disk first
+    input_dir = os.path.join(tmp_path, "documents")
+    os.makedirs(input_dir)
+    shutil.copy(
+        os.path.join(DOCUMENTS_DIR, DOCUMENTS_FILE_NAME),
+        os.path.join(input_dir, "documents.jsonl"),
+    )
+    predictions_dir = os.path.join(tmp_path, "nodesets")
+    convert_documents2nodesets.main(
+        argparse.Namespace(input_dir=input_dir, output_dir=predictions_dir, compact=False)
+    )
+    for nodeset_id, nodeset_result in result.items():
+        expected = eval_all(
+            nodeset_id=nodeset_id,
+            predictions_dir=predictions_dir,
+            gold_dir=GOLD_DIR,
+            verbose=False,
+        )
+        assert nodeset_result == expected
+
+    mean_result = get_mean_result(result.items())
+    assert mean_result["arguments.general.f1"] == pytest.approx(0.5142981501709719, abs=1e-12)
+    assert mean_result["illocutions.focused.f1"] == pytest.approx(0.6364233303786254, abs=1e-12)
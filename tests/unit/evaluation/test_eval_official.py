@@ -0,0 +1,404 @@
+import copy
+import gzip
+import json
+import os
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import numpy as np
+import pytest
+
+from src.evaluation import eval_official
+from src.evaluation.eval_official import (
+    DisagreementWriter,
+    eval_all,
+    eval_arguments,
+    eval_illocutions,
+    evaluate_runs,
+    flatten_dict,
+    get_candidate_pairs,
+    get_disagreements,
+    get_gold_relations,
+    get_predicted_pair2label,
+    main,
+)
+from src.utils.nodeset_pack import write_nodeset_pack
+from src.utils.nodeset_utils import Nodeset, get_nodeset_ids_from_directory, read_nodeset
+
+GOLD_DIR = "data/evaluation_data"
+
+
+def perturb_nodeset(nodeset: Nodeset) -> Nodeset:
+    """Create a deterministic "prediction" from a gold nodeset by changing the type of some
+    S-nodes, changing the text of some YA-nodes, removing some of both, and adding some RA-nodes.
+    """
+    result = copy.deepcopy(nodeset)
+    s_node_types = ["RA", "CA", "MA"]
+    nodes = []
+    s_idx = ya_idx = 0
+    for node in result["nodes"]:
+        if node["type"] in s_node_types:
+            if s_idx % 3 == 0:
+                node["type"] = s_node_types[(s_node_types.index(node["type"]) + 1) % 3]
+            elif s_idx % 3 == 2:
+                s_idx += 1
+                continue
+            s_idx += 1
+        elif node["type"] == "YA":
+            if ya_idx % 4 == 0:
+                node["text"] = "Questioning" if node["text"] == "Asserting" else "Asserting"
+            elif ya_idx % 4 == 1:
+                ya_idx += 1
+                continue
+            ya_idx += 1
+        nodes.append(node)
+    i_node_ids = [node["nodeID"] for node in result["nodes"] if node["type"] == "I"]
+    for idx in range(0, len(i_node_ids) - 2, 5):
+        node_id = f"{i_node_ids[idx]}-ra"
+        nodes.append({"nodeID": node_id, "type": "RA", "text": "Default Inference"})
+        result["edges"].append(
+            {"edgeID": f"{node_id}-in", "fromID": i_node_ids[idx], "toID": node_id}
+        )
+        result["edges"].append(
+            {"edgeID": f"{node_id}-out", "fromID": node_id, "toID": i_node_ids[idx + 2]}
+        )
+    result["nodes"] = nodes
+    return result
+
+
+def evaluate_all(func: Callable, perturb: bool, **kwargs) -> Dict[str, float]:
+    result: Dict[str, List[float]] = defaultdict(list)
+    for nodeset_id in sorted(get_nodeset_ids_from_directory(GOLD_DIR)):
+        nodeset = read_nodeset(GOLD_DIR, nodeset_id)
+        if perturb:
+            nodeset = perturb_nodeset(nodeset)
+        nodeset_result = func(
+            nodeset_id=nodeset_id,
+            predictions_dir=None,
+            gold_dir=GOLD_DIR,
+            nodeset=nodeset,
+            verbose=False,
+            **kwargs,
+        )
+        for stat_name, stat_value in flatten_dict(nodeset_result).items():
+            result[stat_name].append(stat_value)
+    return {stat_name: sum(values) / len(values) for stat_name, values in result.items()}
+
+
+@pytest.fixture(params=[False, True], ids=["dense", "sparse"])
+def sparse(request):
+    return request.param
+
+
+@pytest.mark.parametrize("func", [eval_arguments, eval_illocutions])
+def test_eval_gold(func, sparse):
+    result = evaluate_all(func, perturb=False, sparse=sparse)
+    assert result == {
+        "general.p": 1.0,
+        "general.r": 1.0,
+        "general.f1": 1.0,
+        "focused.p": 1.0,
+        "focused.r": 1.0,
+        "focused.f1": 1.0,
+    }
+
+
+def test_eval_arguments(sparse):
+    result = evaluate_all(eval_arguments, perturb=True, sparse=sparse)
+    assert result == pytest.approx(
+        {
+            "general.p": 0.5172103732725125,
+            "general.r": 0.431075497070489,
+            "general.f1": 0.4490323443125168,
+            "focused.p": 0.3327651515151515,
+            "focused.r": 0.1845238095238095,
+            "focused.f1": 0.22361048042866222,
+        },
+        abs=1e-12,
+    )
+
+
+def test_eval_illocutions(sparse):
+    result = evaluate_all(eval_illocutions, perturb=True, sparse=sparse)
+    assert result == pytest.approx(
+        {
+            "general.p": 0.59736605733706,
+            "general.r": 0.4422487019813222,
+            "general.f1": 0.4926317650834907,
+            "focused.p": 0.3410285547785548,
+            "focused.r": 0.18315779289041323,
+            "focused.f1": 0.2349265566968916,
+        },
+        abs=1e-12,
+    )
+
+
+@pytest.mark.parametrize("func", [eval_arguments, eval_illocutions])
+def test_evaluate_runs(func, tmp_path):
+    predictions_dirs = [GOLD_DIR]
+    for run_idx in range(2):
+        predictions_dir = os.path.join(tmp_path, f"run{run_idx}")
+        os.makedirs(predictions_dir)
+        # the second run contains only a subset of the nodesets
+        nodeset_ids = sorted(get_nodeset_ids_from_directory(GOLD_DIR))[run_idx * 3 :]
+        for nodeset_id in nodeset_ids:
+            nodeset = perturb_nodeset(read_nodeset(GOLD_DIR, nodeset_id))
+            with open(os.path.join(predictions_dir, f"nodeset{nodeset_id}.json"), "w") as f:
+                json.dump(nodeset, f)
+        predictions_dirs.append(predictions_dir)
+
+    mode = "arguments" if func == eval_arguments else "illocutions"
+    results = evaluate_runs(
+        predictions_dirs=predictions_dirs, gold_dir=GOLD_DIR, mode=mode, show_progress=False
+    )
+    assert len(results) == len(predictions_dirs)
+    for predictions_dir, result in zip(predictions_dirs, results):
+        expected = defaultdict(list)
+        for nodeset_id in sorted(get_nodeset_ids_from_directory(predictions_dir)):
+            nodeset_result = func(
+                nodeset_id=nodeset_id,
+                predictions_dir=predictions_dir,
+                gold_dir=GOLD_DIR,
+                verbose=False,
+            )
+            for stat_name, stat_value in flatten_dict(nodeset_result).items():
+                expected[stat_name].append(stat_value)
+        assert set(result) == set(expected)
+        for stat_name, stat_values in expected.items():
+            assert sorted(result[stat_name]) == pytest.approx(sorted(stat_values), abs=1e-12)
+
+
+def test_evaluate_runs_parses_gold_once(tmp_path, monkeypatch):
+    nodeset_ids = sorted(get_nodeset_ids_from_directory(GOLD_DIR))
+    predictions_dirs = []
+    for run_idx in range(3):
+        predictions_dir = os.path.join(tmp_path, f"run{run_idx}")
+        os.makedirs(predictions_dir)
+        for nodeset_id in nodeset_ids[run_idx:]:
+            nodeset = perturb_nodeset(read_nodeset(GOLD_DIR, nodeset_id))
+            with open(os.path.join(predictions_dir, f"nodeset{nodeset_id}.json"), "w") as f:
+                json.dump(nodeset, f)
+        predictions_dirs.append(predictions_dir)
+    # a nodeset without gold data is missing in the results of its run
+    with open(os.path.join(predictions_dirs[0], "nodesetunknown.json"), "w") as f:
+        json.dump(read_nodeset(GOLD_DIR, nodeset_ids[0]), f)
+
+    results = {}
+    for num_workers in [0, 2]:
+        results[num_workers] = evaluate_runs(
+            predictions_dirs=predictions_dirs,
+            gold_dir=GOLD_DIR,
+            mode="all",
+            show_progress=False,
+            num_workers=num_workers,
+        )
+    assert results[0] == results[2]
+    for run_idx, result in enumerate(results[0]):
+        assert len(result["arguments.general.f1"]) == len(nodeset_ids) - run_idx
+
+    # the gold relations are extracted once per nodeset for all runs
+    get_mode2gold = eval_official.get_mode2gold
+    gold_nodeset_ids = []
+
+    def get_mode2gold_and_count(truth, modes):
+        gold_nodeset_ids.append(truth["nodes"][0]["nodeID"])
+        return get_mode2gold(truth, modes)
+
+    monkeypatch.setattr(eval_official, "get_mode2gold", get_mode2gold_and_count)
+    evaluate_runs(
+        predictions_dirs=predictions_dirs, gold_dir=GOLD_DIR, mode="all", show_progress=False
+    )
+    assert len(gold_nodeset_ids) == len(set(gold_nodeset_ids)) == len(nodeset_ids)
+
+
+def test_eval_all(sparse):
+    result = evaluate_all(eval_all, perturb=True, sparse=sparse)
+    expected_arguments = evaluate_all(eval_arguments, perturb=True, sparse=sparse)
+    expected_illocutions = evaluate_all(eval_illocutions, perturb=True, sparse=sparse)
+    expected = {f"arguments.{key}": value for key, value in expected_arguments.items()}
+    expected.update({f"illocutions.{key}": value for key, value in expected_illocutions.items()})
+    assert result == expected
+
+
+def test_evaluate_runs_all():
+    result = evaluate_runs(
+        predictions_dirs=[GOLD_DIR], gold_dir=GOLD_DIR, mode="all", show_progress=False
+    )
+    assert len(result) == 1
+    assert sorted(result[0]) == sorted(
+        f"{mode}.{name}.{stat_name}"
+        for mode in ["arguments", "illocutions"]
+        for name in ["general", "focused"]
+        for stat_name in ["p", "r", "f1"]
+    )
+    assert all(value == 1.0 for values in result[0].values() for value in values)
+
+
+def test_main_with_cache(tmp_path, capsys):
+    cache_dir = os.path.join(tmp_path, "cache")
+    kwargs = dict(
+        predictions_dir=GOLD_DIR,
+        gold_dir=GOLD_DIR,
+        mode="all",
+        verbose=False,
+        show_progress=False,
+        cache_dir=cache_dir,
+    )
+    main(**kwargs)
+    expected = capsys.readouterr().out
+    num_nodesets = len(get_nodeset_ids_from_directory(GOLD_DIR))
+    assert sum(len(files) for _, _, files in os.walk(cache_dir)) == num_nodesets
+
+    main(**kwargs)
+    assert capsys.readouterr().out == expected
+
+    main(no_cache=True, **kwargs)
+    assert capsys.readouterr().out == expected
+
+
+@pytest.mark.parametrize("pack_dir", ["predictions_dir", "gold_dir"])
+def test_main_with_cache_and_pack(tmp_path, capsys, pack_dir):
+    pack_path = str(tmp_path / "nodesets.nodesetpack")
+    nodeset_ids = get_nodeset_ids_from_directory(GOLD_DIR)
+    write_nodeset_pack(
+        pack_path, [(nodeset_id, read_nodeset(GOLD_DIR, nodeset_id)) for nodeset_id in nodeset_ids]
+    )
+    kwargs = dict(mode="all", verbose=False, show_progress=False)
+    main(predictions_dir=GOLD_DIR, gold_dir=GOLD_DIR, no_cache=True, **kwargs)
+    expected = capsys.readouterr().out
+
+    cache_dir = os.path.join(tmp_path, "cache")
+    kwargs.update(predictions_dir=GOLD_DIR, gold_dir=GOLD_DIR, cache_dir=cache_dir)
+    kwargs[pack_dir] = pack_path
+    main(**kwargs)
+    assert capsys.readouterr().out == expected
+    assert sum(len(files) for _, _, files in os.walk(cache_dir)) == len(nodeset_ids)
+
+    # the results are read from the cache
+    main(**kwargs)
+    assert capsys.readouterr().out == expected
+    assert sum(len(files) for _, _, files in os.walk(cache_dir)) == len(nodeset_ids)
+
+
+@pytest.mark.parametrize("mode", ["all", "arguments"])
+def test_main_with_confusion_counts_file(tmp_path, monkeypatch, mode):
+    modes = eval_official.EVALUATION_MODES if mode == "all" else [mode]
+    expected_path = str(tmp_path / "expected.npz")
+    eval_official.save_confusion_counts(
+        expected_path,
+        eval_official.collect_confusion_counts(
+            predictions_dir=GOLD_DIR, gold_dir=GOLD_DIR, modes=modes, show_progress=False
+        ),
+        modes=modes,
+    )
+    expected = dict(np.load(expected_path))
+
+    def collect_confusion_counts(**kwargs):
+        raise AssertionError("the nodesets should not be parsed again")
+
+    # the confusion counts are collected in the scoring pass (or taken from the cache)
+    monkeypatch.setattr(eval_official, "collect_confusion_counts", collect_confusion_counts)
+    for cache_kwargs in [{"no_cache": True}, {}, {}]:
+        path = str(tmp_path / "confusion_counts.npz")
+        main(
+            predictions_dir=GOLD_DIR,
+            gold_dir=GOLD_DIR,
+            mode=mode,
+            verbose=False,
+            show_progress=False,
+            cache_dir=str(tmp_path / "cache"),
+            confusion_counts_file=path,
+            **cache_kwargs,
+        )
+        arrays = dict(np.load(path))
+        assert list(arrays) == list(expected)
+        for name, array in expected.items():
+            np.testing.assert_array_equal(arrays[name], array)
+
+
+def test_get_result_cache_version(monkeypatch):
+    paths = []
+
+    def get_source_version(source_paths):
+        paths.extend(source_paths)
+        return "version"
+
+    monkeypatch.setattr(eval_official, "get_source_version", get_source_version)
+    eval_official.get_result_cache(cache_dir="cache", mode="all")
+    # the modules that read the nodesets and extract the relations are part of the version
+    assert {os.path.basename(path) for path in paths} == {
+        "eval_official.py",
+        "prf_metrics.py",
+        "nodeset_utils.py",
+        "json_utils.py",
+        "nodeset_pack.py",
+    }
+
+
+@pytest.mark.parametrize("mode", ["arguments", "illocutions"])
+def test_get_disagreements(mode):
+    for nodeset_id in sorted(get_nodeset_ids_from_directory(GOLD_DIR)):
+        gold = get_gold_relations(read_nodeset(GOLD_DIR, nodeset_id), mode=mode)
+        preds = perturb_nodeset(read_nodeset(GOLD_DIR, nodeset_id))
+        pred_pair2label = get_predicted_pair2label(preds, gold)
+        none_label = 3 if mode == "arguments" else "None"
+        expected = set()
+        for pair in get_candidate_pairs(gold):
+            true_label = gold["pair2label"].get(pair, none_label)
+            pred_label = pred_pair2label.get(pair, none_label)
+            if true_label != pred_label:
+                expected.add((pair[0], pair[1], true_label, pred_label))
+
+        disagreements = get_disagreements(gold, pred_pair2label)
+        assert len(disagreements) == len(expected)
+        assert set(disagreements) == expected
+
+
+def test_main_with_disagreements(tmp_path, capsys):
+    predictions_dir = os.path.join(tmp_path, "predictions")
+    os.makedirs(predictions_dir)
+    nodeset_id = sorted(get_nodeset_ids_from_directory(GOLD_DIR))[0]
+    with open(os.path.join(predictions_dir, f"nodeset{nodeset_id}.json"), "w") as f:
+        json.dump(perturb_nodeset(read_nodeset(GOLD_DIR, nodeset_id)), f)
+
+    disagreements_file = os.path.join(tmp_path, "disagreements.jsonl.gz")
+    main(
+        predictions_dir=predictions_dir,
+        gold_dir=GOLD_DIR,
+        mode="all",
+        verbose=True,
+        show_progress=False,
+        disagreements_file=disagreements_file,
+    )
+    output = capsys.readouterr().out
+    # the labels of all candidate pairs are not shown
+    assert "None, 'None'" not in output
+    assert "3, 3" not in output
+
+    with gzip.open(disagreements_file, "rt") as f:
+        records = [json.loads(line) for line in f]
+    assert [(record["nodeset_id"], record["mode"]) for record in records] == [
+        (nodeset_id, "arguments"),
+        (nodeset_id, "illocutions"),
+    ]
+    assert len(records[0]["disagreements"]) == 9
+    assert records[0]["disagreements"][0] == {
+        "src": "43_163907070207948843",
+        "trg": "49_163907070207948843",
+        "gold": "RA",
+        "pred": "None",
+    }
+    assert len(records[1]["disagreements"]) == 10
+
+
+def test_disagreement_writer_buffer(tmp_path):
+    path = os.path.join(tmp_path, "disagreements.jsonl.gz")
+    with DisagreementWriter(path, buffer_size=2) as writer:
+        for idx in range(5):
+            writer.write(f"nodeset{idx}", "illocutions", [("a", "b", "Asserting", "None")])
+    with gzip.open(path, "rt") as f:
+        records = [json.loads(line) for line in f]
+    assert [record["nodeset_id"] for record in records] == [f"nodeset{idx}" for idx in range(5)]
+    assert records[0]["disagreements"] == [
+        {"src": "a", "trg": "b", "gold": "Asserting", "pred": "None"}
+    ]
@@ -0,0 +1,141 @@
+import csv
+import json
+import os
+import shutil
+
+import pytest
+
+import evaluate
+
+GOLD_DIR = "data/evaluation_data"
+# the smallest nodesets, to keep the test fast
+FILE_NAMES = ["test_map10.json", "test_map3.json", "test_map7.json"]
+
+
+@pytest.fixture
+def nodeset_dirs(tmp_path):
+    gold_dir = tmp_path / "gold"
+    predicted_dir = tmp_path / "predicted"
+    gold_dir.mkdir()
+    predicted_dir.mkdir()
+    for file_name in FILE_NAMES:
+        shutil.copy(os.path.join(GOLD_DIR, file_name), gold_dir / file_name)
+        shutil.copy(os.path.join(GOLD_DIR, file_name), predicted_dir / file_name)
+    # a broken prediction
+    (predicted_dir / "test_map_broken.json").write_text(json.dumps({"nodes": []}))
+    shutil.copy(os.path.join(GOLD_DIR, FILE_NAMES[0]), gold_dir / "test_map_broken.json")
+    return str(predicted_dir), str(gold_dir)
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_evaluate_nodesets(nodeset_dirs, num_workers):
+    predicted_dir, gold_dir = nodeset_dirs
+    file_names = FILE_NAMES[:2] + ["test_map_broken.json"]
+    tasks = [
+        (file_name, os.path.join(predicted_dir, file_name), os.path.join(gold_dir, file_name))
+        for file_name in file_names
+    ]
+    results = list(
+        evaluate.evaluate_nodesets(
+            tasks,
+            num_workers=num_workers,
+            ignore_text_annotations=False,
+            ignore_timestamp_casting=True,
+        )
+    )
+    # the results are in the order of the tasks
+    assert [nodeset_id for nodeset_id, _ in results] == file_names
+    for _, result in results[:2]:
+        assert list(result) == evaluate.METRIC_NAMES
+        assert result["CASS"] == pytest.approx(1.0)
+    # the broken nodeset does not abort the evaluation
+    assert isinstance(results[2][1], Exception)
+
+
+@pytest.mark.parametrize("file_format", ["csv", "jsonl"])
+def test_run_evaluation(nodeset_dirs, tmp_path, capsys, file_format):
+    predicted_dir, gold_dir = nodeset_dirs
+    outputs = {}
+    for num_workers in [0, 2]:
+        nodeset_metrics_path = str(tmp_path / f"metrics_{num_workers}.{file_format}")
+        evaluate.run_evaluation(
+            predicted_dir,
+            gold_dir,
+            ignore_text_annotations=False,
+            ignore_timestamp_casting=True,
+            no_cache=True,
+            num_workers=num_workers,
+            nodeset_metrics_path=nodeset_metrics_path,
+        )
+        with open(nodeset_metrics_path) as f:
+            if file_format == "csv":
+                records = list(csv.DictReader(f))
+            else:
+                records = [json.loads(line) for line in f]
+        outputs[num_workers] = capsys.readouterr().out, records
+
+    # the same results with and without multiprocessing
+    assert outputs[0] == outputs[2]
+    printed, records = outputs[0]
+    # the average metrics are calculated without the broken nodeset
+    assert "CASS 1.0" in printed.splitlines()
+
+    id2record = {record["nodeset_id"]: record for record in records}
+    assert set(id2record) == {"test_map10", "test_map3", "test_map7", "test_map_broken"}
+    assert id2record["test_map_broken"]["error"]
+    for nodeset_id in ["test_map10", "test_map3", "test_map7"]:
+        assert float(id2record[nodeset_id]["CASS"]) == pytest.approx(1.0)
+        assert not id2record[nodeset_id].get("error")
+
+
+def test_run_evaluation_cache_similarity_backend(nodeset_dirs, tmp_path, monkeypatch):
+    predicted_dir, gold_dir = nodeset_dirs
+    cache_dir = str(tmp_path / "cache")
+
+    def run_evaluation():
+        evaluate.run_evaluation(
+            predicted_dir,
+            gold_dir,
+            ignore_text_annotations=False,
+            ignore_timestamp_casting=True,
+            cache_dir=cache_dir,
+        )
+        return sum(len(files) for _, _, files in os.walk(cache_dir))
+
+    # the broken nodeset is not cached
+    assert run_evaluation() == len(FILE_NAMES)
+    assert run_evaluation() == len(FILE_NAMES)
+
+    # the similarity values depend on the installed packages, so the results are recomputed
+    for backend in ["python", "rapidfuzz"]:
+        monkeypatch.setattr(evaluate.matching, "get_default_similarity_backend", lambda: backend)
+        run_evaluation()
+    num_entries = run_evaluation()
+    assert num_entries == 2 * len(FILE_NAMES)
+    monkeypatch.setattr(
+        evaluate.matching, "FUZZ_USES_LEVENSHTEIN", not evaluate.matching.FUZZ_USES_LEVENSHTEIN
+    )
+    assert run_evaluation() == num_entries + len(FILE_NAMES)
+
+
+def test_get_result_cache_settings():
+    cache = evaluate.get_result_cache(
+        "cache", ignore_text_annotations=False, ignore_timestamp_casting=True
+    )
+    assert cache.settings["metrics_backend"] == "numpy"
+    assert cache.settings["similarity_backend"] == (
+        evaluate.matching.get_default_similarity_backend()
+    )
+    assert cache.settings["fuzz_uses_levenshtein"] == evaluate.matching.FUZZ_USES_LEVENSHTEIN
+    cache = evaluate.get_result_cache(
+        "cache",
+        ignore_text_annotations=False,
+        ignore_timestamp_casting=True,
+        metrics_backend="pycm",
+    )
+    assert cache.settings["metrics_backend"] == "pycm"
+
+
+def test_nodeset_metrics_writer_unknown_format(tmp_path):
+    with pytest.raises(ValueError, match="Unknown file format"):
+        evaluate.NodesetMetricsWriter(str(tmp_path / "metrics.txt"))
@@ -0,0 +1,57 @@
+import json
+import logging
+import os
+from datetime import datetime
+
+import load_map
+
+GOLD_DIR = "data/evaluation_data"
+
+
+def test_parse_json_fast():
+    with open(os.path.join(GOLD_DIR, "test_map1.json")) as f:
+        nodeset = json.load(f)
+    nodeset["nodes"][0]["timestamp"] = "2020-01-01 12:00:00"
+    graph = load_map.parse_json(nodeset, ignore_timestamp_casting=True)
+    graph_fast = load_map.parse_json(nodeset, ignore_timestamp_casting=True, fast=True)
+
+    assert graph_fast.node_ids == graph.node_ids
+    assert graph_fast.texts == graph.texts
+    assert graph_fast.type_codes.tolist() == graph.type_codes.tolist()
+    assert graph_fast.type_names == graph.type_names
+    assert graph_fast.succ_indices.tolist() == graph.succ_indices.tolist()
+    assert graph_fast.pred_indices.tolist() == graph.pred_indices.tolist()
+
+    node = nodeset["nodes"][0]
+    assert graph.attributes["timestamp"][0] == datetime(2020, 1, 1, 12)
+    # the timestamps are kept as they are, but can be parsed later
+    assert graph_fast.attributes["timestamp"][0] == node["timestamp"]
+    assert load_map.parse_timestamp(node["timestamp"], False) == graph.attributes["timestamp"][0]
+
+
+def test_parse_json_casting_failures(caplog):
+    nodeset = {
+        "nodes": [
+            {"nodeID": "1", "text": "a", "type": "L", "timestamp": "not a timestamp"},
+            {"nodeID": "x", "text": "b", "type": "YA", "timestamp": "2020-01-01 00:00:00"},
+            {"nodeID": "3", "text": "c", "type": "I", "scheme": "s", "schemeID": "y"},
+        ],
+        "edges": [{"fromID": "1", "toID": "x"}, {"fromID": "x", "toID": "3"}],
+        "locutions": [{"nodeID": "1"}],
+    }
+    with caplog.at_level(logging.WARNING):
+        graph = load_map.parse_json(nodeset, ignore_timestamp_casting=False)
+    assert graph.node_ids == [1, "x", 3]
+    assert graph.successors("x") == [3]
+    # a single warning for all failures
+    assert len(caplog.records) == 1
+    assert caplog.records[0].levelname == "WARNING"
+    assert caplog.records[0].message == (
+        "Failed casting: 2 x timestamp (e.g. 'not a timestamp'), 1 x nodeID (e.g. 'x'), "
+        "1 x schemeID (e.g. 'y')"
+    )
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING):
+        load_map.parse_json(nodeset, ignore_timestamp_casting=True, fast=True)
+    assert caplog.messages == ["Failed casting: 1 x nodeID (e.g. 'x')"]
@@ -0,0 +1,362 @@
+import json
+import os
+
+import matching
+import numpy as np
+import pytest
+import segeval
+from bs4 import BeautifulSoup
+from fuzzywuzzy import fuzz
+
+GOLD_DIR = "data/evaluation_data"
+
+
+@pytest.fixture(scope="module")
+def node_texts():
+    texts = []
+    for file_name in sorted(os.listdir(GOLD_DIR)):
+        with open(os.path.join(GOLD_DIR, file_name)) as f:
+            nodeset = json.load(f)
+        texts.extend(node["text"] for node in nodeset["nodes"] if node["type"] in ["I", "L"])
+    # add some edge cases: empty texts, duplicates and texts that differ only in case
+    return texts[:80] + ["", "", texts[0], texts[0].upper()]
+
+
+def loop_nodes_reference(texts1, texts2):
+    # the original implementation of matching.loop_nodes
+    matrix = np.zeros((len(texts1), len(texts2)))
+    for i1, text1 in enumerate(texts1):
+        for i2, text2 in enumerate(texts2):
+            matrix[i1][i2] = (fuzz.ratio(text1.lower(), text2.lower())) / 100
+    return matrix
+
+
+def test_get_similarity_matrix(node_texts):
+    texts1 = node_texts[:30] + node_texts[-4:]
+    texts2 = node_texts[20:]
+    expected = loop_nodes_reference(texts1, texts2)
+
+    result = matching.get_similarity_matrix(texts1, texts2)
+    assert result.shape == (len(texts1), len(texts2))
+    assert result.dtype == np.float64
+    np.testing.assert_array_equal(result, expected)
+
+    result_python = matching.get_similarity_matrix(texts1, texts2, backend="python")
+    np.testing.assert_array_equal(result_python, expected)
+
+
+def test_get_similarity_matrix_rapidfuzz(node_texts):
+    pytest.importorskip("rapidfuzz")
+    from rapidfuzz.distance import Indel
+
+    texts1 = node_texts[:30] + node_texts[-4:]
+    texts2 = node_texts[20:]
+    result = matching.get_similarity_matrix(texts1, texts2, backend="rapidfuzz")
+    if matching.FUZZ_USES_LEVENSHTEIN:
+        np.testing.assert_array_equal(result, loop_nodes_reference(texts1, texts2))
+    # this is how fuzz.ratio is computed if python-Levenshtein is installed
+    expected = np.array(
+        [
+            [
+                round(100 * Indel.normalized_similarity(t1.lower(), t2.lower())) / 100
+                for t2 in texts2
+            ]
+            for t1 in texts1
+        ]
+    )
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_get_similarity_matrix_empty():
+    assert matching.get_similarity_matrix([], ["a"]).shape == (0, 1)
+    assert matching.get_similarity_matrix(["a", "b"], []).shape == (2, 0)
+
+
+def test_get_similarity_matrix_unknown_backend():
+    with pytest.raises(ValueError, match="Unknown similarity backend: unknown"):
+        matching.get_similarity_matrix(["a"], ["b"], backend="unknown")
+
+
+def test_loop_nodes(node_texts):
+    g1_list = list(enumerate(node_texts[:40]))
+    g2_list = list(enumerate(node_texts[30:50]))
+    result = matching.loop_nodes(g1_list, g2_list)
+    np.testing.assert_array_equal(result, loop_nodes_reference(node_texts[:40], node_texts[30:50]))
+
+
+def select_max_vals_reference(matrix, smallest_value, g1_list, g2_list):
+    # the original implementation of matching.select_max_vals
+    counter = 0
+    lev_vals = []
+    lev_rels = []
+    index_list = list(range(len(g1_list)))
+    m_copy = matrix.copy()
+    while counter <= smallest_value - 1:
+        row_i, col_i = np.unravel_index(m_copy.argmax(), m_copy.shape)
+        m_copy[row_i] = 0
+        m_copy[:, col_i] = 0
+        lev_rels.append((g1_list[row_i], g2_list[col_i]))
+        lev_vals.append(matrix[row_i][col_i])
+        index_list.remove(row_i)
+        counter += 1
+    for vals in index_list:
+        lev_rels.append((g1_list[vals], (0, "")))
+        lev_vals.append(0)
+    return lev_rels, lev_vals
+
+
+@pytest.mark.parametrize("shape", [(1, 1), (5, 3), (20, 20), (40, 25)])
+def test_select_max_vals(shape):
+    rng = np.random.default_rng(42)
+    # few distinct (positive) values to have many ties
+    matrix = rng.integers(1, 5, size=shape) / 4
+    g1_list = [(i, f"text1 {i}") for i in range(shape[0])]
+    g2_list = [(i, f"text2 {i}") for i in range(shape[1])]
+
+    result = matching.select_max_vals(matrix, shape[1], g1_list, g2_list)
+    assert result == select_max_vals_reference(matrix, shape[1], g1_list, g2_list)
+
+
+def test_select_max_vals_with_zeros():
+    # the original implementation picked (0, 0) again when only zeros were left
+    matrix = np.array([[0.5, 0.0], [0.0, 0.0], [0.0, 0.0]])
+    g1_list = [(1, "a"), (2, "b"), (3, "c")]
+    g2_list = [(4, "a"), (5, "d")]
+    rels, vals = matching.select_max_vals(matrix, 2, g1_list, g2_list)
+    assert rels == [((1, "a"), (4, "a")), ((2, "b"), (5, "d")), ((3, "c"), (0, ""))]
+    assert vals == [0.5, 0.0, 0]
+
+
+def test_select_max_vals_optimal():
+    matrix = np.array([[0.9, 0.8], [0.7, 0.1], [0.2, 0.3]])
+    g1_list = [(1, "a"), (2, "b"), (3, "c")]
+    g2_list = [(4, "d"), (5, "e")]
+
+    rels, vals = matching.select_max_vals(matrix, 2, g1_list, g2_list)
+    assert rels == [((1, "a"), (4, "d")), ((3, "c"), (5, "e")), ((2, "b"), (0, ""))]
+    assert sum(vals) == pytest.approx(1.2)
+
+    rels, vals = matching.select_max_vals(matrix, 2, g1_list, g2_list, matching_method="optimal")
+    assert rels == [((1, "a"), (5, "e")), ((2, "b"), (4, "d")), ((3, "c"), (0, ""))]
+    assert sum(vals) == pytest.approx(1.5)
+
+    with pytest.raises(ValueError, match="Unknown matching method: unknown"):
+        matching.select_max_vals(matrix, 2, g1_list, g2_list, matching_method="unknown")
+
+
+def test_get_type2node_list():
+    import centrality
+    import load_map
+
+    with open(os.path.join(GOLD_DIR, "test_map1.json")) as f:
+        graph = load_map.parse_json(json.load(f), ignore_timestamp_casting=True)
+    type2nodes = centrality.get_type2node_list(graph)
+    assert type2nodes["I"] == centrality.get_i_node_list(graph)
+    assert type2nodes["L"] == centrality.get_l_node_list(graph)
+    assert set(type2nodes) == {"I", "L", "YA", "TA", "RA", "CA", "MA"}
+    for node_type, nodes in type2nodes.items():
+        assert nodes == centrality.get_type_node_list(graph, [node_type])
+
+
+def test_graph_anchors():
+    import load_map
+
+    with open(os.path.join(GOLD_DIR, "test_map1.json")) as f:
+        graph = load_map.parse_json(json.load(f), ignore_timestamp_casting=True)
+    anchors = matching.GraphAnchors(graph)
+
+    def first_of_type(neighbors, node_types):
+        return next((n for n in neighbors if graph.get_type(n) in node_types), None)
+
+    for node_id in graph.node_ids:
+        successors = graph.successors(node_id)
+        predecessors = graph.predecessors(node_id)
+        ya_succ = first_of_type(successors, ["YA"])
+        ya_pred = first_of_type(predecessors, ["YA"])
+        anchor = first_of_type(predecessors, ["L", "TA"])
+        tas = [n for n in successors if graph.get_type(n) == "TA"]
+        pred_types = [graph.get_type(n) for n in predecessors]
+
+        assert matching.get_ya_node_text_from_id(node_id, anchors, "test") == (
+            graph.get_text(ya_succ) if ya_succ is not None else ""
+        )
+        assert matching.get_ya_node_text_from_prop(node_id, anchors, "test") == (
+            graph.get_text(ya_pred) if ya_pred is not None else ""
+        )
+        assert matching.get_ya_node_from_prop_id(node_id, anchors, "test") == (
+            ya_pred if ya_pred is not None else -1
+        )
+        assert matching.get_node_anchor_text(node_id, anchors, "test") == (
+            graph.get_text(anchor) if anchor is not None else ""
+        )
+        assert matching.get_ta_nodes_from_id(node_id, anchors, "test") == tas
+        assert matching.count_ta_nodes(node_id, anchors, "test") == len(tas)
+        assert matching.count_s_nodes(node_id, anchors, "test") == (
+            pred_types.count("RA"),
+            pred_types.count("CA"),
+            pred_types.count("MA"),
+        )
+
+    # unknown nodes
+    assert matching.get_ya_node_text_from_id(-5, anchors, "test") == ""
+    assert matching.get_ya_node_from_prop_id(-5, anchors, "test") == -1
+    assert matching.get_ta_nodes_from_id(-5, anchors, "test") == []
+    assert matching.count_ta_nodes(-5, anchors, "test") == 0
+    assert matching.count_s_nodes(-5, anchors, "test") == (0, 0, 0)
+
+
+def test_graph_anchors_with_nodes_without_attributes():
+    from compact_graph import CompactGraph
+
+    graph = CompactGraph.from_nodes_and_edges(
+        nodes=[
+            (1, {"type": "L", "text": "a"}),
+            (2, {"type": "TA", "text": "Default Transition"}),
+            (3, {"type": "YA", "text": "Asserting"}),
+        ],
+        # node 4 has no attributes
+        edges=[(1, 2), (1, 4), (1, 3), (1, 2), (4, 3), (2, 3)],
+    )
+    anchors = matching.GraphAnchors(graph)
+    # the TA-node is found before the node without attributes, but the YA-node is not
+    assert matching.count_ta_nodes(1, anchors, "test") == 1
+    assert matching.get_ta_nodes_from_id(1, anchors, "test") == []
+    assert matching.get_ya_node_text_from_id(1, anchors, "test") == ""
+    assert matching.get_ya_node_text_from_id(2, anchors, "test") == "Asserting"
+    with pytest.raises(KeyError):
+        matching.count_s_nodes(3, anchors, "test")
+
+
+def test_ya_text_vocabulary():
+    texts = ["Asserting", "", "Questioning"]
+    vocabulary = matching.YATextVocabulary(texts)
+    # the empty text for missing annotations is appended
+    assert len(vocabulary) == 4
+    assert vocabulary.none_index == 3
+    # the same indices as with list.index, i.e. the first occurrence of the empty text
+    expected = texts + [""]
+    for text in expected:
+        assert text in vocabulary
+        assert vocabulary.index(text) == expected.index(text)
+    assert "Arguing" not in vocabulary
+    with pytest.raises(ValueError):
+        vocabulary.index("Arguing")
+    assert texts == ["Asserting", "", "Questioning"]
+
+
+SPAN_TEXT = (
+    'BOSTON, MA ... <span class="highlighted" id="634541">Steven L. Davis pled guilty yesterday '
+    "to federal charges that he stole and disclosed trade secrets of The Gillette Company</span>."
+)
+SPAN_TEXTS = [
+    SPAN_TEXT,
+    # the same text with another segmentation
+    'BOSTON, MA ... <span class="highlighted" id="1">Steven L. Davis pled guilty yesterday</span> '
+    '<span class="highlighted" id="2">to federal charges that he stole and disclosed trade '
+    "secrets of The Gillette Company</span>.",
+    # nested spans, empty spans, entities and apostrophes
+    "<span>It's <span>a</span> [test]</span><span></span> &amp; more &lt;text&gt;…",
+    # the div, p and br tags are removed
+    "<div><p>first</p><p><span>second   part</span><br/>third</p></div>",
+    "   leading whitespace<br>and a line break",
+    # non-breaking spaces are not dropped at the beginning (only ASCII whitespace is)
+    "&nbsp;<br/>Foo",
+    "&nbsp; <span>text</span> &#8195;<br>end",
+    "",
+    # unsupported markup, e.g. other tags, comments or unclosed tags
+    "<b>bold</b> <span>text</span>",
+    "<span>text</span><!-- comment --> more",
+    "<span>unclosed <span>span</span>",
+    "<p>paragraph<div>in a div</div></p>",
+    "a <x at the end",
+]
+
+
+def get_segments_and_words_reference(text):
+    # the original segmentation in matching.get_similarity
+    xml_soup = BeautifulSoup(matching.normalize_text(text), features="lxml")
+    return matching.get_segements(matching.remove_html_tags(xml_soup))
+
+
+@pytest.mark.parametrize("text", SPAN_TEXTS)
+def test_get_segments_and_words(text):
+    assert matching.get_segments_and_words(text) == get_segments_and_words_reference(text)
+
+
+def test_span_segmenter():
+    segmenter = matching.SpanSegmenter()
+    segmenter.feed(SPAN_TEXT)
+    segmenter.close()
+    assert segmenter.supported
+    assert segmenter.children == [
+        "BOSTON, MA ... ",
+        "Steven L. Davis pled guilty yesterday to federal charges that he stole and disclosed "
+        "trade secrets of The Gillette Company",
+        ".",
+    ]
+
+    segmenter = matching.SpanSegmenter()
+    segmenter.feed("<b>bold</b>")
+    segmenter.close()
+    assert not segmenter.supported
+
+
+def get_similarity_reference(text_1, text_2):
+    # the original implementation of matching.get_similarity (w/o the empty text check)
+    segments_1, words_1 = get_segments_and_words_reference(text_1)
+    segments_2, words_2 = get_segments_and_words_reference(text_2)
+    seg_check, seg1, seg2 = check_segment_length_reference(
+        segments_1, words_1, segments_2, words_2
+    )
+    if not seg_check:
+        raise Exception("Source text was different as segmentations differ in length.")
+    if seg1 == seg2:
+        return 1.0
+    masses_1 = segeval.convert_positions_to_masses(seg1)
+    masses_2 = segeval.convert_positions_to_masses(seg2)
+    return segeval.segmentation_similarity(masses_1, masses_2)
+
+
+def check_segment_length_reference(seg_1, word_1, seg_2, word_2):
+    # the original implementation of matching.check_segment_length
+    if len(seg_1) == len(seg_2):
+        return True, seg_1, seg_2
+    elif len(seg_1) > len(seg_2):
+        for i in range(len(word_1) - 1):
+            if word_1[i] + word_1[i + 1] in word_2:
+                word_1[i : i + 2] = [word_1[i] + word_1[i + 1]]
+                seg_1 = [seg_1[0]] * len(word_1)
+                if len(seg_1) == len(seg_2):
+                    return True, seg_1, seg_2
+        return False, None, None
+    else:
+        for i in range(len(word_2) - 1):
+            if word_2[i] + word_2[i + 1] in word_1:
+                word_2[i : i + 2] = [word_2[i] + word_2[i + 1]]
+                seg_2 = [seg_2[0]] * len(word_2)
+                if len(seg_1) == len(seg_2):
+                    return True, seg_1, seg_2
+        return False, None, None
+
+
+@pytest.mark.parametrize(
+    "text_1, text_2",
+    [
+        (SPAN_TEXT, SPAN_TEXT),
+        (SPAN_TEXT, SPAN_TEXTS[1]),
+        (SPAN_TEXTS[1], "<p>" + SPAN_TEXT + "</p>"),
+        # the words are merged until both texts have the same number of words
+        ("<span>some text</span> to segment", "<span>sometext</span> to segment"),
+        ("<span>some</span> text to segment", "<span>sometext</span> <b>to</b> segment"),
+    ],
+)
+def test_get_similarity(text_1, text_2):
+    for text_a, text_b in [(text_1, text_2), (text_2, text_1)]:
+        assert matching.get_similarity(text_a, text_b) == get_similarity_reference(text_a, text_b)
+
+
+def test_get_similarity_different_texts():
+    with pytest.raises(Exception, match="segmentations differ in length"):
+        matching.get_similarity(SPAN_TEXT, "<span>another text</span>")
+    with pytest.raises(Exception, match="Text Input Is Empty"):
+        matching.get_similarity(SPAN_TEXT, "")
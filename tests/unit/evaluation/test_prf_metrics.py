@@ -0,0 +1,95 @@
+import random
+import warnings
+
+import numpy as np
+import pytest
+from sklearn.metrics import confusion_matrix as sklearn_confusion_matrix
+from sklearn.metrics import precision_recall_fscore_support
+
+from src.evaluation.prf_metrics import (
+    batched_macro_precision_recall_fscore,
+    confusion_matrix,
+    encode_labels,
+    macro_precision_recall_fscore,
+    precision_recall_fscore,
+)
+
+LABEL_SETS = {
+    "int": [0, 1, 2, 3],
+    "str": ["Asserting", "Arguing", "None", "Pure Questioning", "Restating"],
+}
+
+
+def random_labels(seed: int, labels: list):
+    """Create random gold and predicted labels. Some labels are sampled more often than others
+    and both sequences may use only a subset of the labels."""
+    rng = random.Random(seed)
+    length = rng.randint(1, 60)
+    true_labels = rng.sample(labels, rng.randint(1, len(labels)))
+    pred_labels = rng.sample(labels, rng.randint(1, len(labels)))
+    true_weights = [rng.random() for _ in true_labels]
+    pred_weights = [rng.random() for _ in pred_labels]
+    y_true = rng.choices(true_labels, weights=true_weights, k=length)
+    y_pred = rng.choices(pred_labels, weights=pred_weights, k=length)
+    # make some of the predictions correct
+    for idx in range(length):
+        if rng.random() < 0.5:
+            y_pred[idx] = y_true[idx]
+    return y_true, y_pred
+
+
+@pytest.mark.parametrize("label_type", sorted(LABEL_SETS))
+@pytest.mark.parametrize("zero_division", [0.0, 1.0, "warn"])
+@pytest.mark.parametrize("seed", range(50))
+def test_precision_recall_fscore(seed, zero_division, label_type):
+    y_true, y_pred = random_labels(seed, LABEL_SETS[label_type])
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        expected = precision_recall_fscore_support(
+            y_true, y_pred, average="macro", zero_division=zero_division
+        )[:3]
+    result = precision_recall_fscore(y_true, y_pred, zero_division=zero_division)
+    assert result == pytest.approx(expected, abs=1e-12)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_confusion_matrix(seed):
+    y_true, y_pred = random_labels(seed, LABEL_SETS["str"])
+
+    labels, true_idx, pred_idx = encode_labels(y_true, y_pred)
+    assert labels == sorted(set(y_true) | set(y_pred))
+    assert [labels[idx] for idx in true_idx] == y_true
+    assert [labels[idx] for idx in pred_idx] == y_pred
+
+    result = confusion_matrix(true_idx, pred_idx, num_labels=len(labels))
+    expected = sklearn_confusion_matrix(y_true, y_pred, labels=labels)
+    np.testing.assert_array_equal(result, expected)
+
+
+def test_encode_labels_length_mismatch():
+    with pytest.raises(ValueError) as excinfo:
+        encode_labels([0, 1], [0])
+    assert str(excinfo.value) == "y_true and y_pred need to have the same length, but got 2 and 1"
+
+
+@pytest.mark.parametrize("zero_division", [0.0, 1.0])
+def test_batched_macro_precision_recall_fscore(zero_division):
+    labels = LABEL_SETS["str"]
+    confusion_matrices = []
+    for seed in range(20):
+        y_true, y_pred = random_labels(seed, labels)
+        true_idx = np.array([labels.index(label) for label in y_true])
+        pred_idx = np.array([labels.index(label) for label in y_pred])
+        confusion_matrices.append(confusion_matrix(true_idx, pred_idx, num_labels=len(labels)))
+    # an empty confusion matrix results in NaN
+    confusion_matrices.append(np.zeros((len(labels), len(labels)), dtype=np.int64))
+
+    result = batched_macro_precision_recall_fscore(
+        np.stack(confusion_matrices), zero_division=zero_division
+    )
+    assert result.shape == (len(confusion_matrices), 3)
+    for matrix, scores in zip(confusion_matrices[:-1], result):
+        expected = macro_precision_recall_fscore(matrix, zero_division=zero_division)
+        assert scores.tolist() == pytest.approx(expected, abs=1e-12)
+    assert np.isnan(result[-1]).all()
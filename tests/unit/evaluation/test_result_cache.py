@@ -0,0 +1,51 @@
+import os
+
+from src.evaluation.result_cache import ResultCache
+
+
+def write(path: str, content: str) -> str:
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+def test_result_cache(tmp_path):
+    predicted_file = write(os.path.join(tmp_path, "predicted.json"), '{"nodes": []}')
+    gold_file = write(os.path.join(tmp_path, "gold.json"), '{"nodes": [], "edges": []}')
+    cache_dir = os.path.join(tmp_path, "cache")
+
+    cache = ResultCache(cache_dir=cache_dir, version="1", settings={"mode": "arguments"})
+    key = cache.get_key(predicted_file, gold_file)
+    assert cache.get(key) is None
+    cache.set(key, {"general": {"f1": 0.5}})
+    assert cache.get(key) == {"general": {"f1": 0.5}}
+    assert cache.get_stats() == {"hits": 1, "misses": 1, "writes": 1}
+
+    # the entry is persisted on disk
+    cache = ResultCache(cache_dir=cache_dir, version="1", settings={"mode": "arguments"})
+    assert cache.get(cache.get_key(predicted_file, gold_file)) == {"general": {"f1": 0.5}}
+
+    # the key changes if any of the inputs changes
+    other_keys = [
+        ResultCache(cache_dir, version="2", settings={"mode": "arguments"}).get_key(
+            predicted_file, gold_file
+        ),
+        ResultCache(cache_dir, version="1", settings={"mode": "illocutions"}).get_key(
+            predicted_file, gold_file
+        ),
+        cache.get_key(gold_file, predicted_file),
+    ]
+    write(predicted_file, '{"nodes": [], "edges": []}')
+    other_keys.append(cache.get_key(predicted_file, gold_file))
+    assert len(set(other_keys + [key])) == len(other_keys) + 1
+
+
+def test_result_cache_corrupted_entry(tmp_path, caplog):
+    predicted_file = write(os.path.join(tmp_path, "predicted.json"), "{}")
+    cache = ResultCache(cache_dir=os.path.join(tmp_path, "cache"), version="1", settings={})
+    key = cache.get_key(predicted_file, predicted_file)
+    cache.set(key, {"f1": 1.0})
+    write(cache._get_path(key), '{"f1": ')
+
+    assert cache.get(key) is None
+    assert "Could not read cache entry" in caplog.text
@@ -0,0 +1,135 @@
+import os
+import shutil
+
+import pytest
+
+from src.evaluation import results_db
+from src.evaluation.eval_official import evaluate_runs, main
+from src.evaluation.results_db import ResultsDatabase
+from src.utils.nodeset_utils import get_nodeset_ids_from_directory
+
+GOLD_DIR = "data/evaluation_data"
+
+
+def test_results_database(tmp_path):
+    path = os.path.join(tmp_path, "results.sqlite")
+    with ResultsDatabase(path, batch_size=3) as database:
+        run_id = database.add_run("run1", evaluator="test", settings={"mode": "arguments"})
+        database.add_scores(run_id, "a", "arguments", {"general.f1": 0.5, "focused.f1": 0.0})
+        database.add_scores(run_id, "b", "arguments", {"general.f1": 1.0, "focused.f1": 1.0})
+        database.add_scores(
+            run_id, "c", "arguments", {"general.f1": 0.0, "focused.f1": float("nan")}
+        )
+        database.add_confusion_counts(
+            run_id, "a", "arguments", {("RA", "RA"): 1, ("None", "RA"): 1}
+        )
+        database.add_confusion_counts(
+            run_id, "b", "arguments", {("RA", "None"): 1, ("None", "None"): 2}
+        )
+
+    with ResultsDatabase(path) as database:
+        assert database.get_mean_scores("run1") == {
+            ("arguments", "general.f1"): (0.5, 3),
+            # NaN values are ignored
+            ("arguments", "focused.f1"): (0.5, 2),
+        }
+        assert database.get_mean_scores("run1", nodeset_blacklist=["b"]) == {
+            ("arguments", "general.f1"): (0.25, 2),
+            ("arguments", "focused.f1"): (0.0, 1),
+        }
+        assert database.get_mean_scores("run1", nodeset_whitelist=["b"], mode="illocutions") == {}
+
+        # confusion matrix (rows: gold, columns: predicted) with labels [None, RA]: [[2, 1], [1, 1]]
+        assert database.get_micro_scores("run1") == pytest.approx(
+            {
+                ("arguments", "general.p"): (2 / 3 + 1 / 2) / 2,
+                ("arguments", "general.r"): (2 / 3 + 1 / 2) / 2,
+                ("arguments", "general.f1"): (2 / 3 + 1 / 2) / 2,
+                # the "None" row is ignored: [[0, 0], [1, 1]]
+                ("arguments", "focused.p"): (0.0 + 1.0) / 2,
+                ("arguments", "focused.r"): (0.0 + 1 / 2) / 2,
+                ("arguments", "focused.f1"): (0.0 + 2 / 3) / 2,
+            }
+        )
+
+        # adding a run with the same name replaces it
+        database.add_run("run1", evaluator="test", settings={})
+        assert database.get_runs()[0]["nodesets"] == 0
+        assert database.get_mean_scores("run1") == {}
+        with pytest.raises(ValueError) as excinfo:
+            database.get_mean_scores("unknown")
+        assert str(excinfo.value) == "Unknown run: unknown"
+
+
+def test_main_with_results_db(tmp_path):
+    path = os.path.join(tmp_path, "results.sqlite")
+    main(
+        predictions_dir=GOLD_DIR,
+        gold_dir=GOLD_DIR,
+        mode="all",
+        verbose=False,
+        show_progress=False,
+        no_cache=True,
+        results_db=path,
+        run_name="gold",
+    )
+    expected = evaluate_runs([GOLD_DIR], gold_dir=GOLD_DIR, mode="all", show_progress=False)[0]
+    num_nodesets = len(get_nodeset_ids_from_directory(GOLD_DIR))
+
+    with ResultsDatabase(path) as database:
+        assert [run["name"] for run in database.get_runs()] == ["gold"]
+        mean_scores = database.get_mean_scores("gold")
+        assert {f"{mode}.{metric}": value for (mode, metric), value in mean_scores.items()} == {
+            stat_name: (pytest.approx(sum(values) / len(values)), len(values))
+            for stat_name, values in expected.items()
+        }
+        assert all(count == num_nodesets for _, count in mean_scores.values())
+        micro_scores = database.get_micro_scores("gold")
+        assert len(micro_scores) == 12
+        assert all(value == 1.0 for value in micro_scores.values())
+
+
+def test_main_multi_run_with_results_db(tmp_path):
+    path = os.path.join(tmp_path, "results.sqlite")
+    kwargs = dict(gold_dir=GOLD_DIR, mode="all", verbose=False, show_progress=False)
+    main(predictions_dir=GOLD_DIR, no_cache=True, results_db=path, run_name="single", **kwargs)
+    other_dir = str(tmp_path / "other")
+    shutil.copytree(GOLD_DIR, other_dir)
+    main(predictions_dir=[GOLD_DIR, other_dir], results_db=path, **kwargs)
+
+    # one run per predictions directory with the same results as a single run
+    with ResultsDatabase(path) as database:
+        assert [run["name"] for run in database.get_runs()] == ["single", GOLD_DIR, other_dir]
+        expected_mean_scores = database.get_mean_scores("single")
+        expected_micro_scores = database.get_micro_scores("single")
+        for run_name in [GOLD_DIR, other_dir]:
+            mean_scores = database.get_mean_scores(run_name)
+            assert list(mean_scores) == list(expected_mean_scores)
+            for key, (value, count) in mean_scores.items():
+                assert value == pytest.approx(expected_mean_scores[key][0])
+                assert count == expected_mean_scores[key][1]
+            assert database.get_micro_scores(run_name) == pytest.approx(expected_micro_scores)
+
+    with pytest.raises(ValueError, match="run_name can not be used when evaluating multiple runs"):
+        main(predictions_dir=[GOLD_DIR, other_dir], results_db=path, run_name="runs", **kwargs)
+
+
+def test_results_db_main_without_run(tmp_path, capsys):
+    path = os.path.join(tmp_path, "results.sqlite")
+    with ResultsDatabase(path) as database:
+        for name, value in [("run1", 0.5), ("run2", 1.0)]:
+            run_id = database.add_run(name, evaluator="test", settings={})
+            database.add_scores(run_id, "a", "arguments", {"general.f1": value})
+
+    # all runs are used if no run is selected
+    results_db.main(db=path, command="mean", mode="arguments")
+    assert capsys.readouterr().out.splitlines() == [
+        "run: run1",
+        "arguments.general.f1: 0.5 (nodesets: 1)",
+        "run: run2",
+        "arguments.general.f1: 1.0 (nodesets: 1)",
+    ]
+    results_db.main(db=path, command="micro")
+    assert capsys.readouterr().out.splitlines() == ["run: run1", "run: run2"]
+    results_db.main(db=path, command="compare")
+    assert capsys.readouterr().out.splitlines()[1:] == ["arguments.general.f1\t0.5\t1.0\t0.5"]
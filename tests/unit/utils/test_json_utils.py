@@ -0,0 +1,131 @@
+import glob
+import json
+import math
+
+import pytest
+
+from src.utils import json_utils
+from src.utils.json_utils import (
+    dumps,
+    dumps_bytes,
+    dumps_lines,
+    get_available_json_backends,
+    get_json_backend,
+    loads,
+    read_json,
+    read_json_lines,
+    set_json_backend,
+    write_json,
+)
+from src.utils.nodeset_utils import read_nodeset, write_nodeset
+
+FILE_NAMES = sorted(
+    glob.glob("data/evaluation_data/*.json")
+    + glob.glob("tests/fixtures/dataset_builders/pie/dialam2024/*/*.json")
+)
+
+
+@pytest.fixture(params=get_available_json_backends())
+def backend(request):
+    previous_backend = get_json_backend()
+    set_json_backend(request.param)
+    yield request.param
+    set_json_backend(previous_backend)
+
+
+def test_get_available_json_backends():
+    backends = get_available_json_backends()
+    assert backends[-1] == "json"
+    assert get_json_backend() == backends[0]
+
+
+def test_set_json_backend():
+    with pytest.raises(ValueError, match="Unknown JSON backend: unknown"):
+        set_json_backend("unknown")
+    if "ujson" not in get_available_json_backends():
+        with pytest.raises(ValueError, match="The JSON backend ujson is not installed"):
+            set_json_backend("ujson")
+
+
+def test_read_and_write_json(backend, tmp_path):
+    assert len(FILE_NAMES) > 10
+    for file_name in FILE_NAMES:
+        with open(file_name) as f:
+            expected = json.load(f)
+        data = read_json(file_name)
+        # the same content and key order
+        assert json.dumps(data) == json.dumps(expected)
+
+        for kwargs in [{}, {"indent": 2}, {"compact": True}, {"sort_keys": True}]:
+            assert loads(dumps(data, **kwargs)) == expected
+            assert loads(dumps_bytes(data, **kwargs)) == expected
+            path = str(tmp_path / "data.json")
+            write_json(path, data, **{k: v for k, v in kwargs.items() if k != "sort_keys"})
+            assert json.dumps(read_json(path)) == json.dumps(expected)
+
+        # the formatting of the standard library (the fast backends do not escape non-ASCII chars)
+        if backend != "ujson":
+            ensure_ascii = backend == "json"
+            assert dumps(data, indent=2) == json.dumps(
+                expected, indent=2, ensure_ascii=ensure_ascii
+            )
+            assert dumps(data, compact=True) == json.dumps(
+                expected, separators=(",", ":"), ensure_ascii=ensure_ascii
+            )
+
+
+def test_json_lines(backend, tmp_path):
+    objects = [{"a": 1, "b": ["ä", None]}, [], "text"]
+    path = str(tmp_path / "data.jsonl")
+    with open(path, "wb") as f:
+        f.write(dumps_lines(objects))
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == objects
+    assert read_json_lines(path) == objects
+    assert read_json_lines(path, func=str) == [str(obj) for obj in objects]
+
+
+def test_fallback_to_stdlib(backend):
+    # values that are not supported by all backends
+    assert math.isnan(loads("NaN"))
+    assert loads('"\\ud800"') == "\ud800"
+    assert loads(dumps("\ud800")) == "\ud800"
+    assert loads(dumps({1: 2, None: 3})) == {"1": 2, "null": 3}
+    assert loads(dumps(2**70)) == 2**70
+    # arguments that are only supported by the standard library
+    assert dumps({"a": "ä"}, ensure_ascii=True) == json.dumps({"a": "ä"})
+    assert dumps({"a": 1}, indent=4) == json.dumps({"a": 1}, indent=4)
+    with pytest.raises(TypeError):
+        dumps({"a": object()})
+    with pytest.raises(json.JSONDecodeError):
+        loads("{")
+    with pytest.raises(ValueError, match="compact can not be combined with indent"):
+        dumps({}, indent=2, compact=True)
+
+
+@pytest.mark.skipif(json_utils.orjson is None, reason="orjson is not installed")
+def test_dumps_sort_keys():
+    set_json_backend("orjson")
+    try:
+        assert (
+            dumps({"b": 1, "a": {"d": 2, "c": 3}}, sort_keys=True) == '{"a":{"c":3,"d":2},"b":1}'
+        )
+    finally:
+        set_json_backend()
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_write_nodeset(tmp_path, compact):
+    nodeset = read_nodeset("data/evaluation_data", "test_map1")
+    write_nodeset(str(tmp_path), "test_map1", nodeset, compact=compact)
+    path = tmp_path / "nodesettest_map1.json"
+    assert read_nodeset(str(tmp_path), "test_map1") == nodeset
+    assert ("\n" in path.read_text()) != compact
+
+
+def test_benchmark():
+    result = json_utils.benchmark(FILE_NAMES[:2], repeat=1)
+    assert list(result) == get_available_json_backends()
+    for times in result.values():
+        assert list(times) == ["parse", "serialize (indent=2)", "serialize (compact)"]
+        assert all(time > 0 for time in times.values())
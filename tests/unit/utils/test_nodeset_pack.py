@@ -0,0 +1,153 @@
+import copy
+import json
+import os
+
+import pytest
+
+from src.utils.nodeset_pack import (
+    NodesetPack,
+    NodesetPackWriter,
+    is_nodeset_pack,
+    open_nodeset_pack,
+    write_nodeset_pack,
+)
+from src.utils.nodeset_utils import (
+    get_nodeset_ids_from_directory,
+    get_relation_statistics,
+    process_all_nodesets,
+    read_nodeset,
+)
+
+NODESET_DIR = "data/evaluation_data"
+
+
+@pytest.fixture(scope="module")
+def nodesets():
+    nodeset_ids = sorted(get_nodeset_ids_from_directory(NODESET_DIR))
+    return {nodeset_id: read_nodeset(NODESET_DIR, nodeset_id) for nodeset_id in nodeset_ids}
+
+
+@pytest.fixture
+def pack_path(tmp_path, nodesets):
+    path = str(tmp_path / "nodesets.nodesetpack")
+    write_nodeset_pack(path, nodesets.items())
+    return path
+
+
+def test_nodeset_pack(pack_path, nodesets):
+    assert is_nodeset_pack(pack_path)
+    assert not is_nodeset_pack(NODESET_DIR)
+    assert not is_nodeset_pack(os.path.join(NODESET_DIR, "test_map1.json"))
+
+    with NodesetPack(pack_path) as pack:
+        assert len(pack) == len(nodesets)
+        assert list(pack) == list(nodesets)
+        assert "test_map1" in pack
+        assert "unknown" not in pack
+        for nodeset_id, nodeset in pack.items():
+            # the same content and key order as the JSON file
+            assert json.dumps(nodeset) == json.dumps(nodesets[nodeset_id])
+        with pytest.raises(KeyError, match="nodeset=unknown"):
+            pack["unknown"]
+
+
+def test_nodeset_pack_layouts_and_raw(tmp_path):
+    nodesets = {
+        # nodes and edges with different keys (and key orders)
+        "layouts": {
+            "locutions": [{"nodeID": "1", "personID": 0}],
+            "nodes": [
+                {"nodeID": "1", "text": "Bob : I think so", "type": "L", "timestamp": "x"},
+                {"type": "I", "nodeID": "2", "text": "so \ud800 ä", "scheme": None},
+                {"nodeID": "3", "type": "YA"},
+                {"nodeID": "4", "text": "", "type": "L", "timestamp": "y"},
+            ],
+            "edges": [
+                {"edgeID": 0, "fromID": "1", "toID": "3"},
+                {"toID": "2", "fromID": "3"},
+                {"edgeID": 2, "fromID": "4", "toID": "3", "formEdgeID": None},
+            ],
+            "extra": {"a": [1, 2.5]},
+        },
+        "empty": {"nodes": [], "edges": []},
+        # nodesets that are stored as JSON strings
+        "unknown_edge_node": {"nodes": [{"nodeID": "1"}], "edges": [{"fromID": "1", "toID": "2"}]},
+        "int_node_id": {"nodes": [{"nodeID": 1}], "edges": []},
+        "duplicated_node_id": {"nodes": [{"nodeID": "1"}, {"nodeID": "1"}], "edges": []},
+        "no_dict": ["nodes"],
+    }
+    path = str(tmp_path / "nodesets.nodesetpack")
+    writer = write_nodeset_pack(path, nodesets.items())
+    assert writer.num_raw == 4
+
+    with NodesetPack(path) as pack:
+        for nodeset_id, nodeset in nodesets.items():
+            assert json.dumps(pack[nodeset_id]) == json.dumps(nodeset)
+
+    with pytest.raises(ValueError, match="nodeset=empty: The nodeset is already in the pack"):
+        with NodesetPackWriter(str(tmp_path / "duplicated.nodesetpack")) as writer:
+            writer.add("empty", nodesets["empty"])
+            writer.add("empty", nodesets["empty"])
+
+
+def test_get_nodeset_hash(tmp_path, pack_path, nodesets):
+    with NodesetPack(pack_path) as pack:
+        hashes = {nodeset_id: pack.get_nodeset_hash(nodeset_id) for nodeset_id in pack}
+        with pytest.raises(KeyError, match="nodeset=unknown"):
+            pack.get_nodeset_hash("unknown")
+    assert len(set(hashes.values())) == len(nodesets)
+
+    # the hash depends only on the nodeset, not on its position or the other nodesets
+    path = str(tmp_path / "single.nodesetpack")
+    nodeset = nodesets["test_map1"]
+    write_nodeset_pack(path, [("other", {"nodes": [], "edges": []}), ("test_map1", nodeset)])
+    with NodesetPack(path) as pack:
+        assert pack.get_nodeset_hash("test_map1") == hashes["test_map1"]
+
+    changed = copy.deepcopy(nodeset)
+    changed["nodes"][0]["text"] += " changed"
+    write_nodeset_pack(path, [("test_map1", changed)])
+    with NodesetPack(path) as pack:
+        assert pack.get_nodeset_hash("test_map1") != hashes["test_map1"]
+
+
+def test_open_nodeset_pack(tmp_path, nodesets):
+    path = str(tmp_path / "nodesets.nodesetpack")
+    write_nodeset_pack(path, [("test_map1", nodesets["test_map1"])])
+    pack = open_nodeset_pack(path)
+    assert open_nodeset_pack(path) is pack
+    assert list(pack) == ["test_map1"]
+
+    # the pack is opened again if the file was modified
+    write_nodeset_pack(path, [("test_map1", nodesets["test_map1"]), ("empty", {})])
+    pack = open_nodeset_pack(path)
+    assert list(pack) == ["test_map1", "empty"]
+    assert pack["empty"] == {}
+
+
+def test_read_nodeset_from_pack(pack_path, nodesets):
+    assert get_nodeset_ids_from_directory(pack_path) == list(nodesets)
+    assert read_nodeset(pack_path, "test_map1") == nodesets["test_map1"]
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_process_all_nodesets_from_pack(pack_path, num_workers):
+    expected = dict(
+        process_all_nodesets(
+            nodeset_dir=NODESET_DIR,
+            func=get_relation_statistics,
+            show_progress=False,
+            nodeset_whitelist=sorted(get_nodeset_ids_from_directory(NODESET_DIR)),
+        )
+    )
+    results = dict(
+        process_all_nodesets(
+            nodeset_dir=pack_path,
+            func=get_relation_statistics,
+            show_progress=False,
+            nodeset_whitelist=list(expected) + ["unknown"],
+            num_workers=num_workers,
+        )
+    )
+    assert isinstance(results.pop("unknown"), KeyError)
+    assert results == expected
@@ -0,0 +1,292 @@
+import random
+from collections import defaultdict
+
+import pytest
+
+from src.utils.nodeset_utils import (
+    COMPOSITE_RELATION_TYPES,
+    RELATION_TYPE_SPECS,
+    Nodeset,
+    NodesetIndex,
+    connected_via_path,
+    get_loop_nodes,
+    get_node_ids_by_type,
+    get_nodeset_ids_from_directory,
+    get_relation_statistics,
+    get_relations,
+    get_two_hop_connections,
+    process_all_nodesets,
+    read_nodeset,
+    sort_nodes_by_hierarchy,
+)
+
+NODESET_DIR = "data/evaluation_data"
+
+
+def count_nodes(nodeset: Nodeset, nodeset_id: str, node_type: str) -> int:
+    if nodeset_id == "test_map3":
+        raise ValueError("test exception")
+    return len([node for node in nodeset["nodes"] if node["type"] == node_type])
+
+
+@pytest.mark.parametrize("ordered", [True, False])
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_process_all_nodesets(num_workers, ordered):
+    nodeset_ids = sorted(get_nodeset_ids_from_directory(NODESET_DIR))
+    results = list(
+        process_all_nodesets(
+            nodeset_dir=NODESET_DIR,
+            func=get_relation_statistics,
+            show_progress=False,
+            nodeset_whitelist=nodeset_ids,
+            nodeset_blacklist=["test_map1"],
+            num_workers=num_workers,
+            chunksize=2,
+            ordered=ordered,
+        )
+    )
+    result_ids = [nodeset_id for nodeset_id, _ in results]
+    expected_ids = [nodeset_id for nodeset_id in nodeset_ids if nodeset_id != "test_map1"]
+    if ordered or num_workers == 0:
+        assert result_ids == expected_ids
+    else:
+        assert sorted(result_ids) == expected_ids
+    for nodeset_id, result in results:
+        assert not isinstance(result, Exception)
+        assert result["covered_relations"]["S"] > 0
+
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_process_all_nodesets_with_errors(num_workers):
+    results = dict(
+        process_all_nodesets(
+            nodeset_dir=NODESET_DIR,
+            func=count_nodes,
+            show_progress=False,
+            nodeset_whitelist=["test_map1", "test_map3", "unknown"],
+            num_workers=num_workers,
+            node_type="I",
+        )
+    )
+    assert results["test_map1"] == 19
+    assert isinstance(results["test_map3"], ValueError)
+    assert str(results["test_map3"]) == "test exception"
+    assert isinstance(results["unknown"], FileNotFoundError)
+
+
+def test_process_all_nodesets_with_blacklist_set():
+    nodeset_ids = sorted(get_nodeset_ids_from_directory(NODESET_DIR))
+    results = process_all_nodesets(
+        nodeset_dir=NODESET_DIR,
+        func=count_nodes,
+        show_progress=False,
+        # duplicated IDs are processed only once
+        nodeset_whitelist=nodeset_ids + nodeset_ids[:2],
+        nodeset_blacklist=set(nodeset_ids[1:]),
+        node_type="I",
+    )
+    assert [nodeset_id for nodeset_id, _ in results] == nodeset_ids[:1]
+
+
+def create_nodeset() -> Nodeset:
+    # L1 -> TA -> L2, I1 -> RA -> I2, and the anchoring YA-relations
+    nodes = [
+        ("1", "L"),
+        ("2", "L"),
+        ("3", "TA"),
+        ("4", "I"),
+        ("5", "I"),
+        ("6", "RA"),
+        ("7", "YA"),
+        ("8", "YA"),
+        ("9", "YA"),
+        # a CA-node with two sources violates the cardinality constraints
+        ("10", "CA"),
+    ]
+    edges = [
+        ("1", "3"),
+        ("3", "2"),
+        ("4", "6"),
+        ("6", "5"),
+        ("1", "7"),
+        ("7", "4"),
+        ("2", "8"),
+        ("8", "5"),
+        ("3", "9"),
+        ("9", "6"),
+        ("4", "10"),
+        ("5", "10"),
+        ("10", "4"),
+    ]
+    return {
+        "nodes": [
+            {"nodeID": node_id, "type": node_type, "text": ""} for node_id, node_type in nodes
+        ],
+        "edges": [
+            {"fromID": src_id, "toID": trg_id, "edgeID": str(idx)}
+            for idx, (src_id, trg_id) in enumerate(edges)
+        ],
+        "locutions": [],
+    }
+
+
+def test_nodeset_index():
+    index = NodesetIndex(create_nodeset())
+    assert index.successors("4") == ["6", "10"]
+    assert index.predecessors("10") == ["4", "5"]
+    assert index.successors("2") == ["8"]
+    assert index.successors("unknown") == []
+    assert index.get_node_ids(["YA"]) == ["7", "8", "9"]
+    assert index.get_node_ids(["I", "L"]) == ["1", "2", "4", "5"]
+    assert index.get_node_ids(["unknown"]) == []
+    assert index.get_node_type("3") == "TA"
+    # accessing unknown node IDs does not modify the index
+    assert "unknown" not in index.src2targets
+
+    relations = index.get_all_relations()
+    assert set(relations) == set(RELATION_TYPE_SPECS) | set(COMPOSITE_RELATION_TYPES)
+    assert relations["TA"] == [{"sources": ["1"], "targets": ["2"], "relation": "3"}]
+    assert relations["CA"] == [{"sources": ["4", "5"], "targets": ["4"], "relation": "10"}]
+    assert relations["S"] == relations["RA"] + relations["CA"]
+    assert relations["YA"] == [
+        {"sources": ["1"], "targets": ["4"], "relation": "7"},
+        {"sources": ["2"], "targets": ["5"], "relation": "8"},
+        {"sources": ["3"], "targets": ["6"], "relation": "9"},
+    ]
+    relations = index.get_all_relations(relation_types=["S"], enforce_cardinality=True)
+    assert relations == {"S": [{"sources": ["4"], "targets": ["5"], "relation": "6"}]}
+
+    with pytest.raises(ValueError, match="Unknown relation type: XY"):
+        index.get_all_relations(relation_types=["XY"])
+    with pytest.raises(ValueError, match="Unknown relation type: XY"):
+        get_relations(create_nodeset(), "XY")
+
+    assert get_two_hop_connections(["1", "4"], ["2", "5"], edges=[], index=index) == {
+        ("1", "2", "3"),
+        ("4", "5", "6"),
+    }
+
+
+@pytest.mark.parametrize("enforce_cardinality", [False, True])
+def test_get_all_relations(enforce_cardinality):
+    for nodeset_id in sorted(get_nodeset_ids_from_directory(NODESET_DIR)):
+        nodeset = read_nodeset(NODESET_DIR, nodeset_id)
+        index = NodesetIndex(nodeset)
+        all_relations = index.get_all_relations(enforce_cardinality=enforce_cardinality)
+        for relation_type, relations in all_relations.items():
+            # the same relations as when collecting them one by one, with or without the index
+            assert relations == get_relations(
+                nodeset, relation_type, enforce_cardinality=enforce_cardinality
+            )
+            assert relations == get_relations(
+                nodeset, relation_type, enforce_cardinality=enforce_cardinality, index=index
+            )
+        for relation_type, parts in COMPOSITE_RELATION_TYPES.items():
+            assert all_relations[relation_type] == [
+                relation for part in parts for relation in all_relations[part]
+            ]
+
+
+def sort_nodes_by_hierarchy_reference(node_ids, edges, nodeset_id=None):
+    # the original implementation of sort_nodes_by_hierarchy
+    valid_binary_relations = get_two_hop_connections(
+        src_node_ids=node_ids, trg_node_ids=node_ids, edges=edges
+    )
+
+    src2targets = defaultdict(list)
+    trg2sources = defaultdict(list)
+    for src, trg, _ in valid_binary_relations:
+        src2targets[src].append(trg)
+        trg2sources[trg].append(src)
+
+    loop_nodes = set()
+    for src, targets in src2targets.items():
+        for trg in targets:
+            if connected_via_path(source=trg, target=src, src2targets=src2targets):
+                loop_nodes.add(src)
+                loop_nodes.add(trg)
+
+    leaves = set(node_ids) - set(src2targets)
+
+    result_reverted = []
+    visited = set()
+    stack = sorted(loop_nodes) + sorted(leaves)
+    while stack:
+        node_id = stack.pop()
+        if node_id in visited:
+            continue
+        visited.add(node_id)
+        result_reverted.append(node_id)
+
+        parents = trg2sources.get(node_id, [])
+        for parent in parents:
+            if parent is not None and all(child in visited for child in src2targets[parent]):
+                stack.append(parent)
+
+    return list(reversed(result_reverted)), loop_nodes
+
+
+def create_random_edges(rng, num_nodes, num_relations, num_loops):
+    """Create L -> TA -> L edges between the nodes "0", "1", ... The first relations follow the
+    node order (i.e. they do not create loops), the others are random and may create loops,
+    self-loops or duplicated connections."""
+    edges = []
+    for idx in range(num_relations + num_loops):
+        if idx < num_relations:
+            src, trg = sorted(rng.sample(range(num_nodes), 2))
+        else:
+            src, trg = rng.randrange(num_nodes), rng.randrange(num_nodes)
+        relation_node_id = f"ta{idx}"
+        edges.append({"fromID": str(src), "toID": relation_node_id, "edgeID": f"{idx}a"})
+        edges.append({"fromID": relation_node_id, "toID": str(trg), "edgeID": f"{idx}b"})
+    return edges
+
+
+def test_get_loop_nodes():
+    src2targets = {"1": ["2"], "2": ["3", "1"], "3": ["4"], "4": ["4"], "5": ["1"]}
+    assert get_loop_nodes(src2targets) == {"1", "2", "4"}
+    # the same nodes as with connected_via_path
+    assert get_loop_nodes(src2targets) == {
+        node_id
+        for src, targets in src2targets.items()
+        for trg in targets
+        if connected_via_path(source=trg, target=src, src2targets=src2targets)
+        for node_id in (src, trg)
+    }
+    assert get_loop_nodes({}) == set()
+    # long paths do not hit the recursion limit
+    src2targets = {str(idx): [str(idx + 1)] for idx in range(5000)}
+    assert get_loop_nodes(src2targets) == set()
+    src2targets["5000"] = ["0"]
+    assert len(get_loop_nodes(src2targets)) == 5001
+
+
+def test_sort_nodes_by_hierarchy():
+    for nodeset_id in sorted(get_nodeset_ids_from_directory(NODESET_DIR)):
+        nodeset = read_nodeset(NODESET_DIR, nodeset_id)
+        l_node_ids = get_node_ids_by_type(nodeset, node_types=["L"])
+        expected, _ = sort_nodes_by_hierarchy_reference(l_node_ids, nodeset["edges"])
+        assert sort_nodes_by_hierarchy(l_node_ids, nodeset["edges"]) == expected
+        index = NodesetIndex(nodeset)
+        assert sort_nodes_by_hierarchy(l_node_ids, nodeset["edges"], index=index) == expected
+
+
+@pytest.mark.parametrize("num_loops", [0, 1, 3, 10])
+def test_sort_nodes_by_hierarchy_random(num_loops):
+    rng = random.Random(num_loops)
+    for _ in range(100):
+        num_nodes = rng.randint(2, 30)
+        node_ids = [str(idx) for idx in range(num_nodes)]
+        edges = create_random_edges(
+            rng, num_nodes, num_relations=rng.randint(0, 2 * num_nodes), num_loops=num_loops
+        )
+        expected, expected_loop_nodes = sort_nodes_by_hierarchy_reference(node_ids, edges)
+        result = sort_nodes_by_hierarchy(node_ids, edges)
+        assert result == expected
+        assert sorted(result, key=int) == node_ids
+        if num_loops == 0:
+            assert len(expected_loop_nodes) == 0
+            # parents are always before children
+            position = {node_id: idx for idx, node_id in enumerate(result)}
+            for src, trg, _ in get_two_hop_connections(node_ids, node_ids, edges):
+                assert position[src] < position[trg]